@@ -4,10 +4,41 @@ import { randomUUID } from "crypto";
 import { buildSystemPrompt } from "./system-prompt";
 import { createSandboxTools } from "./tools";
 import { auth } from "@/lib/auth";
+import { deserializeMessages, type DbMessage } from "@/lib/chat-messages";
 import { headers } from "next/headers";
 
 const API_URL = process.env.API_URL ?? "http://localhost:4000";
 
+// Estimated tokens of stored history sent to the model (GET /chat/context)
+const CONTEXT_TOKEN_BUDGET = 120_000;
+
+/**
+ * The conversation for the model: the stored context window plus the new
+ * user message, which is only saved once the reply finishes. The client
+ * holds just the pages it has scrolled through, so its messages are only a
+ * fallback for when the API cannot be reached.
+ */
+async function loadHistory(projectId: string, messages: UIMessage[]): Promise<UIMessage[]> {
+  try {
+    const res = await fetch(
+      `${API_URL}/api/projects/${projectId}/chat/context?budget=${CONTEXT_TOKEN_BUDGET}`
+    );
+    if (!res.ok) {
+      throw new Error(`context request failed with ${res.status}`);
+    }
+    const data = (await res.json()) as { messages: DbMessage[] };
+    const history = deserializeMessages(data.messages);
+    const userMessage = messages.filter((m) => m.role === "user").pop();
+    if (userMessage && !history.some((m) => m.id === userMessage.id)) {
+      history.push(userMessage);
+    }
+    return history;
+  } catch (err) {
+    console.error("[chat] Falling back to client messages:", err);
+    return messages;
+  }
+}
+
 export async function POST(request: Request) {
   const headersList = await headers();
   const session = await auth.api.getSession({ headers: headersList });
@@ -22,7 +53,7 @@ export async function POST(request: Request) {
   }
 
   // Convert UI messages to model messages for the AI
-  const modelMessages = await convertToModelMessages(messages);
+  const modelMessages = await convertToModelMessages(await loadHistory(projectId, messages));
 
   // Prune old writeFile tool results to keep context lean.
   // The LLM can use readFile to get current file contents when needed.
@@ -10,7 +10,8 @@ import {
   useProjectQuery,
   useProjectsQuery,
 } from "@/lib/projects-queries";
-import { useChatQuery, deserializeMessages } from "@/lib/chat-queries";
+import { deserializeMessages } from "@/lib/chat-messages";
+import { useChatQuery, chatPagesToMessages } from "@/lib/chat-queries";
 import { cn } from "@/lib/utils";
 import { useRouter } from "next/navigation";
 import { TooltipProvider } from "@/components/ui/tooltip";
@@ -25,6 +26,7 @@ import {
 import {
   Conversation,
   ConversationContent,
+  ConversationLoadMore,
   ConversationScrollButton,
 } from "@/components/ai-elements/conversation";
 import { Message, MessageContent, MessageResponse } from "@/components/ai-elements/message";
@@ -142,7 +144,12 @@ export default function Home() {
   const { data: selectedProject } = useProjectQuery(selectedProjectIdFromList, {
     enabled: Boolean(session),
   });
-  const { data: chatData } = useChatQuery(selectedProjectIdFromList, {
+  const {
+    data: chatData,
+    fetchNextPage: fetchOlderMessages,
+    hasNextPage: hasOlderMessages,
+    isFetchingNextPage: isFetchingOlderMessages,
+  } = useChatQuery(selectedProjectIdFromList, {
     enabled: Boolean(session),
   });
   const isMobilePreview = previewDevice === "mobile";
@@ -155,12 +162,13 @@ export default function Home() {
     }
   }, [isPending, session, router]);
 
-  // Load chat history when switching projects or when chat data arrives
+  // Load chat history when switching projects or when a page of it arrives
   useEffect(() => {
     if (!selectedProjectIdFromList || !chatData) return;
 
-    if (chatData.messages?.length) {
-      setMessages(deserializeMessages(chatData.messages));
+    const loadedMessages = chatPagesToMessages(chatData);
+    if (loadedMessages.length) {
+      setMessages(deserializeMessages(loadedMessages));
     } else {
       setMessages([]);
     }
@@ -352,6 +360,11 @@ export default function Home() {
           {/* Chat Messages Area */}
           <Conversation className="flex-1">
             <ConversationContent className="px-4 py-4 gap-4">
+              <ConversationLoadMore
+                hasMore={Boolean(hasOlderMessages)}
+                isLoading={isFetchingOlderMessages}
+                onLoadMore={fetchOlderMessages}
+              />
               {messages.length === 0 ? (
                 <Message from="assistant">
                   <MessageContent>
@@ -5,7 +5,7 @@ import type { ComponentProps } from "react";
 import { Button } from "@/components/ui/button";
 import { cn } from "@/lib/utils";
 import { ArrowDownIcon, DownloadIcon } from "lucide-react";
-import { useCallback } from "react";
+import { useCallback, useEffect, useRef } from "react";
 import { StickToBottom, useStickToBottomContext } from "use-stick-to-bottom";
 
 export type ConversationProps = ComponentProps<typeof StickToBottom>;
@@ -59,6 +59,54 @@ export const ConversationEmptyState = ({
   </div>
 );
 
+export type ConversationLoadMoreProps = ComponentProps<"div"> & {
+  hasMore: boolean;
+  isLoading: boolean;
+  onLoadMore: () => void;
+};
+
+/** Place first in the content: calls `onLoadMore` when scrolled into view. */
+export const ConversationLoadMore = ({
+  hasMore,
+  isLoading,
+  onLoadMore,
+  className,
+  ...props
+}: ConversationLoadMoreProps) => {
+  const { isAtBottom, scrollRef } = useStickToBottomContext();
+  const sentinelRef = useRef<HTMLDivElement>(null);
+
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !hasMore || isLoading) return;
+
+    const observer = new IntersectionObserver((entries) => {
+      const scroller = scrollRef.current;
+      // While stuck to the bottom the top is only visible if nothing overflows
+      const fits = !scroller || scroller.scrollHeight <= scroller.clientHeight;
+      if (entries.some((entry) => entry.isIntersecting) && (!isAtBottom || fits)) {
+        onLoadMore();
+      }
+    });
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [hasMore, isLoading, isAtBottom, onLoadMore, scrollRef]);
+
+  if (!hasMore) {
+    return null;
+  }
+
+  return (
+    <div
+      className={cn("flex justify-center py-2 text-muted-foreground text-xs", className)}
+      ref={sentinelRef}
+      {...props}
+    >
+      {isLoading ? "Loading earlier messages…" : null}
+    </div>
+  );
+};
+
 export type ConversationScrollButtonProps = ComponentProps<typeof Button>;
 
 export const ConversationScrollButton = ({
@@ -0,0 +1,103 @@
+import type { ReactNode } from "react";
+
+import { QueryClient, QueryClientProvider } from "@tanstack/react-query";
+import { act, renderHook, waitFor } from "@testing-library/react";
+import { beforeEach, describe, expect, it, vi } from "vitest";
+
+import { chatPagesToMessages, useChatQuery } from "./chat-queries";
+
+const mockFetch = vi.fn();
+
+const createTestQueryClient = () =>
+  new QueryClient({
+    defaultOptions: {
+      queries: {
+        gcTime: Number.POSITIVE_INFINITY,
+        retry: false,
+      },
+    },
+  });
+
+const createWrapper = (queryClient: QueryClient) =>
+  function Wrapper({ children }: { children: ReactNode }) {
+    return <QueryClientProvider client={queryClient}>{children}</QueryClientProvider>;
+  };
+
+const chatPage = (ids: string[], olderCursor: string | null) =>
+  new Response(
+    JSON.stringify({
+      chat: {
+        id: "chat-1",
+        projectId: "project-1",
+        userId: "user-1",
+        createdAt: "2026-01-01T00:00:00.000Z",
+        updatedAt: "2026-01-01T00:00:00.000Z",
+      },
+      messages: ids.map((id) => ({
+        id,
+        role: "user",
+        content: JSON.stringify([{ type: "text", text: id }]),
+        createdAt: "2026-01-01T00:00:00.000Z",
+      })),
+      olderCursor,
+      newerCursor: null,
+    }),
+    {
+      status: 200,
+      headers: {
+        "Content-Type": "application/json",
+      },
+    }
+  );
+
+describe("chat-queries", () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+    global.fetch = mockFetch as typeof fetch;
+  });
+
+  it("fetches only the latest page until older messages are requested", async () => {
+    mockFetch.mockResolvedValueOnce(chatPage(["m3", "m4"], "cursor-1"));
+
+    const queryClient = createTestQueryClient();
+    const { result } = renderHook(() => useChatQuery("project-1"), {
+      wrapper: createWrapper(queryClient),
+    });
+
+    await waitFor(() => {
+      expect(result.current.isSuccess).toBe(true);
+    });
+
+    expect(mockFetch).toHaveBeenCalledTimes(1);
+    expect(mockFetch).toHaveBeenCalledWith("/api/projects/project-1/chat", {
+      credentials: "include",
+    });
+    expect(result.current.hasNextPage).toBe(true);
+
+    mockFetch.mockResolvedValueOnce(chatPage(["m1", "m2"], null));
+    await act(async () => {
+      await result.current.fetchNextPage();
+    });
+
+    expect(mockFetch).toHaveBeenLastCalledWith("/api/projects/project-1/chat?before=cursor-1", {
+      credentials: "include",
+    });
+    expect(result.current.hasNextPage).toBe(false);
+    expect(chatPagesToMessages(result.current.data).map((message) => message.id)).toEqual([
+      "m1",
+      "m2",
+      "m3",
+      "m4",
+    ]);
+  });
+
+  it("does not fetch chat history when project ID is missing", () => {
+    const queryClient = createTestQueryClient();
+    const { result } = renderHook(() => useChatQuery(null), {
+      wrapper: createWrapper(queryClient),
+    });
+
+    expect(result.current.fetchStatus).toBe("idle");
+    expect(mockFetch).not.toHaveBeenCalled();
+  });
+});
@@ -1,14 +1,8 @@
-import { useQuery } from "@tanstack/react-query";
-import type { UIMessage } from "ai";
+import { useInfiniteQuery, type InfiniteData } from "@tanstack/react-query";
 
-const API_BASE_URL = "";
+import type { DbMessage } from "@/lib/chat-messages";
 
-interface DbMessage {
-  id: string;
-  role: string;
-  content: string;
-  createdAt: string;
-}
+const API_BASE_URL = "";
 
 interface ChatResponse {
   chat: {
@@ -19,6 +13,9 @@ interface ChatResponse {
     updatedAt: string;
   } | null;
   messages: DbMessage[];
+  /** Pass as `before` to load the previous page; null when at the start. */
+  olderCursor: string | null;
+  newerCursor: string | null;
 }
 
 interface UseChatQueryOptions {
@@ -29,8 +26,20 @@ const chatQueryKeys = {
   chat: (projectId: string) => ["chat", projectId] as const,
 };
 
-const fetchChat = async (projectId: string): Promise<ChatResponse> => {
-  const response = await fetch(`${API_BASE_URL}/api/projects/${projectId}/chat`, {
+export const fetchChatPage = async (
+  projectId: string,
+  params: { before?: string; limit?: number } = {}
+): Promise<ChatResponse> => {
+  const search = new URLSearchParams();
+  if (params.before) {
+    search.set("before", params.before);
+  }
+  if (params.limit) {
+    search.set("limit", String(params.limit));
+  }
+  const queryString = search.toString();
+  const query = queryString ? `?${queryString}` : "";
+  const response = await fetch(`${API_BASE_URL}/api/projects/${projectId}/chat${query}`, {
     credentials: "include",
   });
 
@@ -42,82 +51,37 @@ const fetchChat = async (projectId: string): Promise<ChatResponse> => {
 };
 
 /**
- * Deserialize DB messages back into UIMessage format.
- * DB stores `content` as JSON.stringify(message.parts) for user messages
- * and JSON.stringify(message.content) for assistant messages.
+ * Messages of the loaded pages, oldest first. Pages are fetched newest first,
+ * each one further back along `olderCursor`.
  */
-export function deserializeMessages(dbMessages: DbMessage[]): UIMessage[] {
-  const uiMessages: UIMessage[] = [];
-
-  for (const msg of dbMessages) {
-    try {
-      const parsed = JSON.parse(msg.content);
-
-      if (msg.role === "user") {
-        // User messages: content is serialized parts array
-        uiMessages.push({
-          id: msg.id,
-          role: "user",
-          parts: Array.isArray(parsed) ? parsed : [{ type: "text" as const, text: String(parsed) }],
-        });
-      } else if (msg.role === "assistant") {
-        // Assistant messages: content is serialized model content array
-        // We need to convert model content back to UI parts
-        const parts: UIMessage["parts"] = [];
-
-        if (Array.isArray(parsed)) {
-          for (const item of parsed) {
-            if (item.type === "text" && typeof item.text === "string") {
-              parts.push({ type: "text" as const, text: item.text });
-            } else if (item.type === "reasoning" && typeof item.text === "string") {
-              parts.push({ type: "reasoning" as const, text: item.text });
-            } else if (item.type === "tool-call") {
-              // Reconstruct tool invocation parts
-              const toolType = `tool-${item.toolName}` as UIMessage["parts"][number]["type"];
-              parts.push({
-                type: toolType,
-                toolCallId: item.toolCallId,
-                toolName: item.toolName,
-                args: item.args,
-                state: "output-available",
-                output: item.result ?? {},
-              } as UIMessage["parts"][number]);
-            }
-          }
-        }
-
-        if (parts.length === 0) {
-          parts.push({ type: "text" as const, text: typeof parsed === "string" ? parsed : "" });
-        }
-
-        uiMessages.push({
-          id: msg.id,
-          role: "assistant",
-          parts,
-        });
-      }
-    } catch {
-      // If JSON parsing fails, treat as plain text
-      uiMessages.push({
-        id: msg.id,
-        role: msg.role as "user" | "assistant",
-        parts: [{ type: "text" as const, text: msg.content }],
-      });
-    }
+export function chatPagesToMessages(data: InfiniteData<ChatResponse> | undefined): DbMessage[] {
+  if (!data) {
+    return [];
   }
-
-  return uiMessages;
+  return [...data.pages].reverse().flatMap((page) => page.messages);
 }
 
+/**
+ * Chat history one page at a time: the latest messages first, then older
+ * pages through `fetchNextPage` as the user scrolls up.
+ */
 export const useChatQuery = (projectId: string | null, options?: UseChatQueryOptions) =>
-  useQuery<ChatResponse, Error>({
-    queryFn: async () => {
+  useInfiniteQuery<
+    ChatResponse,
+    Error,
+    InfiniteData<ChatResponse>,
+    ReturnType<typeof chatQueryKeys.chat>,
+    string | null
+  >({
+    queryFn: async ({ pageParam }) => {
       if (!projectId) {
         throw new Error("Project ID is required");
       }
-      return fetchChat(projectId);
+      return fetchChatPage(projectId, { before: pageParam ?? undefined });
     },
     queryKey: chatQueryKeys.chat(projectId ?? "empty"),
+    initialPageParam: null,
+    getNextPageParam: (lastPage) => lastPage.olderCursor,
     enabled: Boolean(projectId) && (options?.enabled ?? true),
   });
 
@@ -49,6 +49,9 @@ describe("projects-queries", () => {
         userId: "user-1",
         createdAt: "2026-01-01T00:00:00.000Z",
         updatedAt: "2026-01-01T00:00:00.000Z",
+        messageCount: 0,
+        lastActivityAt: null,
+        lastMessagePreview: null,
       },
     ];
 
@@ -96,6 +99,9 @@ describe("projects-queries", () => {
         userId: "user-1",
         createdAt: "2026-01-01T00:00:00.000Z",
         updatedAt: "2026-01-01T00:00:00.000Z",
+        messageCount: 0,
+        lastActivityAt: null,
+        lastMessagePreview: null,
       },
     ] satisfies Project[]);
 
@@ -106,6 +112,9 @@ describe("projects-queries", () => {
       userId: "user-1",
       createdAt: "2026-01-02T00:00:00.000Z",
       updatedAt: "2026-01-02T00:00:00.000Z",
+      messageCount: 0,
+      lastActivityAt: null,
+      lastMessagePreview: null,
     };
 
     mockFetch.mockResolvedValueOnce(
@@ -15,6 +15,9 @@ export interface Project {
   userId: string;
   createdAt: string;
   updatedAt: string;
+  messageCount: number;
+  lastActivityAt: string | null;
+  lastMessagePreview: string | null;
   sandbox?: ProjectSandbox | null;
 }
 
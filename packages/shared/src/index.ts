@@ -48,6 +48,9 @@ export interface Project {
   userId: string;
   createdAt: Date;
   updatedAt: Date;
+  messageCount: number;
+  lastActivityAt: Date | null;
+  lastMessagePreview: string | null;
 }
 
 export interface CreateProjectInput {
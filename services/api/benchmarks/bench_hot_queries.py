@@ -0,0 +1,126 @@
+"""ORM vs. pre-compiled Core lookups for the hot read paths.
+
+Part 1 executes the session-by-token and sandbox-by-project lookups both ways
+against a live database (in-memory SQLite by default; pass a
+``postgresql+asyncpg://`` URL to measure Postgres). Part 2 measures the
+statement compilation cost that the compiled cache saves on each execution,
+for both the SQLite and PostgreSQL dialects, which needs no running server.
+
+Run from services/api:
+    python -m benchmarks.bench_hot_queries [database_url] [iterations]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+
+from models import Base, Project, Sandbox, Session, User
+from services.queries import (
+    SANDBOX_BY_PROJECT,
+    SESSION_BY_TOKEN,
+    fetch_sandbox,
+    fetch_session_by_token,
+)
+
+N_ROWS = 1000
+
+
+async def _seed(factory: async_sessionmaker[AsyncSession]) -> None:
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    async with factory() as db:
+        for i in range(N_ROWS):
+            db.add(User(id=f"u{i}", email=f"u{i}@bench", createdAt=now, updatedAt=now))
+        await db.flush()
+        for i in range(N_ROWS):
+            db.add(
+                Session(
+                    id=f"s{i}",
+                    userId=f"u{i}",
+                    token=f"token-{i}",
+                    expiresAt=now + timedelta(days=1),
+                    createdAt=now,
+                    updatedAt=now,
+                )
+            )
+            db.add(Project(id=f"p{i}", name="bench", userId=f"u{i}", createdAt=now, updatedAt=now))
+        await db.flush()
+        for i in range(N_ROWS):
+            db.add(
+                Sandbox(id=f"sb{i}", projectId=f"p{i}", status="running", createdAt=now, updatedAt=now)
+            )
+        await db.commit()
+
+
+async def _orm_session(db: AsyncSession, token: str):
+    stmt = select(Session).options(joinedload(Session.user)).where(Session.token == token)
+    return (await db.execute(stmt)).unique().scalar_one_or_none()
+
+
+async def _orm_sandbox(db: AsyncSession, project_id: str):
+    stmt = select(Sandbox).where(Sandbox.projectId == project_id)
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def _time(factory, fn, keys: list[str]) -> float:
+    async with factory() as db:
+        start = time.perf_counter()
+        for key in keys:
+            assert await fn(db, key) is not None
+        return time.perf_counter() - start
+
+
+async def execute_benchmark(url: str, iterations: int) -> None:
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await _seed(factory)
+
+    tokens = [f"token-{i % N_ROWS}" for i in range(iterations)]
+    projects = [f"p{i % N_ROWS}" for i in range(iterations)]
+    print(f"[execute] {engine.dialect.name}, {iterations} lookups each")
+    for label, orm_fn, core_fn, keys in (
+        ("session by token", _orm_session, fetch_session_by_token, tokens),
+        ("sandbox by project", _orm_sandbox, fetch_sandbox, projects),
+    ):
+        orm = await _time(factory, orm_fn, keys)
+        core = await _time(factory, core_fn, keys)
+        print(
+            f"  {label:<20} ORM {iterations / orm:>9,.0f}/s   "
+            f"Core {iterations / core:>9,.0f}/s   ({orm / core:.2f}x)"
+        )
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+def compile_benchmark(iterations: int) -> None:
+    """Per-execution compile cost that the dedicated compiled cache avoids."""
+    print(f"[compile] {iterations} compilations each")
+    orm_stmt = select(Session).options(joinedload(Session.user)).where(Session.token == "x")
+    for dialect in (sqlite.dialect(), postgresql.asyncpg.dialect()):
+        for label, stmt in (
+            ("ORM session", orm_stmt),
+            ("Core session", SESSION_BY_TOKEN),
+            ("Core sandbox", SANDBOX_BY_PROJECT),
+        ):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                stmt.compile(dialect=dialect)
+            elapsed = time.perf_counter() - start
+            print(f"  {dialect.name:<10} {label:<13} {elapsed / iterations * 1e6:>7.1f}us")
+
+
+if __name__ == "__main__":
+    db_url = sys.argv[1] if len(sys.argv) > 1 else "sqlite+aiosqlite:///:memory:"
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    asyncio.run(execute_benchmark(db_url, n))
+    compile_benchmark(min(n, 2000))
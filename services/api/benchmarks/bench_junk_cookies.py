@@ -0,0 +1,79 @@
+"""Junk-cookie load: DB statements issued with and without signature checks.
+
+Fires requests carrying random, unsigned session cookies at a protected route
+and counts the SQL statements that reach the database.
+
+Run from services/api:  python -m benchmarks.bench_junk_cookies [requests]
+"""
+
+import asyncio
+import secrets
+import sys
+import time
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config import settings
+from dependencies.database import get_db
+from main import app
+from models.base import Base
+from services.session_cache import session_cache
+
+
+async def _run(n_requests: int, secret: str) -> tuple[int, float]:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    statements = 0
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count(*_args):
+        nonlocal statements
+        statements += 1
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    statements = 0
+
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def _override_get_db():
+        async with factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = _override_get_db
+    settings.better_auth_secret = secret
+    session_cache.clear()
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for _ in range(n_requests):
+            junk = f"{secrets.token_urlsafe(24)}.{secrets.token_urlsafe(32)}"
+            client.cookies.set(settings.better_auth_session_cookie, junk)
+            response = await client.get("/api/user/profile")
+            assert response.status_code == 401
+        elapsed = time.perf_counter() - start
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    return statements, elapsed
+
+
+async def main(n_requests: int) -> None:
+    # Each junk cookie is distinct, so negative caching cannot absorb them
+    settings.rate_limit_max = n_requests * 10
+    original_secret = settings.better_auth_secret
+    try:
+        for label, secret in (("unverified", ""), ("hmac-verified", "bench-secret")):
+            statements, elapsed = await _run(n_requests, secret)
+            print(
+                f"{label:>14}: {n_requests} requests, {statements} DB statements, "
+                f"{n_requests / elapsed:,.0f} req/s"
+            )
+    finally:
+        settings.better_auth_secret = original_secret
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,115 @@
+"""Table size and read latency of ``Message`` with and without the zstd codec.
+
+Fills a file-backed SQLite database with a synthetic chat: short user
+prompts, and assistant replies that embed generated source files and JSON
+tool output, as the app stores them. It then measures:
+
+* on-disk size after ``VACUUM`` (page_count * page_size);
+* latency of the ``GET /chat`` page query (latest 50 messages) including
+  decoding, averaged over repeated reads.
+
+It measures once with plain text, then again after ``backfill_compression``.
+SQLite stores text uncompressed. Postgres TOAST already applies pglz to
+values over ~2 KB, so on Postgres the size gain is the difference between
+pglz and zstd rather than between none and zstd.
+
+Run from services/api:  python -m benchmarks.bench_message_codec [messages]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from models import Base
+from models.chat import Chat, Message
+from models.project import Project
+from models.user import User
+from services.message_codec import backfill_compression, decode_content
+
+PAGE = 50
+
+
+def _assistant_body(i: int) -> str:
+    source = "".join(
+        f"export function Widget{i}_{j}({{ items }}: Props) {{\n"
+        f"  const [open, setOpen] = useState(false);\n"
+        f"  return <ul className=\"grid gap-{j % 4}\">{{items.map((it) => <li key={{it.id}}>{{it.name}}</li>)}}</ul>;\n"
+        f"}}\n\n"
+        for j in range(40)
+    )
+    tool_output = json.dumps({"stdout": "\n".join(f"✓ compiled module {k} in {k * 3}ms" for k in range(60)), "exitCode": 0})
+    return json.dumps([
+        {"type": "text", "text": f"I created the widget set for step {i}."},
+        {"type": "tool-call", "toolName": "writeFile", "args": {"path": f"src/w{i}.tsx", "content": source}},
+        {"type": "tool-call", "toolName": "runCommand", "args": {"command": "npm run build"}, "result": tool_output},
+    ])
+
+
+async def _db_size(engine) -> int:
+    async with engine.connect() as conn:
+        await conn.execute(text("VACUUM"))
+        pages = (await conn.execute(text("PRAGMA page_count"))).scalar_one()
+        page_size = (await conn.execute(text("PRAGMA page_size"))).scalar_one()
+    return pages * page_size
+
+
+async def _read_ms(factory, rounds: int) -> float:
+    stmt = (
+        select(Message.id, Message.role, Message.content, Message.contentZstd, Message.createdAt)
+        .where(Message.chatId == "c1")
+        .order_by(Message.createdAt.desc(), Message.id.desc())
+        .limit(PAGE)
+    )
+    async with factory() as db:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            rows = (await db.execute(stmt)).all()
+            [decode_content(content, packed) for _, _, content, packed, _ in rows]
+        return (time.perf_counter() - start) / rounds * 1000
+
+
+async def main(n_messages: int, rounds: int = 200) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        now = datetime(2025, 1, 1)
+        async with factory() as db:
+            db.add(User(id="u1", name="U", email="u@example.com", emailVerified=True, createdAt=now, updatedAt=now))
+            db.add(Project(id="p1", name="P", userId="u1", createdAt=now, updatedAt=now))
+            db.add(Chat(id="c1", projectId="p1", userId="u1", createdAt=now, updatedAt=now))
+            for i in range(n_messages):
+                user_turn = i % 2 == 0
+                db.add(Message(
+                    id=f"m{i:06}",
+                    chatId="c1",
+                    role="user" if user_turn else "assistant",
+                    content=f"Please add feature {i} to the dashboard" if user_turn else _assistant_body(i),
+                    createdAt=now + timedelta(seconds=i),
+                ))
+            await db.commit()
+
+        size_before = await _db_size(engine)
+        read_before = await _read_ms(factory, rounds)
+        result = await backfill_compression(factory)
+        size_after = await _db_size(engine)
+        read_after = await _read_ms(factory, rounds)
+        await engine.dispose()
+
+    print(f"{n_messages:,} messages, {result['compressed']:,} compressed by the backfill")
+    print(f"message bodies:  {result['bytesBefore'] / 2**20:8.1f} MiB -> {result['bytesAfter'] / 2**20:6.1f} MiB")
+    print(f"database file:   {size_before / 2**20:8.1f} MiB -> {size_after / 2**20:6.1f} MiB")
+    print(f"page read+decode {read_before:8.2f} ms -> {read_after:6.2f} ms  (latest {PAGE} messages)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
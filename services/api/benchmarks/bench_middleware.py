@@ -0,0 +1,124 @@
+"""Requests/second through the middleware stack: BaseHTTPMiddleware vs. pure ASGI.
+
+Drives ``GET /health`` by calling the ASGI app directly (no HTTP client or
+server in the loop), so the numbers isolate framework and middleware cost.
+The "BaseHTTPMiddleware" stack is a trimmed copy of the previous
+implementation, kept here only as the baseline. Its rate-limit and CSRF
+replicas skip the bookkeeping, which can only flatter the baseline.
+
+Run from services/api:  python -m benchmarks.bench_middleware [requests]
+"""
+
+import asyncio
+import sys
+import time
+import uuid
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from config import settings
+from middleware.csrf import CSRFMiddleware
+from middleware.security import (
+    RateLimitMiddleware,
+    RequestIdMiddleware,
+    SecurityHeadersMiddleware,
+)
+from routes.health import router as health_router
+
+
+class _LegacyRequestId(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        request_id = request.headers.get("x-request-id", "").strip() or str(uuid.uuid4())
+        request.state.request_id = request_id
+        response = await call_next(request)
+        response.headers["x-request-id"] = request_id
+        return response
+
+
+class _LegacySecurityHeaders(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["x-content-type-options"] = "nosniff"
+        response.headers["x-frame-options"] = "DENY"
+        response.headers["referrer-policy"] = "no-referrer"
+        response.headers["x-dns-prefetch-control"] = "off"
+        response.headers["x-xss-protection"] = "0"
+        response.headers["permissions-policy"] = "camera=(), microphone=(), geolocation=()"
+        response.headers["content-security-policy"] = (
+            "default-src 'none'; frame-ancestors 'none'; base-uri 'none'"
+        )
+        return response
+
+
+class _LegacyRateLimit(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["x-ratelimit-limit"] = str(settings.rate_limit_max)
+        return response
+
+
+class _LegacyCSRF(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if request.method.upper() in {"GET", "HEAD", "OPTIONS"}:
+            return await call_next(request)
+        return await call_next(request)
+
+
+def _build(middleware: list) -> FastAPI:
+    app = FastAPI()
+    app.include_router(health_router)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.trusted_origins_list,
+        allow_credentials=True,
+    )
+    for cls in middleware:
+        app.add_middleware(cls)
+    return app
+
+
+async def _drive(app: FastAPI, n_requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope():
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/health",
+            "raw_path": b"/health",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"bench"), (b"cookie", b"a=1; b=2")],
+            "client": ("127.0.0.1", 1234),
+            "server": ("bench", 80),
+        }
+
+    for _ in range(200):  # warm-up
+        await app(scope(), receive, send)
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        await app(scope(), receive, send)
+    return n_requests / (time.perf_counter() - start)
+
+
+async def main(n_requests: int) -> None:
+    settings.rate_limit_max = n_requests * 10
+    legacy = _build([_LegacyCSRF, _LegacyRateLimit, _LegacySecurityHeaders, _LegacyRequestId])
+    current = _build([CSRFMiddleware, RateLimitMiddleware, SecurityHeadersMiddleware, RequestIdMiddleware])
+    before = await _drive(legacy, n_requests)
+    after = await _drive(current, n_requests)
+    print(f"BaseHTTPMiddleware stack: {before:>8,.0f} req/s")
+    print(f"pure ASGI stack:          {after:>8,.0f} req/s  ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,84 @@
+"""Serialization cost of a large chat history: dicts + JSONResponse vs. structs + orjson.
+
+Builds a 5,000-message chat in memory and times only the response-building
+step of ``GET /api/projects/{id}/chat``:
+
+* before: dicts with ``isoformat()`` strings, run through FastAPI's
+  ``jsonable_encoder`` and rendered by the stdlib-backed ``JSONResponse``;
+* after: slotted dataclasses rendered straight by ``ORJSONResponse``.
+
+Run from services/api:  python -m benchmarks.bench_serialization [messages]
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from routes.chat import ChatHistoryOut, ChatOut, MessageOut
+
+_CONTENT = (
+    "Here is the updated component. I moved the fetch into a hook and added "
+    "a loading state so the list does not flash while data arrives.\n\n"
+    "```tsx\nexport function ProjectList() {\n  const { data } = useProjects();\n"
+    "  return <ul>{data?.map((p) => <li key={p.id}>{p.name}</li>)}</ul>;\n}\n```\n"
+)
+
+
+def _rows(n_messages: int):
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    chat = ("chat_1", "proj_1", "user_1", start, start + timedelta(hours=1))
+    messages = [
+        (f"msg_{i}", "user" if i % 2 == 0 else "assistant", _CONTENT, start + timedelta(seconds=i))
+        for i in range(n_messages)
+    ]
+    return chat, messages
+
+
+def _before(chat, messages) -> bytes:
+    content = {
+        "chat": {
+            "id": chat[0],
+            "projectId": chat[1],
+            "userId": chat[2],
+            "createdAt": chat[3].isoformat(),
+            "updatedAt": chat[4].isoformat(),
+        },
+        "messages": [
+            {"id": m[0], "role": m[1], "content": m[2], "createdAt": m[3].isoformat()}
+            for m in messages
+        ],
+    }
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def _after(chat, messages) -> bytes:
+    content = ChatHistoryOut(
+        chat=ChatOut(*chat),
+        messages=[MessageOut(*m) for m in messages],
+    )
+    return ORJSONResponse(content).body
+
+
+def _time(fn, chat, messages, rounds: int) -> float:
+    fn(chat, messages)  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(chat, messages)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main(n_messages: int, rounds: int = 20) -> None:
+    chat, messages = _rows(n_messages)
+    size = len(_after(chat, messages))
+    before = _time(_before, chat, messages, rounds)
+    after = _time(_after, chat, messages, rounds)
+    print(f"{n_messages:,} messages, {size / 1024:,.0f} KiB of JSON")
+    print(f"dict + jsonable_encoder + JSONResponse: {before:8.2f} ms")
+    print(f"dataclass + ORJSONResponse:             {after:8.2f} ms  ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
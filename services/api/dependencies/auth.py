@@ -1,14 +1,47 @@
+import base64
+import hashlib
+import hmac
 from datetime import datetime, timezone
+from functools import lru_cache
 from urllib.parse import unquote
 
 from fastapi import Depends, HTTPException, Request
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
 
 from config import settings
 from dependencies.database import get_db
-from models.user import Session, User
+from middleware.scope import get_cookies
+from services.queries import UserRow
+from services.session_cache import session_cache
+
+
+# better-auth signatures are base64(HMAC-SHA256(secret, TOKEN)) with padding
+_SIGNATURE_LENGTH = 44
+
+
+@lru_cache(maxsize=1)
+def _signer(secret: str) -> "hmac.HMAC":
+    """Keyed HMAC prototype; ``.copy()`` skips re-deriving the key per request."""
+    return hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+def sign_token(token: str, secret: str) -> str:
+    """Return the ``TOKEN.SIGNATURE`` cookie value better-auth would set."""
+    mac = _signer(secret).copy()
+    mac.update(token.encode("utf-8"))
+    return f"{token}.{base64.b64encode(mac.digest()).decode('ascii')}"
+
+
+def _verify_signature(token: str, signature: str, secret: str) -> bool:
+    if len(signature) != _SIGNATURE_LENGTH or not signature.endswith("="):
+        return False
+    try:
+        provided = base64.b64decode(signature, validate=True)
+    except ValueError:
+        return False
+    mac = _signer(secret).copy()
+    mac.update(token.encode("utf-8"))
+    return hmac.compare_digest(mac.digest(), provided)
 
 
 def _extract_token(signed_cookie: str) -> str | None:
@@ -16,38 +49,31 @@ def _extract_token(signed_cookie: str) -> str | None:
 
     better-auth signs cookies as ``TOKEN.HMAC_SIGNATURE``.
     The DB stores the plain TOKEN; we split on the last ``.`` to retrieve it.
+    When ``better_auth_secret`` is configured the signature is verified
+    in-process and forged cookies return None without touching the database.
     """
     value = unquote(signed_cookie)
     last_dot = value.rfind(".")
+    secret = settings.better_auth_secret
+    if secret and settings.verify_session_signature:
+        if last_dot < 1:
+            return None
+        token = value[:last_dot]
+        if not _verify_signature(token, value[last_dot + 1:], secret):
+            return None
+        return token
     if last_dot < 1:
         # Not a signed cookie – treat the whole value as the token
         return value
     return value[:last_dot]
 
 
-def _parse_cookie(cookie_header: str | None) -> dict[str, str]:
-    """Parse a raw cookie header string into a dict."""
-    if not cookie_header:
-        return {}
-    cookies: dict[str, str] = {}
-    for pair in cookie_header.split(";"):
-        pair = pair.strip()
-        if not pair:
-            continue
-        parts = pair.split("=", 1)
-        if len(parts) == 2:
-            cookies[parts[0].strip()] = parts[1].strip()
-    return cookies
-
-
 async def get_current_user(
     request: Request,
     db: AsyncSession = Depends(get_db),
-) -> User:
+) -> UserRow:
     """Require a valid session. Returns the User or raises 401."""
-    cookie_header = request.headers.get("cookie")
-    cookies = _parse_cookie(cookie_header)
-    token = cookies.get(settings.better_auth_session_cookie)
+    token = get_cookies(request.scope).get(settings.better_auth_session_cookie)
 
     if not token:
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -56,13 +82,7 @@ async def get_current_user(
     if not plain_token:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    stmt = (
-        select(Session)
-        .options(joinedload(Session.user))
-        .where(Session.token == plain_token)
-    )
-    result = await db.execute(stmt)
-    session = result.unique().scalar_one_or_none()
+    session = await session_cache.resolve(db, plain_token)
 
     if not session:
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -79,11 +99,9 @@ async def get_current_user(
 async def get_optional_user(
     request: Request,
     db: AsyncSession = Depends(get_db),
-) -> User | None:
+) -> UserRow | None:
     """Attach user if session exists, otherwise return None (no 401)."""
-    cookie_header = request.headers.get("cookie")
-    cookies = _parse_cookie(cookie_header)
-    token = cookies.get(settings.better_auth_session_cookie)
+    token = get_cookies(request.scope).get(settings.better_auth_session_cookie)
 
     if not token:
         return None
@@ -92,13 +110,7 @@ async def get_optional_user(
     if not plain_token:
         return None
 
-    stmt = (
-        select(Session)
-        .options(joinedload(Session.user))
-        .where(Session.token == plain_token)
-    )
-    result = await db.execute(stmt)
-    session = result.unique().scalar_one_or_none()
+    session = await session_cache.resolve(db, plain_token)
 
     if not session:
         return None
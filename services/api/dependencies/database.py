@@ -1,10 +1,89 @@
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
 
+import models.base
 from models.base import async_session
+from models.replica import replica_router
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+def sticky_keys(request: Request) -> list[str]:
+    """Keys whose recent writes pin this request's reads to the primary."""
+    keys = []
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        keys.append(f"user:{user.id}")
+    project_id = request.path_params.get("project_id")
+    if project_id:
+        keys.append(f"project:{project_id}")
+    return keys
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_sticky_after_commit(session: Session) -> None:
+    request = session.info.get("request")
+    if request is not None:
+        replica_router.mark_write(sticky_keys(request))
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
+        if models.base.read_async_session is not None:
+            session.info["request"] = request
+        yield session
+
+
+async def get_read_db(
+    request: Request,
+    primary: AsyncSession = Depends(get_db),
+) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only handlers: the replica when it is safe, else the primary.
+
+    Falls back to the request's primary session (opened lazily, so it costs no
+    connection if unused) when no replica is configured, the replica is
+    lagging or down, or the request recently wrote.
+    """
+    read_async_session = models.base.read_async_session
+    if read_async_session is not None and replica_router.use_replica(sticky_keys(request)):
+        async with read_async_session() as session:
+            try:
+                # Connect eagerly so an unreachable replica falls back here
+                # rather than failing the handler
+                await session.connection()
+            except (OSError, SQLAlchemyError) as exc:
+                replica_router.mark_down(exc)
+            else:
+                yield session
+                return
+    yield primary
+
+
+def get_session_factory() -> async_sessionmaker[AsyncSession]:
+    """The primary's session factory, for work that outlives the request's
+    dependencies: a streaming body runs after they have exited."""
+    return async_session
+
+
+@asynccontextmanager
+async def read_session(
+    request: Request,
+    primary: async_sessionmaker[AsyncSession],
+) -> AsyncIterator[AsyncSession]:
+    """``get_read_db`` for callers that open and close the session themselves."""
+    read_async_session = models.base.read_async_session
+    if read_async_session is not None and replica_router.use_replica(sticky_keys(request)):
+        async with read_async_session() as session:
+            try:
+                await session.connection()
+            except (OSError, SQLAlchemyError) as exc:
+                replica_router.mark_down(exc)
+            else:
+                yield session
+                return
+    async with primary() as session:
         yield session
@@ -1,25 +1,41 @@
+import asyncio
+import contextlib
 import logging
+from contextlib import asynccontextmanager
 
 import socketio
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from starlette.exceptions import HTTPException
 from starlette.responses import JSONResponse
 
 from config import settings
+from middleware.admission import AdmissionMiddleware, loop_lag_monitor
+from middleware.compression import CompressionMiddleware
 from middleware.csrf import CSRFMiddleware
+from middleware.query_stats import QueryStatsMiddleware
 from middleware.security import (
     RateLimitMiddleware,
     RequestIdMiddleware,
     SecurityHeadersMiddleware,
+    rate_limiter,
 )
+from models.base import engine, read_engine
+from models.pool import warm_up
+from models.replica import run_replica_monitor
 from routes.chat import router as chat_router
 from routes.health import router as health_router
 from routes.projects import router as projects_router
 from routes.sandbox import router as sandbox_router
 from routes.security import router as security_router
 from routes.user import router as user_router
+from services.chat_archive import run_archive_loop
+from services.group_commit import group_commit_writer
+from services.message_chunks import run_compaction_loop
+from services.schema_check import check_indexes
+from services.session_purge import run_purge_loop
 from ws.server import sio
 
 # ---------------------------------------------------------------------------
@@ -31,11 +47,52 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(name)s %(message)s",
 )
 
+# ---------------------------------------------------------------------------
+# Lifespan — pool warm-up, schema check and background maintenance tasks
+# ---------------------------------------------------------------------------
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up(engine, min(settings.db_pool_min_connections, settings.db_pool_size))
+    if settings.schema_check_on_startup:
+        await check_indexes()
+    tasks: list[asyncio.Task] = [asyncio.create_task(loop_lag_monitor.run())]
+    if settings.session_purge_interval_seconds > 0:
+        tasks.append(asyncio.create_task(run_purge_loop()))
+    if settings.message_compact_interval_seconds > 0:
+        tasks.append(asyncio.create_task(run_compaction_loop()))
+    if settings.chat_archive_interval_seconds > 0:
+        tasks.append(asyncio.create_task(run_archive_loop()))
+    if read_engine is not None:
+        tasks.append(asyncio.create_task(run_replica_monitor(read_engine)))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        # Queued saves are commits callers are still waiting on
+        await group_commit_writer.stop()
+        await rate_limiter.stop()
+        await engine.dispose()
+        if read_engine is not None:
+            await read_engine.dispose()
+
+
 # ---------------------------------------------------------------------------
 # FastAPI app
 # ---------------------------------------------------------------------------
 
-app = FastAPI(title="AI App Builder API", docs_url=None, redoc_url=None)
+app = FastAPI(
+    title="AI App Builder API",
+    docs_url=None,
+    redoc_url=None,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -65,10 +122,14 @@ async def validation_exception_handler(request, exc):
 # Starlette applies middleware in reverse add_middleware order, so:
 #   add_middleware(A); add_middleware(B) → request passes B then A
 #
-# We want: Request → RequestId → SecurityHeaders → RateLimit → CSRF → CORS → app
-# So we add in reverse: CORS, CSRF, RateLimit, SecurityHeaders, RequestId
+# We want: Request → RequestId → SecurityHeaders → Admission → RateLimit → CSRF
+#          → CORS → Compression → QueryStats → app
+# So we add in reverse: QueryStats, Compression, CORS, CSRF, RateLimit,
+# Admission, SecurityHeaders, RequestId
 # ---------------------------------------------------------------------------
 
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.trusted_origins_list,
@@ -78,6 +139,7 @@ app.add_middleware(
 )
 app.add_middleware(CSRFMiddleware)
 app.add_middleware(RateLimitMiddleware)
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(RequestIdMiddleware)
 
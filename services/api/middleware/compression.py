@@ -0,0 +1,206 @@
+"""Content-negotiated response compression (zstd, brotli, gzip).
+
+Only compressible content types above ``compression_min_size`` bytes are
+compressed. Bodies larger than ``compression_offload_size`` are compressed
+slice by slice in a worker thread and streamed out as they are produced, so
+a multi-megabyte build log never blocks the event loop or sits in memory
+twice. Streaming responses are compressed chunk by chunk with a sync flush
+after each chunk, so clients still see data as soon as it is sent.
+
+brotli and zstandard are optional; without them only gzip is offered.
+"""
+
+import zlib
+
+import anyio
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from middleware.scope import get_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+
+_SLICE_SIZE = 64 * 1024
+
+
+class _Compressor:
+    """Uniform ``compress`` / ``flush`` / ``finish`` over the three codecs."""
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=settings.compression_zstd_level).compressobj()
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=settings.compression_brotli_quality)
+        else:
+            self._obj = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        """Emit everything buffered so far without ending the stream."""
+        if self.encoding == "zstd":
+            return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.encoding == "br":
+            return self._obj.flush()
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+def available_encodings() -> tuple[str, ...]:
+    """Supported encodings in server preference order."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+def negotiate_encoding(accept_encoding: str, supported: tuple[str, ...]) -> str | None:
+    """Pick the supported encoding with the highest q-value (ties: server order)."""
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token.strip().lower()] = q
+    best = None
+    best_q = 0.0
+    for encoding in supported:
+        q = weights.get(encoding, 0.0)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.encodings = available_encodings()
+        self.minimum_size = settings.compression_min_size
+        self.offload_size = settings.compression_offload_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(get_headers(scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.minimum_size = middleware.minimum_size
+        self.offload_size = middleware.offload_size
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Message | None = None
+        self.passthrough = False
+        self.compressor: _Compressor | None = None
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = MutableHeaders(scope=message)
+            content_type = headers.get("content-type", "")
+            if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                self.passthrough = True
+                await self._send(message)
+            else:
+                # Hold the start message until the first body chunk decides
+                self.start_message = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+            self.compressor = _Compressor(self.encoding)
+            if not more_body and len(body) < self.offload_size:
+                await self._send_whole(body)
+                return
+            await self._send_start(content_length=None)
+
+        await self._send_chunk(body, more_body)
+
+    def _headers(self) -> MutableHeaders:
+        headers = MutableHeaders(scope=self.start_message)
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        return headers
+
+    async def _send_start(self, content_length: int | None) -> None:
+        headers = self._headers()
+        if content_length is None:
+            del headers["content-length"]
+        else:
+            headers["content-length"] = str(content_length)
+        await self._send(self.start_message)
+
+    async def _send_whole(self, body: bytes) -> None:
+        compressed = self.compressor.compress(body) + self.compressor.finish()
+        await self._send_start(content_length=len(compressed))
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    async def _send_chunk(self, body: bytes, more_body: bool) -> None:
+        compressor = self.compressor
+        if len(body) >= self.offload_size:
+            # Large chunk: compress slice by slice off the event loop, emitting as we go
+            for offset in range(0, len(body), _SLICE_SIZE):
+                piece = body[offset:offset + _SLICE_SIZE]
+                out = await anyio.to_thread.run_sync(compressor.compress, piece)
+                if out:
+                    await self._send({"type": "http.response.body", "body": out, "more_body": True})
+            body = b""
+
+        out = compressor.compress(body) if body else b""
+        out += compressor.flush() if more_body else compressor.finish()
+        await self._send({"type": "http.response.body", "body": out, "more_body": more_body})
@@ -1,11 +1,11 @@
 import secrets
 from urllib.parse import urlparse
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
 from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from config import settings
+from middleware.scope import get_cookies, get_headers
 
 CSRF_COOKIE_NAME = "aiapp.csrf-token"
 CSRF_HEADER_NAME = "x-csrf-token"
@@ -18,25 +18,11 @@ def create_csrf_token() -> str:
     return secrets.token_hex(32)
 
 
-def _parse_cookies(cookie_header: str | None) -> dict[str, str]:
-    if not cookie_header:
-        return {}
-    cookies: dict[str, str] = {}
-    for pair in cookie_header.split(";"):
-        pair = pair.strip()
-        if not pair:
-            continue
-        parts = pair.split("=", 1)
-        if len(parts) == 2:
-            cookies[parts[0].strip()] = parts[1].strip()
-    return cookies
-
-
-def _get_origin(request: Request) -> str | None:
-    origin = request.headers.get("origin")
+def _get_origin(headers: dict[str, str]) -> str | None:
+    origin = headers.get("origin")
     if origin:
         return origin
-    referer = request.headers.get("referer")
+    referer = headers.get("referer")
     if not referer:
         return None
     try:
@@ -46,7 +32,7 @@ def _get_origin(request: Request) -> str | None:
         return None
 
 
-def _is_trusted_origin(origin: str | None) -> bool:
+def _is_trusted_origin(origin: str | None, trusted: frozenset[str]) -> bool:
     if not origin:
         return False
     try:
@@ -54,48 +40,63 @@ def _is_trusted_origin(origin: str | None) -> bool:
         normalized = f"{parsed.scheme}://{parsed.netloc}"
     except Exception:
         return False
-    return normalized in settings.trusted_origins_list
+    return normalized in trusted
+
+
+class CSRFMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.trusted_origins = frozenset(settings.trusted_origins_list)
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-class CSRFMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
         # Skip safe methods and auth paths
-        if request.method.upper() in SAFE_METHODS:
-            return await call_next(request)
+        if scope["method"].upper() in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
 
-        if request.url.path.startswith("/api/auth/"):
-            return await call_next(request)
+        path: str = scope["path"]
+        if path.startswith("/api/auth/"):
+            await self.app(scope, receive, send)
+            return
 
         # Sandbox routes are called server-to-server (Next.js → FastAPI)
-        if request.url.path.startswith("/sandbox/"):
-            return await call_next(request)
+        if path.startswith("/sandbox/"):
+            await self.app(scope, receive, send)
+            return
 
         # Chat message saving is server-to-server (Next.js chat route → FastAPI)
-        if "/chat/messages" in request.url.path:
-            return await call_next(request)
+        if "/chat/messages" in path:
+            await self.app(scope, receive, send)
+            return
 
         # Origin check
-        origin = _get_origin(request)
-        if not _is_trusted_origin(origin):
-            return JSONResponse(
+        headers = get_headers(scope)
+        origin = _get_origin(headers)
+        if not _is_trusted_origin(origin, self.trusted_origins):
+            response = JSONResponse(
                 status_code=403,
                 content={"error": "Forbidden origin"},
             )
+            await response(scope, receive, send)
+            return
 
         # Token check
-        cookie_header = request.headers.get("cookie")
-        cookies = _parse_cookies(cookie_header)
-        csrf_cookie = cookies.get(CSRF_COOKIE_NAME)
-        csrf_header = request.headers.get(CSRF_HEADER_NAME)
+        csrf_cookie = get_cookies(scope).get(CSRF_COOKIE_NAME)
+        csrf_header = headers.get(CSRF_HEADER_NAME)
 
         if not csrf_cookie or not csrf_header or csrf_cookie != csrf_header:
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=403,
                 content={"error": "Invalid CSRF token"},
             )
+            await response(scope, receive, send)
+            return
 
-        response: Response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
 
 
 def set_csrf_cookie(response: Response, token: str) -> None:
@@ -0,0 +1,50 @@
+"""Per-request query count and DB time; see ``services/query_stats.py``.
+
+With ``query_debug_headers`` on, responses carry ``x-db-query-count`` and
+``x-db-time-ms`` (covering queries run before the response started). They
+expose how requests hit the database, so production never sends them.
+"""
+
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from services.query_stats import track_queries
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.debug_headers = settings.query_debug_headers and not settings.is_production
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_with_query_stats(message: Message) -> None:
+                if message["type"] == "http.response.start" and self.debug_headers:
+                    headers = MutableHeaders(scope=message)
+                    headers["x-db-query-count"] = str(stats.count)
+                    headers["x-db-time-ms"] = f"{stats.total_ms:.1f}"
+                await send(message)
+
+            await self.app(scope, receive, send_with_query_stats)
+
+        if not stats.count:
+            return
+        logger.debug(
+            "[db] %s %s: %d queries in %.1fms",
+            scope["method"], scope["path"], stats.count, stats.total_ms,
+        )
+        for statement, times in stats.repeated(settings.query_repeat_warn):
+            logger.warning(
+                "[db] Possible N+1 in %s %s: statement ran %d times: %s",
+                scope["method"], scope["path"], times, " ".join(statement.split())[:200],
+            )
@@ -0,0 +1,292 @@
+"""Rate limiter backends.
+
+``GCRALimiter`` is the default in-process backend. ``SharedRateLimitBackend``
+keeps counters in a store shared by every worker and node (Redis in
+production), so ``--workers N`` no longer multiplies the effective limit.
+Both expose ``acquire()`` and ``clear()`` (see ``RateLimitBackend``).
+
+In-process: GCRA with amortized expiry and a hard cap on tracked keys.
+
+The Generic Cell Rate Algorithm stores a single number per key — the
+theoretical arrival time (TAT) of the next request — so each check is O(1)
+and needs no per-window bookkeeping. ``limit`` requests per ``period_ms`` are
+allowed as a burst, refilling continuously at ``period_ms / limit``.
+
+Keys live in an ``OrderedDict`` in least-recently-touched order. A key's TAT
+is never more than ``period_ms`` past its last touch, so once the oldest key
+has expired it can be dropped; each check pops at most ``sweep_batch`` such
+keys from the front, which keeps expiry amortized O(1) instead of a sweep of
+the whole store. When ``max_keys`` is reached the oldest key is evicted,
+which at worst forgives that client's remaining debt.
+
+Everything runs synchronously on the event loop thread, so no lock is needed.
+
+Shared: fixed-window counters updated with an atomic increment-with-expiry
+(``INCRBY`` + ``PEXPIRE``). Requests are decided against the last known
+global count plus this worker's unflushed increments, and increments are
+pushed to the store in one pipelined batch at most every
+``flush_interval_ms``, in the background: a request starts a flush once the
+interval has passed, and a timer flushes what an idle worker still holds.
+No request waits on the store; the price is that workers may overshoot the
+limit by the traffic of one flush interval. ``stop()`` (the app lifespan)
+pushes the last increments before the worker exits.
+"""
+
+import asyncio
+import contextlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Protocol
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_at_ms: float
+    retry_after_ms: float
+
+
+class RateLimitBackend(Protocol):
+    async def acquire(
+        self, key: str, *, cost: int, limit: int, period_ms: float
+    ) -> RateLimitResult: ...
+
+    def clear(self) -> None: ...
+
+    async def stop(self) -> None: ...
+
+
+class GCRALimiter:
+    def __init__(self, max_keys: int, sweep_batch: int = 4) -> None:
+        self.max_keys = max_keys
+        self.sweep_batch = sweep_batch
+        self._tat: OrderedDict[str, float] = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def _sweep(self, now_ms: float) -> None:
+        for _ in range(self.sweep_batch):
+            if not self._tat:
+                return
+            key, tat = next(iter(self._tat.items()))
+            if tat > now_ms:
+                return
+            del self._tat[key]
+
+    def hit(
+        self,
+        key: str,
+        *,
+        cost: int = 1,
+        limit: int,
+        period_ms: float,
+        now_ms: float | None = None,
+    ) -> RateLimitResult:
+        """Charge ``cost`` units to ``key`` and report whether it is allowed."""
+        now = time.time() * 1000 if now_ms is None else now_ms
+        self._sweep(now)
+
+        interval = period_ms / limit
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + cost * interval
+        allow_at = new_tat - period_ms
+
+        if allow_at > now:
+            remaining = max(math.floor((now + period_ms - tat) / interval), 0)
+            return RateLimitResult(False, limit, remaining, tat, allow_at - now)
+
+        if cost > 0 or key in self._tat:
+            self._tat[key] = new_tat
+            self._tat.move_to_end(key)
+            while len(self._tat) > self.max_keys:
+                self._tat.popitem(last=False)
+                self.evictions += 1
+
+        remaining = max(math.floor((now + period_ms - new_tat) / interval), 0)
+        return RateLimitResult(True, limit, remaining, new_tat, 0.0)
+
+    async def acquire(
+        self, key: str, *, cost: int, limit: int, period_ms: float
+    ) -> RateLimitResult:
+        return self.hit(key, cost=cost, limit=limit, period_ms=period_ms)
+
+    def clear(self) -> None:
+        self._tat.clear()
+
+    async def stop(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Shared counter stores
+# ---------------------------------------------------------------------------
+
+class CounterStore(Protocol):
+    async def incr_batch(self, items: list[tuple[str, int, int]]) -> list[int]:
+        """Atomically add ``amount`` to each ``(key, amount, ttl_ms)`` and set
+        its expiry; return the new totals in order."""
+        ...
+
+
+class RedisCounterStore:
+    """``CounterStore`` backed by Redis, one pipelined round trip per batch."""
+
+    def __init__(self, url: str) -> None:
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+
+    async def incr_batch(self, items: list[tuple[str, int, int]]) -> list[int]:
+        pipe = self._redis.pipeline(transaction=False)
+        for key, amount, ttl_ms in items:
+            pipe.incrby(key, amount)
+            pipe.pexpire(key, ttl_ms)
+        results = await pipe.execute()
+        return [int(total) for total in results[::2]]
+
+
+class InMemoryCounterStore:
+    """Local stand-in for Redis implementing the same protocol (tests, single node)."""
+
+    def __init__(self) -> None:
+        self._values: dict[str, tuple[int, float]] = {}
+        self.batches = 0
+
+    async def incr_batch(self, items: list[tuple[str, int, int]]) -> list[int]:
+        self.batches += 1
+        now = time.monotonic()
+        totals = []
+        for key, amount, ttl_ms in items:
+            value, expires_at = self._values.get(key, (0, 0.0))
+            if expires_at <= now:
+                value = 0
+            value += amount
+            self._values[key] = (value, now + ttl_ms / 1000)
+            totals.append(value)
+        return totals
+
+
+class _WindowCounter:
+    __slots__ = ("window", "known", "pending")
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.known = 0  # global total as of the last flush
+        self.pending = 0  # local increments not yet flushed
+
+
+class SharedRateLimitBackend:
+    def __init__(
+        self,
+        store: CounterStore,
+        *,
+        flush_interval_ms: float,
+        max_keys: int,
+        key_prefix: str = "ratelimit:",
+    ) -> None:
+        self.store = store
+        self.flush_interval_ms = flush_interval_ms
+        self.max_keys = max_keys
+        self.key_prefix = key_prefix
+        self._counters: OrderedDict[str, _WindowCounter] = OrderedDict()
+        self._periods: dict[str, float] = {}
+        self._last_flush = 0.0
+        self._flush_task: asyncio.Task | None = None
+        self._timer: asyncio.Task | None = None
+
+    async def acquire(
+        self, key: str, *, cost: int, limit: int, period_ms: float
+    ) -> RateLimitResult:
+        now = time.time() * 1000
+        window = int(now // period_ms)
+        counter = self._counters.get(key)
+        if counter is None or counter.window != window:
+            counter = _WindowCounter(window)
+            self._counters[key] = counter
+        self._counters.move_to_end(key)
+        while len(self._counters) > self.max_keys:
+            evicted, _ = self._counters.popitem(last=False)
+            self._periods.pop(evicted, None)
+        self._periods[key] = period_ms
+
+        used = counter.known + counter.pending
+        reset_at = (window + 1) * period_ms
+        if used + cost > limit:
+            return RateLimitResult(False, limit, max(limit - used, 0), reset_at, reset_at - now)
+
+        counter.pending += cost
+        if self._timer is None and math.isfinite(self.flush_interval_ms):
+            self._timer = asyncio.create_task(self._run_timer())
+        self._schedule_flush(now)
+        return RateLimitResult(True, limit, limit - used - cost, reset_at, 0.0)
+
+    def _schedule_flush(self, now: float) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        if now - self._last_flush < self.flush_interval_ms:
+            return
+        self._last_flush = now
+        self._flush_task = asyncio.create_task(self.flush())
+
+    async def _run_timer(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_ms / 1000)
+            if any(c.pending for c in self._counters.values()):
+                self._schedule_flush(time.time() * 1000)
+
+    async def stop(self) -> None:
+        """Stop the timer and push what is still unflushed. Called by the app lifespan."""
+        if self._timer is not None:
+            self._timer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._timer
+            self._timer = None
+        if self._flush_task is not None:
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Push unflushed increments to the store and refresh global totals."""
+        now = time.time() * 1000
+        batch = [(key, c, c.window, c.pending) for key, c in self._counters.items() if c.pending]
+        if not batch:
+            return
+        items = []
+        for key, _, window, amount in batch:
+            period_ms = self._periods[key]
+            ttl_ms = int((window + 1) * period_ms - now) + 1000
+            items.append((f"{self.key_prefix}{key}:{window}", amount, max(ttl_ms, 1000)))
+        try:
+            totals = await self.store.incr_batch(items)
+        except Exception as exc:
+            # Fail open: keep the increments pending and retry on the next flush
+            logger.warning("[ratelimit] Shared counter flush failed: %s", exc)
+            return
+        for (_, counter, window, amount), total in zip(batch, totals):
+            if counter.window == window:
+                counter.pending -= amount
+                counter.known = total
+
+    def clear(self) -> None:
+        self._counters.clear()
+        self._periods.clear()
+
+
+def create_rate_limit_backend() -> RateLimitBackend:
+    if settings.rate_limit_backend == "redis":
+        return SharedRateLimitBackend(
+            RedisCounterStore(settings.rate_limit_redis_url),
+            flush_interval_ms=settings.rate_limit_flush_interval_ms,
+            max_keys=settings.rate_limit_max_keys,
+        )
+    return GCRALimiter(max_keys=settings.rate_limit_max_keys)
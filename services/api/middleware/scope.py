@@ -0,0 +1,57 @@
+"""Per-request header and cookie parsing shared by the ASGI middleware stack.
+
+Headers and cookies are parsed at most once per request and memoized on the
+ASGI scope, so every middleware and dependency downstream reads the same
+dicts instead of re-parsing the raw header list.
+"""
+
+from starlette.types import Scope
+
+_HEADERS_KEY = "aiapp.headers"
+_COOKIES_KEY = "aiapp.cookies"
+
+
+def parse_cookies(cookie_header: str | None) -> dict[str, str]:
+    """Parse a raw cookie header string into a dict."""
+    if not cookie_header:
+        return {}
+    cookies: dict[str, str] = {}
+    for pair in cookie_header.split(";"):
+        pair = pair.strip()
+        if not pair:
+            continue
+        parts = pair.split("=", 1)
+        if len(parts) == 2:
+            cookies[parts[0].strip()] = parts[1].strip()
+    return cookies
+
+
+def get_headers(scope: Scope) -> dict[str, str]:
+    """Lower-cased request headers; the first value wins for repeated names."""
+    headers = scope.get(_HEADERS_KEY)
+    if headers is None:
+        headers = {}
+        for name, value in scope.get("headers", ()):
+            headers.setdefault(name.decode("latin-1"), value.decode("latin-1"))
+        scope[_HEADERS_KEY] = headers
+    return headers
+
+
+def get_cookies(scope: Scope) -> dict[str, str]:
+    cookies = scope.get(_COOKIES_KEY)
+    if cookies is None:
+        cookies = parse_cookies(get_headers(scope).get("cookie"))
+        scope[_COOKIES_KEY] = cookies
+    return cookies
+
+
+def get_client_ip(scope: Scope) -> str:
+    forwarded = get_headers(scope).get("x-forwarded-for")
+    if forwarded:
+        first_ip = forwarded.split(",")[0].strip()
+        if first_ip:
+            return first_ip
+    client = scope.get("client")
+    if client:
+        return client[0]
+    return "unknown"
@@ -1,114 +1,143 @@
 import math
-import threading
-import time
 import uuid
 
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from config import settings
+from middleware.rate_limit import create_rate_limit_backend
+from middleware.scope import get_client_ip, get_headers
 
 
 # ---------------------------------------------------------------------------
 # Request ID
 # ---------------------------------------------------------------------------
 
-class RequestIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        incoming = request.headers.get("x-request-id", "").strip()
+class RequestIdMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = get_headers(scope).get("x-request-id", "").strip()
         request_id = incoming if incoming else str(uuid.uuid4())
-        request.state.request_id = request_id
-        response: Response = await call_next(request)
-        response.headers["x-request-id"] = request_id
-        return response
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["x-request-id"] = request_id
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
 
 
 # ---------------------------------------------------------------------------
 # Security headers
 # ---------------------------------------------------------------------------
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response: Response = await call_next(request)
-        response.headers["x-content-type-options"] = "nosniff"
-        response.headers["x-frame-options"] = "DENY"
-        response.headers["referrer-policy"] = "no-referrer"
-        response.headers["x-dns-prefetch-control"] = "off"
-        response.headers["x-xss-protection"] = "0"
-        response.headers["permissions-policy"] = "camera=(), microphone=(), geolocation=()"
-        response.headers["content-security-policy"] = (
-            "default-src 'none'; frame-ancestors 'none'; base-uri 'none'"
-        )
-        if settings.is_production:
-            response.headers["strict-transport-security"] = (
-                "max-age=31536000; includeSubDomains"
-            )
-        return response
+def _security_header_block(is_production: bool) -> list[tuple[bytes, bytes]]:
+    headers = {
+        "x-content-type-options": "nosniff",
+        "x-frame-options": "DENY",
+        "referrer-policy": "no-referrer",
+        "x-dns-prefetch-control": "off",
+        "x-xss-protection": "0",
+        "permissions-policy": "camera=(), microphone=(), geolocation=()",
+        "content-security-policy": "default-src 'none'; frame-ancestors 'none'; base-uri 'none'",
+    }
+    if is_production:
+        headers["strict-transport-security"] = "max-age=31536000; includeSubDomains"
+    return [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+
+
+class SecurityHeadersMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        # Built once; injected as raw header pairs into every response
+        self.header_block = _security_header_block(settings.is_production)
+        self.header_names = {name for name, _ in self.header_block}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_security_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                raw = [h for h in message.get("headers", ()) if h[0].lower() not in self.header_names]
+                raw.extend(self.header_block)
+                message["headers"] = raw
+            await send(message)
+
+        await self.app(scope, receive, send_with_security_headers)
 
 
 # ---------------------------------------------------------------------------
-# Rate limiting (in-memory, per IP:METHOD)
+# Rate limiting (GCRA, per IP:METHOD, weighted by route cost)
 # ---------------------------------------------------------------------------
 
-_rate_limit_store: dict[str, dict] = {}
-_rate_limit_lock = threading.Lock()
+rate_limiter = create_rate_limit_backend()
 
 
 def _get_request_ip(request: Request) -> str:
-    forwarded = request.headers.get("x-forwarded-for")
-    if forwarded:
-        first_ip = forwarded.split(",")[0].strip()
-        if first_ip:
-            return first_ip
-    if request.client:
-        return request.client.host
-    return "unknown"
-
-
-def _cleanup_rate_limit_store() -> None:
-    now = time.time() * 1000
-    expired = [k for k, v in _rate_limit_store.items() if v["resetAt"] <= now]
-    for k in expired:
-        _rate_limit_store.pop(k, None)
-
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        ip = _get_request_ip(request)
-        key = f"{ip}:{request.method}"
-        now = time.time() * 1000
-        max_requests = settings.rate_limit_max
-        window_ms = settings.rate_limit_window_ms
-
-        with _rate_limit_lock:
-            _cleanup_rate_limit_store()
-            entry = _rate_limit_store.get(key)
-            if not entry or entry["resetAt"] <= now:
-                entry = {"count": 1, "resetAt": now + window_ms}
-                _rate_limit_store[key] = entry
-            else:
-                entry["count"] += 1
-
-            count = entry["count"]
-            reset_at = entry["resetAt"]
-
-        remaining = max(max_requests - count, 0)
-
-        if count > max_requests:
-            retry_after = max(math.ceil((reset_at - now) / 1000), 1)
+    return get_client_ip(request.scope)
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.route_costs = sorted(
+            settings.rate_limit_route_costs.items(),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+
+    def _route_cost(self, path: str) -> int:
+        for prefix, cost in self.route_costs:
+            if path.startswith(prefix):
+                return cost
+        return 1
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ip = get_client_ip(scope)
+        limit = settings.rate_limit_max
+        result = await rate_limiter.acquire(
+            f"{ip}:{scope['method']}",
+            # A cost above the burst could never be paid: charge the whole burst
+            cost=min(self._route_cost(scope["path"]), limit),
+            limit=limit,
+            period_ms=settings.rate_limit_window_ms,
+        )
+        limit_headers = {
+            "x-ratelimit-limit": str(result.limit),
+            "x-ratelimit-remaining": str(result.remaining),
+            "x-ratelimit-reset": str(math.ceil(result.reset_at_ms / 1000)),
+        }
+
+        if not result.allowed:
+            retry_after = max(math.ceil(result.retry_after_ms / 1000), 1)
             resp = JSONResponse(
                 status_code=429,
                 content={"error": "Too many requests"},
+                headers={**limit_headers, "retry-after": str(retry_after)},
             )
-            resp.headers["x-ratelimit-limit"] = str(max_requests)
-            resp.headers["x-ratelimit-remaining"] = "0"
-            resp.headers["x-ratelimit-reset"] = str(math.ceil(reset_at / 1000))
-            resp.headers["retry-after"] = str(retry_after)
-            return resp
-
-        response: Response = await call_next(request)
-        response.headers["x-ratelimit-limit"] = str(max_requests)
-        response.headers["x-ratelimit-remaining"] = str(remaining)
-        response.headers["x-ratelimit-reset"] = str(math.ceil(reset_at / 1000))
-        return response
+            await resp(scope, receive, send)
+            return
+
+        async def send_with_limit_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in limit_headers.items():
+                    headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_limit_headers)
@@ -1,7 +1,7 @@
 from .base import Base, engine, async_session
 from .user import User, Session, Account, Verification
 from .project import Project, Sandbox
-from .chat import Chat, Message
+from .chat import Chat, ChatArchiveSegment, Message, MessageChunk
 
 __all__ = [
     "Base",
@@ -14,5 +14,7 @@ __all__ = [
     "Project",
     "Sandbox",
     "Chat",
+    "ChatArchiveSegment",
     "Message",
+    "MessageChunk",
 ]
@@ -1,11 +1,48 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 
 from config import settings
+from services.query_stats import instrument
+from .pool import InstrumentedAsyncQueuePool, track_connections
 
-engine = create_async_engine(settings.async_database_url, pool_size=5, max_overflow=10)
+
+def _connect_args(url: str) -> dict:
+    if not url.startswith("postgresql+asyncpg"):
+        return {}
+    return {
+        # asyncpg's own statement cache and SQLAlchemy's prepared-statement
+        # cache on top of it are sized together
+        "statement_cache_size": settings.db_statement_cache_size,
+        "prepared_statement_cache_size": settings.db_statement_cache_size,
+    }
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    db_engine = create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=_connect_args(url),
+    )
+    instrument(db_engine)
+    track_connections(db_engine)
+    return db_engine
+
+
+engine = _create_engine(settings.async_database_url)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Read replica, if configured. Only ``dependencies.database.get_read_db`` uses it.
+read_engine: AsyncEngine | None = None
+read_async_session: async_sessionmaker[AsyncSession] | None = None
+if settings.async_database_replica_url:
+    read_engine = _create_engine(settings.async_database_replica_url)
+    read_async_session = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
 
 class Base(DeclarativeBase):
     pass
@@ -1,32 +1,106 @@
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, ForeignKey, func
+from sqlalchemy import String, DateTime, ForeignKey, Index, Integer, LargeBinary, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
+from .search import SearchVector, install_sqlite_fts
 
 
 class Chat(Base):
     __tablename__ = "Chat"
+    __table_args__ = (Index("Chat_projectId_idx", "projectId"),)
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     projectId: Mapped[str] = mapped_column(String, ForeignKey("Project.id", ondelete="CASCADE"), nullable=False)
     userId: Mapped[str] = mapped_column(String, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
     createdAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
     updatedAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+    # Set while the messages live in object storage (services.chat_archive)
+    archivedAt: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Last time archived messages were restored; an opened chat is not re-archived right away
+    hydratedAt: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     project: Mapped["Project"] = relationship(back_populates="chats")  # noqa: F821
     user: Mapped["User"] = relationship(back_populates="chats")  # noqa: F821
     messages: Mapped[list["Message"]] = relationship(back_populates="chat")
+    archiveSegments: Mapped[list["ChatArchiveSegment"]] = relationship(back_populates="chat")
 
 
 class Message(Base):
     __tablename__ = "Message"
+    __table_args__ = (
+        Index("Message_chatId_createdAt_idx", "chatId", "createdAt"),
+        Index("Message_chatId_tokenOffset_idx", "chatId", "tokenOffset"),
+        Index("Message_chatId_role_idx", "chatId", "role"),
+        # Postgres only: GIN over (chatId, searchVector) via btree_gin, and
+        # trigrams on plain-stored bodies for the substring fallback
+        Index(
+            "Message_chatId_searchVector_idx", "chatId", "searchVector", postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "Message_content_trgm_idx",
+            "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     chatId: Mapped[str] = mapped_column(String, ForeignKey("Chat.id", ondelete="CASCADE"), nullable=False)
     role: Mapped[str] = mapped_column(String, nullable=False)  # 'user' | 'assistant' | 'system'
+    # Empty when the body is stored compressed in contentZstd (services.message_codec)
     content: Mapped[str] = mapped_column(String, nullable=False)
+    contentZstd: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    # Digest of the plain-text body; upserts skip rows whose digest is unchanged
+    contentHash: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Estimated tokens, and the sum over earlier messages (services.context_window)
+    tokenCount: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    tokenOffset: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # Full-text index of the body, bound from its plain text (services.message_search)
+    searchVector: Mapped[str | None] = mapped_column(SearchVector, nullable=True, deferred=True)
     createdAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
 
     chat: Mapped["Chat"] = relationship(back_populates="messages")
+
+
+install_sqlite_fts(Message.__table__)
+
+
+class MessageChunk(Base):
+    """A streamed delta not yet folded into ``Message.content``.
+
+    ``start`` is the character offset of ``content`` within the full message.
+    """
+
+    __tablename__ = "MessageChunk"
+
+    messageId: Mapped[str] = mapped_column(
+        String, ForeignKey("Message.id", ondelete="CASCADE"), primary_key=True
+    )
+    start: Mapped[int] = mapped_column(Integer, primary_key=True)
+    content: Mapped[str] = mapped_column(String, nullable=False)
+    createdAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+
+class ChatArchiveSegment(Base):
+    """Stub for a run of a chat's messages moved to object storage.
+
+    The segment at ``key`` holds the messages from ``firstCreatedAt`` to
+    ``lastCreatedAt`` as zstd-compressed NDJSON.
+    """
+
+    __tablename__ = "ChatArchiveSegment"
+    __table_args__ = (Index("ChatArchiveSegment_chatId_idx", "chatId"),)
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    chatId: Mapped[str] = mapped_column(String, ForeignKey("Chat.id", ondelete="CASCADE"), nullable=False)
+    key: Mapped[str] = mapped_column(String, nullable=False)
+    messageCount: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Compressed size of the object
+    bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    firstCreatedAt: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    lastCreatedAt: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    createdAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+    chat: Mapped["Chat"] = relationship(back_populates="archiveSegments")
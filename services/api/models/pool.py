@@ -0,0 +1,182 @@
+"""Connection pool instrumentation and warm-up.
+
+``InstrumentedAsyncQueuePool`` keeps a ``PoolStats`` of its own, so the
+primary and the replica engine each report their numbers separately. It
+times every checkout so callers can see when
+requests are queueing for a connection. Waits that are still in progress are
+tracked too, so a pool that is completely jammed is visible immediately rather
+than only after the stuck checkouts finally complete.
+
+Completed waits also feed a cumulative histogram, and pool events record when
+each DBAPI connection was opened so ``pool_metrics`` can report connection
+ages next to the checked-out and overflow counts.
+"""
+
+import asyncio
+import contextlib
+import itertools
+import logging
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+_EWMA_ALPHA = 0.2
+
+# Upper bounds (ms) of the checkout wait histogram buckets; the last is +Inf
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolStats:
+    def __init__(self) -> None:
+        self._waiting: dict[int, float] = {}
+        self._ids = itertools.count()
+        self.checkouts = 0
+        self.wait_ewma_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_sum_ms = 0.0
+        self._opened_at: dict[int, float] = {}
+        self.connections_opened = 0
+        self.connections_closed = 0
+
+    def begin_wait(self) -> int:
+        wait_id = next(self._ids)
+        self._waiting[wait_id] = time.perf_counter()
+        return wait_id
+
+    def end_wait(self, wait_id: int) -> None:
+        started = self._waiting.pop(wait_id, None)
+        if started is None:
+            return
+        waited_ms = (time.perf_counter() - started) * 1000
+        self.checkouts += 1
+        self.wait_ewma_ms += _EWMA_ALPHA * (waited_ms - self.wait_ewma_ms)
+        self.wait_sum_ms += waited_ms
+        for i, bound in enumerate(WAIT_BUCKETS_MS):
+            if waited_ms <= bound:
+                self.wait_buckets[i] += 1
+                break
+        else:
+            self.wait_buckets[-1] += 1
+
+    def connection_opened(self, record_id: int) -> None:
+        self._opened_at[record_id] = time.monotonic()
+        self.connections_opened += 1
+
+    def connection_closed(self, record_id: int) -> None:
+        if self._opened_at.pop(record_id, None) is not None:
+            self.connections_closed += 1
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def oldest_wait_ms(self) -> float:
+        """How long the longest in-progress checkout has been waiting."""
+        if not self._waiting:
+            return 0.0
+        return (time.perf_counter() - min(self._waiting.values())) * 1000
+
+    def connection_ages_s(self) -> list[float]:
+        now = time.monotonic()
+        return sorted(now - opened for opened in self._opened_at.values())
+
+    def wait_histogram(self) -> dict[str, int]:
+        """Cumulative checkout counts per ``le`` bucket, Prometheus style."""
+        histogram = {}
+        total = 0
+        for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets):
+            total += count
+            histogram[str(bound)] = total
+        histogram["+Inf"] = total + self.wait_buckets[-1]
+        return histogram
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self) -> "InstrumentedAsyncQueuePool":
+        # Carried over so the numbers survive an engine dispose
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def connect(self):
+        wait_id = self.stats.begin_wait()
+        try:
+            return super().connect()
+        finally:
+            self.stats.end_wait(wait_id)
+
+
+def track_connections(engine: AsyncEngine) -> None:
+    """Record connection open/close times for ``engine``'s pool."""
+    target = engine.sync_engine
+
+    def on_connect(dbapi_connection, connection_record) -> None:
+        target.pool.stats.connection_opened(id(connection_record))
+
+    def on_close(dbapi_connection, connection_record) -> None:
+        target.pool.stats.connection_closed(id(connection_record))
+
+    event.listen(target, "connect", on_connect)
+    event.listen(target, "close", on_close)
+    # Detached connections are no longer owned by the pool
+    event.listen(target, "detach", on_close)
+
+
+def pool_metrics(pool: QueuePool) -> dict:
+    pool_stats = pool.stats
+    ages = pool_stats.connection_ages_s()
+    return {
+        "size": pool.size(),
+        "checkedOut": pool.checkedout(),
+        "checkedIn": pool.checkedin(),
+        # Negative until the pool has opened ``size`` connections
+        "overflow": max(pool.overflow(), 0),
+        "waiting": pool_stats.waiting,
+        "oldestWaitMs": round(pool_stats.oldest_wait_ms(), 1),
+        "checkouts": pool_stats.checkouts,
+        "waitEwmaMs": round(pool_stats.wait_ewma_ms, 2),
+        "waitSumMs": round(pool_stats.wait_sum_ms, 1),
+        "waitHistogramMs": pool_stats.wait_histogram(),
+        "connectionsOpened": pool_stats.connections_opened,
+        "connectionsClosed": pool_stats.connections_closed,
+        "connectionAgeS": {
+            "count": len(ages),
+            "min": round(ages[0], 1) if ages else None,
+            "max": round(ages[-1], 1) if ages else None,
+        },
+    }
+
+
+async def warm_up(engine: AsyncEngine, connections: int) -> int:
+    """Open ``connections`` pooled connections up front; returns how many opened.
+
+    All connections are held at once so the pool really creates that many,
+    then released back into it. Failures are logged, not raised, so a database
+    that is briefly unavailable does not stop the API from starting.
+    """
+    if connections <= 0:
+        return 0
+    async with contextlib.AsyncExitStack() as stack:
+
+        async def open_one():
+            conn = await stack.enter_async_context(engine.connect())
+            await conn.execute(text("SELECT 1"))
+
+        results = await asyncio.gather(
+            *(open_one() for _ in range(connections)), return_exceptions=True
+        )
+    failures = [r for r in results if isinstance(r, BaseException)]
+    if failures:
+        logger.warning(
+            "[db] Pool warm-up opened %d/%d connections: %s",
+            connections - len(failures), connections, failures[0],
+        )
+    return connections - len(failures)
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, ForeignKey, func
+from sqlalchemy import String, DateTime, ForeignKey, Index, Integer, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -8,6 +8,8 @@ from .base import Base
 
 class Project(Base):
     __tablename__ = "Project"
+    # Index names follow Prisma's convention so both sides agree on the schema
+    __table_args__ = (Index("Project_userId_updatedAt_idx", "userId", "updatedAt"),)
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
@@ -15,6 +17,10 @@ class Project(Base):
     userId: Mapped[str] = mapped_column(String, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
     createdAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
     updatedAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+    # Chat summary, maintained by save_messages (services/project_summary.py repairs drift)
+    messageCount: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    lastActivityAt: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    lastMessagePreview: Mapped[str | None] = mapped_column(String, nullable=True)
 
     user: Mapped["User"] = relationship(back_populates="projects")  # noqa: F821
     chats: Mapped[list["Chat"]] = relationship(back_populates="project")  # noqa: F821
@@ -0,0 +1,134 @@
+"""Routing decisions for the optional read replica.
+
+``get_read_db`` asks ``replica_router.use_replica(keys)`` before opening a
+replica session. The replica is skipped when:
+
+* a key of the request (``user:<id>``, ``project:<id>``) was written within
+  ``replica_sticky_seconds``, so a user always reads their own writes;
+* the last lag probe exceeded ``replica_max_lag_seconds``; or
+* the replica failed a probe or a connection attempt; it stays out of
+  rotation until the next successful probe.
+
+Stickiness is tracked per process, which matches the session cache and the
+in-memory rate limiter.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds of replay lag; 0 on a primary or a fully caught-up standby
+_PG_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery()"
+    " OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class ReplicaRouter:
+    def __init__(self, sticky_seconds: float, max_lag_seconds: float, max_keys: int = 100000) -> None:
+        self.sticky_seconds = sticky_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self.max_keys = max_keys
+        # key -> monotonic deadline, oldest write first
+        self._sticky: OrderedDict[str, float] = OrderedDict()
+        self.healthy = True
+        self.lag_seconds = 0.0
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def mark_write(self, keys: Iterable[str]) -> None:
+        deadline = time.monotonic() + self.sticky_seconds
+        for key in keys:
+            self._sticky[key] = deadline
+            self._sticky.move_to_end(key)
+        while len(self._sticky) > self.max_keys:
+            self._sticky.popitem(last=False)
+
+    def is_sticky(self, keys: Iterable[str]) -> bool:
+        now = time.monotonic()
+        # Deadlines are in insertion order, so expired keys sit at the front
+        while self._sticky:
+            key, deadline = next(iter(self._sticky.items()))
+            if deadline > now:
+                break
+            del self._sticky[key]
+        return any(key in self._sticky for key in keys)
+
+    def use_replica(self, keys: Iterable[str]) -> bool:
+        use = (
+            self.healthy
+            and self.lag_seconds <= self.max_lag_seconds
+            and not self.is_sticky(keys)
+        )
+        if use:
+            self.replica_reads += 1
+        else:
+            self.primary_reads += 1
+        return use
+
+    def mark_down(self, exc: BaseException) -> None:
+        if self.healthy:
+            logger.warning("[db] Read replica unavailable, using primary: %s", exc)
+        self.healthy = False
+        self.replica_reads -= 1
+        self.primary_reads += 1
+
+    def record_probe(self, lag_seconds: float | None) -> None:
+        """Apply a lag probe result; None means the probe failed."""
+        if lag_seconds is None:
+            self.healthy = False
+            return
+        if not self.healthy:
+            logger.info("[db] Read replica back in rotation (lag %.1fs)", lag_seconds)
+        self.healthy = True
+        self.lag_seconds = lag_seconds
+
+    def clear(self) -> None:
+        self._sticky.clear()
+        self.healthy = True
+        self.lag_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "lagSeconds": round(self.lag_seconds, 2),
+            "stickyKeys": len(self._sticky),
+            "replicaReads": self.replica_reads,
+            "primaryReads": self.primary_reads,
+        }
+
+
+replica_router = ReplicaRouter(
+    sticky_seconds=settings.replica_sticky_seconds,
+    max_lag_seconds=settings.replica_max_lag_seconds,
+)
+
+
+async def probe_lag(engine: AsyncEngine) -> float | None:
+    """Replication lag of ``engine`` in seconds, or None if it is unreachable."""
+    try:
+        async with engine.connect() as conn:
+            if engine.dialect.name != "postgresql":
+                await conn.execute(text("SELECT 1"))
+                return 0.0
+            return float((await conn.execute(_PG_LAG_SQL)).scalar() or 0.0)
+    except Exception as exc:
+        logger.warning("[db] Read replica probe failed: %s", exc)
+        return None
+
+
+async def run_replica_monitor(engine: AsyncEngine) -> None:
+    """Probe the replica forever; started by the app lifespan."""
+    while True:
+        replica_router.record_probe(await probe_lag(engine))
+        await asyncio.sleep(settings.replica_check_interval_seconds)
@@ -0,0 +1,70 @@
+"""Search column type for ``Message.searchVector`` (see services.message_search).
+
+Writers bind the message's plain text. On Postgres the bind is wrapped in
+``to_tsvector`` and the column is a ``tsvector``; bodies stored compressed
+have no text for a trigger or generated column to read, so the vector is
+built from the text the API already has in hand. On SQLite (tests and
+benchmarks) the column keeps the text itself and an FTS5 table indexes it
+through triggers.
+"""
+
+from sqlalchemy import DDL, Table, Text, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import TypeDecorator
+
+# Postgres text search configuration for both the vectors and the queries
+SEARCH_CONFIG = "english"
+# SQLite FTS5 table over Message.searchVector
+FTS_TABLE = "MessageSearch"
+
+
+class to_search_vector(FunctionElement):
+    inherit_cache = True
+
+
+@compiles(to_search_vector)
+def _to_search_vector(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(to_search_vector, "postgresql")
+def _to_search_vector_pg(element, compiler, **kw):
+    return f"to_tsvector('{SEARCH_CONFIG}'::regconfig, {compiler.process(element.clauses, **kw)})"
+
+
+class SearchVector(TypeDecorator):
+    """``tsvector`` on Postgres, text elsewhere; always bound from plain text."""
+
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(TSVECTOR())
+        return dialect.type_descriptor(Text())
+
+    def bind_expression(self, bindvalue):
+        return to_search_vector(bindvalue)
+
+
+def install_sqlite_fts(table: Table) -> None:
+    """Create the FTS5 index and its sync triggers along with ``table`` on SQLite."""
+    name = table.name
+    statements = [
+        f'CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5('
+        f'"searchVector", content=\'{name}\', content_rowid=\'rowid\', tokenize=\'porter unicode61\')',
+        f'CREATE TRIGGER "{name}_search_ai" AFTER INSERT ON "{name}" BEGIN '
+        f'INSERT INTO "{FTS_TABLE}"(rowid, "searchVector") VALUES (new.rowid, new."searchVector"); END',
+        f'CREATE TRIGGER "{name}_search_ad" AFTER DELETE ON "{name}" BEGIN '
+        f'INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, "searchVector") '
+        f'VALUES (\'delete\', old.rowid, old."searchVector"); END',
+        f'CREATE TRIGGER "{name}_search_au" AFTER UPDATE OF "searchVector" ON "{name}" BEGIN '
+        f'INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, "searchVector") '
+        f'VALUES (\'delete\', old.rowid, old."searchVector"); '
+        f'INSERT INTO "{FTS_TABLE}"(rowid, "searchVector") VALUES (new.rowid, new."searchVector"); END',
+    ]
+    for statement in statements:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    event.listen(table, "before_drop", DDL(f'DROP TABLE IF EXISTS "{FTS_TABLE}"').execute_if(dialect="sqlite"))
@@ -1,18 +1,33 @@
 """Chat persistence endpoints — nested under /api/projects/{project_id}/chat."""
 
+import base64
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timezone
 
+import orjson
 from cuid2 import cuid_wrapper
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-
-from dependencies.database import get_db
-from models.chat import Chat, Message
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import models.base
+from config import settings
+from dependencies.database import get_db, get_read_db, get_session_factory, read_session, sticky_keys
+from models.chat import Chat, Message, MessageChunk
 from models.project import Project
+from models.replica import replica_router
+from services.chat_archive import ArchiveUnavailable, hydrate_chat
+from services.context_window import context_window
+from services.group_commit import WriterOverloaded, group_commit_writer
+from services.message_chunks import OffsetConflict, append_chunk, compact_message, pending_tails
+from services.message_codec import decode_content
+from services.message_search import highlight, highlight_pattern, search_messages
+from services.messages import upsert_messages
+from services.project_summary import message_preview
+from services.singleflight import read_coalescer
 
 logger = logging.getLogger(__name__)
 
@@ -32,105 +47,513 @@ class SaveMessagesInput(BaseModel):
     messages: list[MessageInput]
 
 
+class AppendChunkInput(BaseModel):
+    userId: str
+    role: str = "assistant"
+    # Offset of ``chunk`` in the full message, in characters (code points)
+    offset: int = Field(ge=0)
+    chunk: str = Field(min_length=1)
+    # Last chunk of the stream: fold the pending chunks into the message now
+    final: bool = False
+
+
+# Response structs: serialized directly by orjson, skipping jsonable_encoder
+@dataclass(slots=True)
+class ChatOut:
+    id: str
+    projectId: str
+    userId: str
+    createdAt: datetime
+    updatedAt: datetime
+
+
+@dataclass(slots=True)
+class MessageOut:
+    id: str
+    role: str
+    content: str
+    createdAt: datetime
+
+
+@dataclass(slots=True)
+class ChatHistoryOut:
+    chat: ChatOut | None
+    messages: list[MessageOut]
+    # Pass as ``before`` / ``after`` to page further; None when nothing is there
+    olderCursor: str | None = None
+    newerCursor: str | None = None
+
+
+@dataclass(slots=True)
+class ContextMessageOut(MessageOut):
+    tokenCount: int
+
+
+@dataclass(slots=True)
+class ChatContextOut:
+    chat: ChatOut | None
+    messages: list[ContextMessageOut]
+    tokenCount: int = 0
+    # Older messages were left out to fit the budget
+    truncated: bool = False
+
+
+@dataclass(slots=True)
+class SearchResultOut:
+    id: str
+    role: str
+    createdAt: datetime
+    # Excerpt around the first match; highlights are [start, end) offsets into it
+    snippet: str
+    highlights: list[tuple[int, int]]
+    rank: float
+
+
+@dataclass(slots=True)
+class ChatSearchOut:
+    chat: ChatOut | None
+    results: list[SearchResultOut]
+    # "fulltext", or "substring" when the full-text index found nothing
+    match: str = "fulltext"
+    # Pass as ``offset`` for the next page; None on the last one
+    nextOffset: int | None = None
+    # Substring matches only: the scan stopped at its cap, so later
+    # messages may match too
+    partial: bool = False
+
+
+def _chat_out(chat: Chat) -> ChatOut:
+    return ChatOut(
+        id=chat.id,
+        projectId=chat.projectId,
+        userId=chat.userId,
+        createdAt=chat.createdAt,
+        updatedAt=chat.updatedAt,
+    )
+
+
+class _ArchivedChat(Exception):
+    """The chat a write targets is archived: hydrate it, then write again."""
+
+    def __init__(self, chat_id: str):
+        super().__init__(chat_id)
+        self.chat_id = chat_id
+
+
+async def _hydrate(
+    request: Request, factory: async_sessionmaker[AsyncSession], chat_id: str
+) -> None:
+    """Restore an archived chat's messages in sessions of its own (services.chat_archive)."""
+    try:
+        await hydrate_chat(factory, chat_id)
+    except ArchiveUnavailable as exc:
+        logger.error("[archive] %s", exc)
+        raise HTTPException(status_code=503, detail="Chat history is temporarily unavailable") from None
+    # A replica has not seen the restored rows yet
+    replica_router.mark_write(sticky_keys(request))
+
+
+async def _reader(
+    request: Request,
+    db: AsyncSession,
+    primary: AsyncSession,
+    factory: async_sessionmaker[AsyncSession],
+    chat: Chat,
+) -> AsyncSession:
+    """Session to read the chat's messages from, hydrating an archived chat first."""
+    if chat.archivedAt is None:
+        return db
+    # Hold no connection while the segments download; ``chat`` stays loaded
+    await db.close()
+    await _hydrate(request, factory, chat.id)
+    return primary
+
+
+def _encode_cursor(m: MessageOut) -> str:
+    raw = f"{m.createdAt.isoformat()}|{m.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), message_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+
 @router.get("")
 async def get_chat(
     project_id: str,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    before: str | None = None,
+    after: str | None = None,
+    limit: int = Query(default=settings.chat_page_size, ge=1, le=settings.chat_page_max),
+    db: AsyncSession = Depends(get_read_db),
+    primary: AsyncSession = Depends(get_db),
+    factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
 ):
-    """Load the chat and messages for a project."""
-    stmt = (
-        select(Chat)
-        .options(selectinload(Chat.messages))
-        .where(Chat.projectId == project_id)
-    )
-    result = await db.execute(stmt)
-    chat = result.scalar_one_or_none()
+    """Load the chat and one page of its messages, oldest first.
 
+    Without a cursor this is the latest ``limit`` messages. ``before`` pages
+    towards older messages (scrolling up), ``after`` towards newer ones.
+    Keyset pagination on ``(createdAt, id)`` via the (chatId, createdAt) index.
+    An archived chat is hydrated from object storage first.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    cursor = _decode_cursor(before or after) if (before or after) else None
+
+    async def load() -> ChatHistoryOut:
+        chat = (
+            await db.execute(select(Chat).where(Chat.projectId == project_id))
+        ).scalar_one_or_none()
+
+        if not chat:
+            return ChatHistoryOut(chat=None, messages=[])
+        reader = await _reader(request, db, primary, factory, chat)
+
+        key = tuple_(Message.createdAt, Message.id)
+        stmt = select(
+            Message.id, Message.role, Message.content, Message.contentZstd, Message.createdAt
+        ).where(Message.chatId == chat.id)
+        if after:
+            stmt = stmt.where(key > tuple_(*cursor)).order_by(Message.createdAt, Message.id)
+        else:
+            if before:
+                stmt = stmt.where(key < tuple_(*cursor))
+            stmt = stmt.order_by(Message.createdAt.desc(), Message.id.desc())
+        # One extra row tells whether another page exists
+        rows = (await reader.execute(stmt.limit(limit + 1))).all()
+        has_more = len(rows) > limit
+        messages = [
+            MessageOut(id=id_, role=role, content=decode_content(content, packed), createdAt=created_at)
+            for id_, role, content, packed, created_at in rows[:limit]
+        ]
+        if not after:
+            messages.reverse()
+        # Messages still streaming have deltas not yet folded into content
+        tails = await pending_tails(reader, [m.id for m in messages])
+        for m in messages:
+            if m.id in tails:
+                m.content += tails[m.id]
+
+        older = newer = None
+        if messages:
+            first, last = _encode_cursor(messages[0]), _encode_cursor(messages[-1])
+            if after:
+                older, newer = first, last if has_more else None
+            else:
+                older, newer = first if has_more else None, last if before else None
+        return ChatHistoryOut(
+            chat=_chat_out(chat),
+            messages=messages,
+            olderCursor=older,
+            newerCursor=newer,
+        )
+
+    # A replica may lag the primary: never hand one's page to the other's readers
+    source = "primary" if db is primary else "replica"
+    key = ("get_chat", project_id, None, source, before, after, limit)
+    return ORJSONResponse(await read_coalescer.run(key, load))
+
+
+@router.get("/context")
+async def get_chat_context(
+    project_id: str,
+    request: Request,
+    budget: int = Query(ge=1, le=settings.chat_context_max_budget),
+    db: AsyncSession = Depends(get_read_db),
+    primary: AsyncSession = Depends(get_db),
+    factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+):
+    """Context for the next LLM call: pinned messages plus the newest that fit.
+
+    ``budget`` is in tokens as estimated when each message was saved. The
+    window comes from an index range on the running token sum, so the cost
+    depends on the number of messages returned, not the chat's length.
+    """
+    chat = (
+        await db.execute(select(Chat).where(Chat.projectId == project_id))
+    ).scalar_one_or_none()
     if not chat:
-        return {"chat": None, "messages": []}
-
-    messages = sorted(chat.messages, key=lambda m: m.createdAt)
-    return {
-        "chat": {
-            "id": chat.id,
-            "projectId": chat.projectId,
-            "userId": chat.userId,
-            "createdAt": chat.createdAt.isoformat(),
-            "updatedAt": chat.updatedAt.isoformat(),
-        },
-        "messages": [
-            {
-                "id": m.id,
-                "role": m.role,
-                "content": m.content,
-                "createdAt": m.createdAt.isoformat(),
-            }
-            for m in messages
+        return ORJSONResponse(ChatContextOut(chat=None, messages=[]))
+    reader = await _reader(request, db, primary, factory, chat)
+
+    window = await context_window(reader, chat.id, budget)
+    tails = await pending_tails(reader, [m.id for m in window.messages])
+    return ORJSONResponse(ChatContextOut(
+        chat=_chat_out(chat),
+        messages=[
+            ContextMessageOut(
+                id=m.id,
+                role=m.role,
+                content=m.content + tails.get(m.id, ""),
+                createdAt=m.createdAt,
+                tokenCount=m.tokenCount,
+            )
+            for m in window.messages
         ],
-    }
+        tokenCount=window.token_count,
+        truncated=window.truncated,
+    ))
 
 
-@router.post("/messages")
-async def save_messages(
+@router.get("/search")
+async def search_chat(
     project_id: str,
-    body: SaveMessagesInput,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=settings.chat_search_page_size, ge=1, le=settings.chat_search_page_max),
+    offset: int = Query(default=0, ge=0, le=settings.chat_search_max_offset),
+    db: AsyncSession = Depends(get_read_db),
+    primary: AsyncSession = Depends(get_db),
+    factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
 ):
-    """Save messages (batch upsert). Called server-to-server from chat route."""
-    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    """Search the chat's messages, best match first, with highlighted snippets.
 
-    # Verify project exists
-    proj_stmt = select(Project).where(Project.id == project_id)
-    proj_result = await db.execute(proj_stmt)
-    project = proj_result.scalar_one_or_none()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    ``q`` is web-search syntax on Postgres ("quoted phrases", or, -exclude).
+    Served by the (chatId, searchVector) GIN index; see
+    ``services.message_search`` for the substring fallback.
+    """
+    chat = (
+        await db.execute(select(Chat).where(Chat.projectId == project_id))
+    ).scalar_one_or_none()
+    if not chat:
+        return ORJSONResponse(ChatSearchOut(chat=None, results=[]))
 
-    # Find or create chat
-    chat_stmt = select(Chat).where(Chat.projectId == project_id)
-    chat_result = await db.execute(chat_stmt)
-    chat = chat_result.scalar_one_or_none()
+    page = await search_messages(await _reader(request, db, primary, factory, chat), chat.id, q, limit, offset)
+    pattern = highlight_pattern(q, page.match)
+    results = []
+    for hit in page.hits:
+        snippet, spans = highlight(hit.text, pattern, settings.chat_search_snippet_chars)
+        results.append(SearchResultOut(
+            id=hit.id,
+            role=hit.role,
+            createdAt=hit.createdAt,
+            snippet=snippet,
+            highlights=spans,
+            rank=hit.rank,
+        ))
+    return ORJSONResponse(ChatSearchOut(
+        chat=_chat_out(chat),
+        results=results,
+        match=page.match,
+        nextOffset=offset + limit if page.has_more else None,
+        partial=page.partial,
+    ))
 
-    if not chat:
-        chat = Chat(
-            id=cuid(),
+
+@router.get("/export")
+async def export_chat(
+    project_id: str,
+    request: Request,
+    factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+):
+    """Stream the whole chat as NDJSON for exports and re-indexing.
+
+    The first line is ``{"chat": ...}`` (null if the project has no chat),
+    then one message per line, oldest first. Rows come from a server-side
+    cursor in ``chat_export_batch_size`` batches and each batch is written
+    as it is read, so memory does not grow with the length of the chat.
+    """
+    # Hydrate before the response starts: errors cannot be reported mid-stream
+    async with factory() as primary:
+        archived_id = (
+            await primary.execute(
+                select(Chat.id).where(Chat.projectId == project_id, Chat.archivedAt.is_not(None))
+            )
+        ).scalar_one_or_none()
+    if archived_id is not None:
+        await _hydrate(request, factory, archived_id)
+
+    async def lines():
+        # Dependencies have exited by the time the body streams: own the session
+        async with read_session(request, factory) as db:
+            chat = (
+                await db.execute(select(Chat).where(Chat.projectId == project_id))
+            ).scalar_one_or_none()
+            yield orjson.dumps({"chat": _chat_out(chat) if chat else None}) + b"\n"
+            if chat is None:
+                return
+
+            # Only messages still streaming have chunks, so this stays small
+            streaming_ids = (
+                await db.execute(
+                    select(MessageChunk.messageId.distinct())
+                    .join(Message, Message.id == MessageChunk.messageId)
+                    .where(Message.chatId == chat.id)
+                )
+            ).scalars().all()
+            tails = await pending_tails(db, list(streaming_ids))
+            result = await db.stream(
+                select(Message.id, Message.role, Message.content, Message.contentZstd, Message.createdAt)
+                .where(Message.chatId == chat.id)
+                .order_by(Message.createdAt, Message.id)
+                .execution_options(yield_per=settings.chat_export_batch_size)
+            )
+            async for rows in result.partitions():
+                yield b"".join(
+                    orjson.dumps(MessageOut(
+                        id=id_,
+                        role=role,
+                        content=decode_content(content, packed) + tails.get(id_, ""),
+                        createdAt=created_at,
+                    )) + b"\n"
+                    for id_, role, content, packed, created_at in rows
+                )
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def _chat_id_for_save(db: AsyncSession, project_id: str, user_id: str, now: datetime) -> str:
+    """The project's chat id, creating the chat on first save. 404 if no project.
+
+    Raises ``_ArchivedChat`` for an archived chat: the caller hydrates it
+    outside the write's transaction and writes again.
+    """
+    # Project existence and the chat lookup in one round trip
+    lookup = (
+        select(Project.id, Chat.id, Chat.archivedAt)
+        .outerjoin(Chat, Chat.projectId == Project.id)
+        .where(Project.id == project_id)
+        .limit(1)
+    )
+    row = (await db.execute(lookup)).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    chat_id, archived_at = row[1], row[2]
+    if archived_at is not None:
+        raise _ArchivedChat(chat_id)
+
+    if chat_id is None:
+        chat_id = cuid()
+        db.add(Chat(
+            id=chat_id,
             projectId=project_id,
-            userId=body.userId,
+            userId=user_id,
             createdAt=now,
             updatedAt=now,
-        )
-        db.add(chat)
+        ))
         await db.flush()
+    return chat_id
+
+
+async def _save_messages(db: AsyncSession, project_id: str, body: SaveMessagesInput) -> str:
+    """Write a save's rows without committing; returns the chat id."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    chat_id = await _chat_id_for_save(db, project_id, body.userId, now)
+
+    result = await upsert_messages(db, chat_id, body.messages, now)
 
-    # Upsert messages
-    existing_ids = set()
-    if body.messages:
-        msg_ids = [m.id for m in body.messages]
-        existing_stmt = select(Message.id).where(Message.id.in_(msg_ids))
-        existing_result = await db.execute(existing_stmt)
-        existing_ids = {row[0] for row in existing_result}
-
-    for msg in body.messages:
-        if msg.id in existing_ids:
-            # Update content (assistant messages may grow during streaming)
-            update_stmt = (
-                select(Message).where(Message.id == msg.id)
+    if result.inserted or result.updated:
+        await db.execute(update(Chat).where(Chat.id == chat_id).values(updatedAt=now))
+        # Summary for the project list; the increment is applied in SQL so
+        # concurrent saves cannot lose counts
+        await db.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(
+                messageCount=Project.messageCount + result.inserted,
+                lastActivityAt=result.last_inserted_at or now,
+                lastMessagePreview=message_preview(body.messages[-1].content),
+                updatedAt=now,
             )
-            update_result = await db.execute(update_stmt)
-            existing_msg = update_result.scalar_one_or_none()
-            if existing_msg:
-                existing_msg.content = msg.content
-        else:
-            new_msg = Message(
-                id=msg.id,
-                chatId=chat.id,
-                role=msg.role,
-                content=msg.content,
-                createdAt=now,
+        )
+    return chat_id
+
+
+@router.post("/messages")
+async def save_messages(
+    project_id: str,
+    body: SaveMessagesInput,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+):
+    """Save messages (batch upsert). Called server-to-server from chat route.
+
+    With ``group_commit_enabled`` the write joins other concurrent saves in
+    one transaction; the response still waits for its commit.
+    """
+    async def write() -> str:
+        if settings.group_commit_enabled:
+            keys = sticky_keys(request) if models.base.read_async_session is not None else ()
+            return await group_commit_writer.submit(
+                lambda batch_db: _save_messages(batch_db, project_id, body), sticky_keys=keys
             )
-            db.add(new_msg)
+        chat_id = await _save_messages(db, project_id, body)
+        await db.commit()
+        return chat_id
 
-    chat.updatedAt = now
+    try:
+        try:
+            chat_id = await write()
+        except _ArchivedChat as exc:
+            # Restore the history first so the save lands after it, in order
+            await db.rollback()
+            await _hydrate(request, factory, exc.chat_id)
+            chat_id = await write()
+    except WriterOverloaded:
+        return ORJSONResponse(
+            {"error": "Too many pending saves"},
+            status_code=503,
+            headers={"retry-after": str(settings.admission_retry_after_seconds)},
+        )
+    read_coalescer.forget_prefix(("get_chat", project_id))
+
+    return {"status": "ok", "chatId": chat_id}
+
+
+@router.post("/messages/{message_id}/chunks")
+async def append_message_chunk(
+    project_id: str,
+    message_id: str,
+    body: AppendChunkInput,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+):
+    """Append a streamed delta to a message without rewriting its content.
+
+    Send chunks in order with ``offset`` = characters sent so far; the first
+    chunk creates the message. A wrong offset is a 409 whose body carries
+    ``expectedOffset`` so the client can resume; re-sending a stored chunk is
+    acknowledged. Write cost is linear in the message size.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    try:
+        chat_id = await _chat_id_for_save(db, project_id, body.userId, now)
+    except _ArchivedChat as exc:
+        await db.rollback()
+        await _hydrate(request, factory, exc.chat_id)
+        chat_id = await _chat_id_for_save(db, project_id, body.userId, now)
+
+    try:
+        result = await append_chunk(db, chat_id, message_id, body.role, body.offset, body.chunk, now)
+    except OffsetConflict as exc:
+        # The app's {"error": ...} shape, plus where the client should resume
+        return ORJSONResponse(
+            {"error": "Offset does not match the stored message", "expectedOffset": exc.expected},
+            status_code=409,
+        )
+
+    if result.created:
+        await db.execute(update(Chat).where(Chat.id == chat_id).values(updatedAt=now))
+        await db.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(
+                messageCount=Project.messageCount + 1,
+                lastActivityAt=now,
+                lastMessagePreview=message_preview(body.chunk),
+                updatedAt=now,
+            )
+        )
+    if body.final:
+        await compact_message(db, message_id)
     await db.commit()
+    read_coalescer.forget_prefix(("get_chat", project_id))
 
-    return {"status": "ok", "chatId": chat.id}
+    return {"status": "ok", "chatId": chat_id, "length": result.length}
@@ -3,6 +3,12 @@ from datetime import datetime, timezone
 
 from fastapi import APIRouter
 
+from config import settings
+from models.base import engine, read_engine
+from models.pool import pool_metrics
+from models.replica import replica_router
+from services.group_commit import group_commit_writer
+
 router = APIRouter()
 
 _start_time = time.monotonic()
@@ -15,3 +21,18 @@ async def health():
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "uptime": time.monotonic() - _start_time,
     }
+
+
+@router.get("/health/db")
+async def db_pool_health():
+    """Live connection pool metrics (does not touch the database).
+
+    The primary's pool at the top level; the replica's, if any, under
+    ``replica.pool``.
+    """
+    metrics = pool_metrics(engine.pool)
+    if read_engine is not None:
+        metrics["replica"] = {**replica_router.stats(), "pool": pool_metrics(read_engine.pool)}
+    if settings.group_commit_enabled:
+        metrics["groupCommit"] = group_commit_writer.stats()
+    return metrics
@@ -1,18 +1,21 @@
+from dataclasses import dataclass
 from datetime import datetime, timezone
 
 from cuid2 import cuid_wrapper
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, field_validator
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload
 
 from dependencies.auth import get_current_user
-from dependencies.database import get_db
+from dependencies.database import get_db, get_read_db
 from middleware.security import _get_request_ip
 from models.project import Project, Sandbox
-from models.user import User
 from services.audit import log_audit_event
+from services.queries import UserRow, fetch_sandbox
+from services.singleflight import read_coalescer
 
 router = APIRouter(prefix="/api/projects")
 
@@ -46,52 +49,92 @@ class CreateProjectInput(BaseModel):
         return v
 
 
-def _sandbox_to_dict(s: Sandbox | None) -> dict | None:
+@dataclass(slots=True)
+class SandboxOut:
+    id: str
+    status: str
+    tunnelUrl: str | None
+
+
+@dataclass(slots=True)
+class ProjectOut:
+    id: str
+    name: str
+    description: str | None
+    userId: str
+    createdAt: datetime
+    updatedAt: datetime
+    messageCount: int
+    lastActivityAt: datetime | None
+    lastMessagePreview: str | None
+
+
+@dataclass(slots=True)
+class ProjectWithSandboxOut(ProjectOut):
+    sandbox: SandboxOut | None
+
+
+def _sandbox_out(s: Sandbox | None) -> SandboxOut | None:
     if not s:
         return None
-    return {
-        "id": s.id,
-        "status": s.status,
-        "tunnelUrl": s.tunnelUrl,
-    }
-
-
-def _project_to_dict(p: Project, include_sandbox: bool = False) -> dict:
-    d = {
-        "id": p.id,
-        "name": p.name,
-        "description": p.description,
-        "userId": p.userId,
-        "createdAt": p.createdAt.isoformat(),
-        "updatedAt": p.updatedAt.isoformat(),
-    }
-    if include_sandbox:
-        d["sandbox"] = _sandbox_to_dict(p.sandbox)
-    return d
+    return SandboxOut(id=s.id, status=s.status, tunnelUrl=s.tunnelUrl)
+
+
+def _project_out(p: Project) -> ProjectOut:
+    return ProjectOut(
+        id=p.id,
+        name=p.name,
+        description=p.description,
+        userId=p.userId,
+        createdAt=p.createdAt,
+        updatedAt=p.updatedAt,
+        messageCount=p.messageCount,
+        lastActivityAt=p.lastActivityAt,
+        lastMessagePreview=p.lastMessagePreview,
+    )
+
+
+def _project_with_sandbox_out(p: Project) -> ProjectWithSandboxOut:
+    return ProjectWithSandboxOut(
+        id=p.id,
+        name=p.name,
+        description=p.description,
+        userId=p.userId,
+        createdAt=p.createdAt,
+        updatedAt=p.updatedAt,
+        messageCount=p.messageCount,
+        lastActivityAt=p.lastActivityAt,
+        lastMessagePreview=p.lastMessagePreview,
+        sandbox=_sandbox_out(p.sandbox),
+    )
 
 
 @router.get("")
 async def list_projects(
-    user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    user: UserRow = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """List projects for the authenticated user."""
+    """List projects for the authenticated user.
+
+    One query: chat summaries are denormalized onto ``Project`` and the
+    one-to-one sandbox is joined in.
+    """
     stmt = (
         select(Project)
-        .options(selectinload(Project.sandbox))
+        .options(joinedload(Project.sandbox))
         .where(Project.userId == user.id)
         .order_by(Project.updatedAt.desc())
     )
     result = await db.execute(stmt)
     projects = result.scalars().all()
-    return [_project_to_dict(p, include_sandbox=True) for p in projects]
+    return ORJSONResponse([_project_with_sandbox_out(p) for p in projects])
 
 
 @router.post("", status_code=201)
 async def create_project(
     body: CreateProjectInput,
     request: Request,
-    user: User = Depends(get_current_user),
+    user: UserRow = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """Create a new project for the authenticated user."""
@@ -103,6 +146,7 @@ async def create_project(
         userId=user.id,
         createdAt=now,
         updatedAt=now,
+        messageCount=0,
     )
     db.add(project)
     await db.commit()
@@ -120,31 +164,34 @@ async def create_project(
         },
     )
 
-    return _project_to_dict(project)
+    return ORJSONResponse(_project_out(project), status_code=201)
 
 
 @router.get("/{project_id}")
 async def get_project(
     project_id: str,
-    user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    user: UserRow = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Fetch one project by ID, scoped to authenticated user ownership."""
     if not project_id or not project_id.strip():
         raise HTTPException(status_code=400, detail="Invalid project id")
 
-    stmt = (
-        select(Project)
-        .options(selectinload(Project.sandbox))
-        .where(Project.id == project_id, Project.userId == user.id)
-    )
-    result = await db.execute(stmt)
-    project = result.scalar_one_or_none()
+    async def load() -> ProjectWithSandboxOut:
+        stmt = (
+            select(Project)
+            .options(joinedload(Project.sandbox))
+            .where(Project.id == project_id, Project.userId == user.id)
+        )
+        result = await db.execute(stmt)
+        project = result.scalar_one_or_none()
+
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
 
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+        return _project_with_sandbox_out(project)
 
-    return _project_to_dict(project, include_sandbox=True)
+    return ORJSONResponse(await read_coalescer.run(("get_project", project_id, user.id), load))
 
 
 @router.get("/{project_id}/sandbox-status")
@@ -153,14 +200,17 @@ async def get_sandbox_status(
     db: AsyncSession = Depends(get_db),
 ):
     """Get sandbox status for a project. Used by chat route to determine recovery flow."""
-    stmt = select(Sandbox).where(Sandbox.projectId == project_id)
-    result = await db.execute(stmt)
-    sandbox = result.scalar_one_or_none()
 
-    if not sandbox:
-        return {"status": "none"}
+    async def load() -> dict:
+        sandbox = await fetch_sandbox(db, project_id)
+
+        if not sandbox:
+            return {"status": "none"}
+
+        return {
+            "status": sandbox.status,
+            "tunnelUrl": sandbox.tunnelUrl,
+        }
 
-    return {
-        "status": sandbox.status,
-        "tunnelUrl": sandbox.tunnelUrl,
-    }
+    # Unauthenticated server-to-server route: the result does not depend on a user
+    return await read_coalescer.run(("sandbox_status", project_id, None), load)
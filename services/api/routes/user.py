@@ -1,71 +1,80 @@
+from dataclasses import dataclass
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from dependencies.auth import get_current_user, get_optional_user
 from dependencies.database import get_db
-from models.user import User
+from services.queries import SessionRow, UserRow
 
 router = APIRouter(prefix="/api/user")
 
 
+# NamedTuples serialize as JSON arrays, so the cached rows are copied into
+# dataclasses that orjson renders as objects.
+@dataclass(slots=True)
+class SessionOut:
+    id: str
+    userId: str
+    token: str
+    expiresAt: datetime
+    ipAddress: str | None
+    userAgent: str | None
+    createdAt: datetime
+    updatedAt: datetime
+
+
+@dataclass(slots=True)
+class UserOut:
+    id: str
+    email: str
+    name: str | None
+    emailVerified: bool
+    image: str | None
+    createdAt: datetime
+    updatedAt: datetime
+
+
+@dataclass(slots=True)
+class SessionWithUserOut:
+    session: SessionOut
+    user: UserOut
+
+
+def _session_with_user_out(session: SessionRow, user: UserRow) -> SessionWithUserOut:
+    return SessionWithUserOut(
+        session=SessionOut(
+            id=session.id,
+            userId=session.userId,
+            token=session.token,
+            expiresAt=session.expiresAt,
+            ipAddress=session.ipAddress,
+            userAgent=session.userAgent,
+            createdAt=session.createdAt,
+            updatedAt=session.updatedAt,
+        ),
+        user=UserOut(*user),
+    )
+
+
 @router.get("/me")
 async def get_me(
     request: Request,
-    user: User | None = Depends(get_optional_user),
+    user: UserRow | None = Depends(get_optional_user),
 ):
     """Get current session — returns session+user or null."""
     if not user:
-        return None
-
-    session = request.state.session
-    return {
-        "session": {
-            "id": session.id,
-            "userId": session.userId,
-            "token": session.token,
-            "expiresAt": session.expiresAt.isoformat(),
-            "ipAddress": session.ipAddress,
-            "userAgent": session.userAgent,
-            "createdAt": session.createdAt.isoformat(),
-            "updatedAt": session.updatedAt.isoformat(),
-        },
-        "user": {
-            "id": user.id,
-            "email": user.email,
-            "name": user.name,
-            "emailVerified": user.emailVerified,
-            "image": user.image,
-            "createdAt": user.createdAt.isoformat(),
-            "updatedAt": user.updatedAt.isoformat(),
-        },
-    }
+        return ORJSONResponse(None)
+
+    return ORJSONResponse(_session_with_user_out(request.state.session, user))
 
 
 @router.get("/profile")
 async def get_profile(
     request: Request,
-    user: User = Depends(get_current_user),
+    user: UserRow = Depends(get_current_user),
 ):
     """Get user profile (protected)."""
-    session = request.state.session
-    return {
-        "user": {
-            "id": user.id,
-            "email": user.email,
-            "name": user.name,
-            "emailVerified": user.emailVerified,
-            "image": user.image,
-            "createdAt": user.createdAt.isoformat(),
-            "updatedAt": user.updatedAt.isoformat(),
-        },
-        "session": {
-            "id": session.id,
-            "userId": session.userId,
-            "token": session.token,
-            "expiresAt": session.expiresAt.isoformat(),
-            "ipAddress": session.ipAddress,
-            "userAgent": session.userAgent,
-            "createdAt": session.createdAt.isoformat(),
-            "updatedAt": session.updatedAt.isoformat(),
-        },
-    }
+    return ORJSONResponse(_session_with_user_out(request.state.session, user))
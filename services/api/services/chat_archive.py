@@ -0,0 +1,375 @@
+"""Cold tier for dormant chats: their messages move to object storage.
+
+Once a project goes quiet its messages are rarely read again, yet their
+rows and index entries sit beside those of the active chats.
+``archive_idle_chats`` moves every message of a chat idle for
+``chat_archive_after_days`` to the S3 bucket of ``services.storage``. Each
+segment holds up to ``chat_archive_segment_messages`` messages as
+zstd-compressed NDJSON. What stays behind is ``Chat.archivedAt`` and one
+``ChatArchiveSegment`` stub per segment. The project's summary columns are
+untouched, so the project list looks the same.
+
+``hydrate_chat`` restores the messages when the chat is next used. The
+chat routes call it when they find ``archivedAt`` set, then read as usual.
+Like an archive run it downloads with no transaction open and holds the
+chat row only while it inserts the restored rows.
+Segment objects are deleted only by the archive job, once no stub points
+at them, so a request that rolls back never loses a segment.
+
+An archive run never blocks a writer. It reads the chat in one short
+transaction, uploads with none open, and claims the chat in a second one
+only if ``Chat.updatedAt`` is unchanged since the read. It deletes a
+message only if the message still has the archived ``contentHash`` and
+no pending chunks, so the newer row of a save racing the archive
+survives, and hydration keeps existing rows.
+
+Run once as a CLI:
+
+    python -m services.chat_archive
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import zstandard
+from cuid2 import cuid_wrapper
+from sqlalchemy import and_, delete, exists, insert, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from models.base import async_session, engine
+from models.chat import Chat, ChatArchiveSegment, Message, MessageChunk
+from services.context_window import resequence_offsets
+from services.message_codec import decode_content
+from services.messages import restore_messages
+from services.storage import StorageService
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 50
+
+cuid = cuid_wrapper()
+archive_store = StorageService()
+
+
+class ArchiveUnavailable(Exception):
+    """An archived segment could not be read from object storage."""
+
+
+def encode_segment(records: list[dict]) -> bytes:
+    payload = b"".join(orjson.dumps(record) + b"\n" for record in records)
+    return zstandard.ZstdCompressor(level=settings.chat_archive_zstd_level).compress(payload)
+
+
+def decode_segment(data: bytes) -> list[dict]:
+    records = []
+    for line in zstandard.ZstdDecompressor().decompress(data).splitlines():
+        record = orjson.loads(line)
+        record["createdAt"] = datetime.fromisoformat(record["createdAt"])
+        records.append(record)
+    return records
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def _discard(keys: list[str]) -> None:
+    """Delete segment objects; a failure only leaves orphans behind."""
+    if not keys:
+        return
+    try:
+        await archive_store.delete_chat_segments(keys)
+    except Exception as exc:
+        logger.warning("[archive] Could not delete %d segments: %s", len(keys), exc)
+
+
+async def archive_chat(
+    factory: async_sessionmaker[AsyncSession], chat_id: str
+) -> tuple[int, int, int] | None:
+    """Move the chat's messages to segments; ``(messages, segments, bytes)``.
+
+    Returns None if the chat was already archived, had no messages, or was
+    written to while the segments were uploading.
+    """
+    async with factory() as db:
+        seen = (
+            await db.execute(select(Chat.updatedAt).where(Chat.id == chat_id, Chat.archivedAt.is_(None)))
+        ).scalar_one_or_none()
+        if seen is None:
+            return None
+        rows = (
+            await db.execute(
+                select(
+                    Message.id,
+                    Message.role,
+                    Message.content,
+                    Message.contentZstd,
+                    Message.contentHash,
+                    Message.tokenCount,
+                    Message.createdAt,
+                )
+                .where(Message.chatId == chat_id)
+                .order_by(Message.createdAt, Message.id)
+            )
+        ).all()
+    if not rows:
+        return None
+
+    # No transaction is open while the segments upload
+    size = settings.chat_archive_segment_messages
+    batches = [rows[i : i + size] for i in range(0, len(rows), size)]
+    now = _now()
+    uploaded: list[str] = []
+    stubs = []
+    total_bytes = 0
+    try:
+        for batch in batches:
+            data = encode_segment([
+                {
+                    "id": row.id,
+                    "role": row.role,
+                    "content": decode_content(row.content, row.contentZstd),
+                    "tokenCount": row.tokenCount,
+                    "createdAt": row.createdAt,
+                }
+                for row in batch
+            ])
+            segment_id = cuid()
+            uploaded.append(await archive_store.upload_chat_segment(chat_id, segment_id, data))
+            total_bytes += len(data)
+            stubs.append({
+                "id": segment_id,
+                "chatId": chat_id,
+                "key": uploaded[-1],
+                "messageCount": len(batch),
+                "bytes": len(data),
+                "firstCreatedAt": batch[0].createdAt,
+                "lastCreatedAt": batch[-1].createdAt,
+                "createdAt": now,
+            })
+
+        async with factory() as db:
+            # Claim the chat first: a save since it was read means it is not idle
+            claimed = await db.execute(
+                update(Chat)
+                .where(Chat.id == chat_id, Chat.archivedAt.is_(None), Chat.updatedAt == seen)
+                .values(archivedAt=now, updatedAt=Chat.updatedAt)
+                .execution_options(synchronize_session=False)
+            )
+            if claimed.rowcount == 0:
+                await db.rollback()
+                await _discard(uploaded)
+                return None
+            # Stubs of an earlier archive the job has not swept yet
+            stale = (
+                await db.execute(
+                    delete(ChatArchiveSegment)
+                    .where(ChatArchiveSegment.chatId == chat_id)
+                    .returning(ChatArchiveSegment.key)
+                )
+            ).scalars().all()
+            await db.execute(insert(ChatArchiveSegment), stubs)
+            no_chunks = ~exists().where(MessageChunk.messageId == Message.id)
+            for batch in batches:
+                hashed = [(row.id, row.contentHash) for row in batch if row.contentHash is not None]
+                unhashed = [row.id for row in batch if row.contentHash is None]
+                # Only rows still as archived: a racing edit keeps its row
+                await db.execute(
+                    delete(Message)
+                    .where(
+                        Message.chatId == chat_id,
+                        or_(
+                            tuple_(Message.id, Message.contentHash).in_(hashed),
+                            and_(Message.id.in_(unhashed), Message.contentHash.is_(None)),
+                        ),
+                        no_chunks,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+    except Exception:
+        await _discard(uploaded)
+        raise
+
+    await _discard(list(stale))
+    return len(rows), len(batches), total_bytes
+
+
+async def _sweep_hydrated(factory: async_sessionmaker[AsyncSession]) -> int:
+    """Drop stubs and objects of chats that have been hydrated since."""
+    async with factory() as db:
+        keys = (
+            await db.execute(
+                delete(ChatArchiveSegment)
+                .where(ChatArchiveSegment.chatId.in_(select(Chat.id).where(Chat.archivedAt.is_(None))))
+                .returning(ChatArchiveSegment.key)
+            )
+        ).scalars().all()
+        await db.commit()
+    await _discard(list(keys))
+    return len(keys)
+
+
+async def archive_idle_chats(
+    factory: async_sessionmaker[AsyncSession] = async_session,
+    idle_days: float | None = None,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> dict:
+    """Archive every chat untouched, and unopened, for ``idle_days``."""
+    idle = settings.chat_archive_after_days if idle_days is None else idle_days
+    cutoff = _now() - timedelta(days=idle)
+    start = time.perf_counter()
+    swept = await _sweep_hydrated(factory)
+    chats = messages = segments = total_bytes = 0
+    last_id = ""
+    while True:
+        async with factory() as db:
+            chat_ids = (
+                await db.execute(
+                    select(Chat.id)
+                    .where(
+                        Chat.id > last_id,
+                        Chat.archivedAt.is_(None),
+                        Chat.updatedAt < cutoff,
+                        or_(Chat.hydratedAt.is_(None), Chat.hydratedAt < cutoff),
+                        exists().where(Message.chatId == Chat.id),
+                        # Streams still folding their chunks are not idle
+                        ~exists()
+                        .where(MessageChunk.messageId == Message.id, Message.chatId == Chat.id),
+                    )
+                    .order_by(Chat.id)
+                    .limit(batch_size)
+                )
+            ).scalars().all()
+        if not chat_ids:
+            break
+        for chat_id in chat_ids:
+            try:
+                result = await archive_chat(factory, chat_id)
+            except Exception as exc:
+                logger.error("[archive] Archiving chat %s failed: %s", chat_id, exc)
+                continue
+            if result is not None:
+                chats += 1
+                messages += result[0]
+                segments += result[1]
+                total_bytes += result[2]
+        last_id = chat_ids[-1]
+        # Let request handlers run between batches
+        await asyncio.sleep(0)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if chats or swept:
+        logger.info(
+            "[archive] Archived %d messages of %d chats into %d segments (%d bytes), "
+            "swept %d hydrated segments in %.1fms",
+            messages, chats, segments, total_bytes, swept, elapsed_ms,
+        )
+    return {
+        "chats": chats,
+        "messages": messages,
+        "segments": segments,
+        "bytes": total_bytes,
+        "swept": swept,
+        "elapsedMs": round(elapsed_ms, 1),
+    }
+
+
+async def _segment_keys(db: AsyncSession, chat_id: str) -> list[str]:
+    return list(
+        (
+            await db.execute(
+                select(ChatArchiveSegment.key)
+                .where(ChatArchiveSegment.chatId == chat_id)
+                .order_by(ChatArchiveSegment.firstCreatedAt)
+            )
+        ).scalars().all()
+    )
+
+
+async def hydrate_chat(factory: async_sessionmaker[AsyncSession], chat_id: str) -> int:
+    """Restore an archived chat's messages; returns rows restored.
+
+    Reads the segment keys, downloads the segments with no transaction open,
+    at most ``chat_archive_download_concurrency`` at a time, then claims the
+    chat and restores its messages in one short transaction. A no-op if the
+    chat is not archived, including when a concurrent request hydrated it
+    first. Raises ``ArchiveUnavailable`` if a segment cannot be read; the
+    chat stays archived.
+    """
+    while True:
+        async with factory() as db:
+            archived = (
+                await db.execute(select(Chat.archivedAt).where(Chat.id == chat_id))
+            ).scalar_one_or_none()
+            if archived is None:
+                return 0
+            keys = await _segment_keys(db, chat_id)
+
+        start = time.perf_counter()
+        limit = asyncio.Semaphore(settings.chat_archive_download_concurrency)
+
+        async def download(key: str) -> bytes:
+            async with limit:
+                return await archive_store.download_chat_segment(key)
+
+        try:
+            segments = await asyncio.gather(*(download(key) for key in keys))
+        except Exception as exc:
+            raise ArchiveUnavailable(f"Segment of chat {chat_id} unreadable: {exc}") from exc
+
+        async with factory() as db:
+            # Claiming the chat row takes its lock (``lock_chat``): concurrent
+            # hydrations and writers of the chat wait for this one
+            claimed = (
+                await db.execute(
+                    update(Chat)
+                    .where(Chat.id == chat_id, Chat.archivedAt.is_not(None))
+                    .values(archivedAt=None, hydratedAt=_now(), updatedAt=Chat.updatedAt)
+                    .returning(Chat.id)
+                    .execution_options(synchronize_session=False)
+                )
+            ).first()
+            if claimed is None:
+                return 0
+            if await _segment_keys(db, chat_id) != keys:
+                # Hydrated and archived again since the keys were read
+                await db.rollback()
+                continue
+            restored = 0
+            for data in segments:
+                restored += await restore_messages(db, chat_id, decode_segment(data))
+            await resequence_offsets(db, chat_id)
+            await db.commit()
+        logger.info(
+            "[archive] Hydrated %d messages of chat %s from %d segments in %.1fms",
+            restored, chat_id, len(keys), (time.perf_counter() - start) * 1000,
+        )
+        return restored
+
+
+async def run_archive_loop(interval_seconds: float | None = None) -> None:
+    """Archive idle chats forever on a fixed cadence. Cancelled by the app lifespan."""
+    interval = interval_seconds or settings.chat_archive_interval_seconds
+    while True:
+        try:
+            await archive_idle_chats()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.error("[archive] Chat archive run failed: %s", exc)
+        await asyncio.sleep(interval)
+
+
+async def _main() -> None:
+    print(await archive_idle_chats())
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
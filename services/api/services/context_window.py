@@ -0,0 +1,244 @@
+"""Token-budgeted context windows over a chat's stored messages.
+
+Every ``Message`` carries ``tokenCount`` (an estimate, written with the
+message) and ``tokenOffset``: the sum of ``tokenCount`` over every earlier
+message in the chat, ordered by ``(createdAt, id)``. With the
+``(chatId, tokenOffset)`` index, the newest messages that fit a budget are
+one range scan, ``tokenOffset >= end - budget``, whatever the history length.
+
+Writers call ``resequence_offsets`` from the earliest message they wrote;
+saves append at the end of the chat, so that touches only the new rows.
+They take the chat's row lock (``lock_chat``) before their first message
+write. Otherwise two concurrent writers could each compute offsets without
+the other's new row and leave both rows at the same offset.
+
+Backfill counts and offsets for rows written before the columns existed:
+
+    python -m services.context_window
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import func, literal, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from models.base import async_session, engine
+from models.chat import Chat, Message
+from services.message_codec import decode_content
+
+logger = logging.getLogger(__name__)
+
+# Always sent, whatever the budget: the system prompt and conversation summaries
+PINNED_ROLES = ("system",)
+# Chat-template framing per message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+BACKFILL_BATCH_SIZE = 500
+
+
+def estimate_tokens(content: str) -> int:
+    """Token estimate for a message: ~4 UTF-8 bytes per token plus framing.
+
+    No tokenizer for the app's model ships with the API, so this stays a
+    cheap, deterministic approximation. The context endpoint only needs it
+    to be consistent.
+    """
+    return MESSAGE_OVERHEAD_TOKENS + (len(content.encode()) + 3) // 4
+
+
+class ContextMessage(NamedTuple):
+    id: str
+    role: str
+    content: str
+    createdAt: datetime
+    tokenCount: int
+
+
+class ContextWindow(NamedTuple):
+    messages: list[ContextMessage]
+    # Sum of tokenCount over ``messages``
+    token_count: int
+    # Older unpinned messages were left out to fit the budget
+    truncated: bool
+
+
+async def lock_chat(db: AsyncSession, chat_id: str) -> None:
+    """Hold the chat's row lock until the transaction ends.
+
+    ``FOR UPDATE`` on Postgres; SQLite renders no lock, its writers being
+    serialized already.
+    """
+    await db.execute(select(Chat.id).where(Chat.id == chat_id).with_for_update())
+
+
+async def resequence_offsets(
+    db: AsyncSession, chat_id: str, since: tuple[datetime, str] | None = None
+) -> None:
+    """Recompute ``tokenOffset`` for messages at or after ``since`` (all if None).
+
+    The caller holds ``lock_chat`` from before its message writes.
+    """
+    key = tuple_(Message.createdAt, Message.id)
+    base = literal(0)
+    suffix = Message.chatId == chat_id
+    if since is not None:
+        suffix = suffix & (key >= tuple_(*since))
+        previous_end = (
+            select(Message.tokenOffset + Message.tokenCount)
+            .where(Message.chatId == chat_id, key < tuple_(*since))
+            .order_by(Message.createdAt.desc(), Message.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        base = func.coalesce(previous_end, 0)
+    running = (
+        select(
+            Message.id,
+            (
+                base
+                + func.sum(Message.tokenCount).over(order_by=(Message.createdAt, Message.id))
+                - Message.tokenCount
+            ).label("offset"),
+        )
+        .where(suffix)
+        .subquery()
+    )
+    await db.execute(
+        update(Message)
+        .where(Message.id == running.c.id, Message.tokenOffset != running.c.offset)
+        .values(tokenOffset=running.c.offset)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _columns():
+    return (
+        Message.id,
+        Message.role,
+        Message.content,
+        Message.contentZstd,
+        Message.createdAt,
+        Message.tokenCount,
+    )
+
+
+def _decoded(rows) -> list[ContextMessage]:
+    return [
+        ContextMessage(id_, role, decode_content(content, packed), created_at, tokens)
+        for id_, role, content, packed, created_at, tokens in rows
+    ]
+
+
+async def context_window(db: AsyncSession, chat_id: str, budget: int) -> ContextWindow:
+    """Pinned messages plus the newest others that fit ``budget`` tokens.
+
+    Three index lookups regardless of history length: the chat's end offset,
+    the pinned messages, and the offset range of the window. Pinned messages
+    that fall inside the window are counted twice when sizing it, so the
+    window errs on the small side and never exceeds the budget.
+    """
+    end = (
+        await db.execute(
+            select(Message.tokenOffset + Message.tokenCount)
+            .where(Message.chatId == chat_id)
+            .order_by(Message.createdAt.desc(), Message.id.desc())
+            .limit(1)
+        )
+    ).scalar_one_or_none()
+    if end is None:
+        return ContextWindow([], 0, False)
+
+    pinned = _decoded(await db.execute(
+        select(*_columns())
+        .where(Message.chatId == chat_id, Message.role.in_(PINNED_ROLES))
+        .order_by(Message.createdAt, Message.id)
+    ))
+    remaining = budget - sum(m.tokenCount for m in pinned)
+    threshold = end - max(remaining, 0)
+    window = []
+    if remaining > 0:
+        window = _decoded(await db.execute(
+            select(*_columns())
+            .where(
+                Message.chatId == chat_id,
+                Message.tokenOffset >= threshold,
+                Message.role.not_in(PINNED_ROLES),
+            )
+            .order_by(Message.tokenOffset)
+        ))
+    truncated = threshold > 0 and (
+        await db.execute(
+            select(literal(1))
+            .where(
+                Message.chatId == chat_id,
+                Message.tokenOffset < threshold,
+                Message.role.not_in(PINNED_ROLES),
+            )
+            .limit(1)
+        )
+    ).first() is not None
+
+    messages = sorted(pinned + window, key=lambda m: (m.createdAt, m.id))
+    return ContextWindow(messages, sum(m.tokenCount for m in messages), truncated)
+
+
+async def backfill_token_counts(
+    factory: async_sessionmaker[AsyncSession] = async_session,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+) -> dict:
+    """Count tokens for rows that have none, then resequence their chats.
+
+    ``tokenCount`` 0 marks an uncounted row: every counted message has at
+    least the framing overhead. Batches commit on their own; re-runnable.
+    """
+    start = time.perf_counter()
+    counted = 0
+    chat_ids: set[str] = set()
+    last_id = ""
+    while True:
+        async with factory() as db:
+            rows = (
+                await db.execute(
+                    select(Message.id, Message.chatId, Message.content, Message.contentZstd)
+                    .where(Message.id > last_id, Message.tokenCount == 0)
+                    .order_by(Message.id)
+                    .limit(batch_size)
+                )
+            ).all()
+            if not rows:
+                break
+            await db.execute(update(Message), [
+                {"id": id_, "tokenCount": estimate_tokens(decode_content(content, packed))}
+                for id_, _, content, packed in rows
+            ])
+            await db.commit()
+        counted += len(rows)
+        chat_ids.update(row.chatId for row in rows)
+        last_id = rows[-1].id
+        # Let request handlers run between batches
+        await asyncio.sleep(0)
+
+    for chat_id in sorted(chat_ids):
+        async with factory() as db:
+            await lock_chat(db, chat_id)
+            await resequence_offsets(db, chat_id)
+            await db.commit()
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(
+        "[tokens] Counted %d messages across %d chats in %.1fms", counted, len(chat_ids), elapsed_ms
+    )
+    return {"counted": counted, "chats": len(chat_ids), "elapsedMs": round(elapsed_ms, 1)}
+
+
+async def _main() -> None:
+    print(await backfill_token_counts())
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
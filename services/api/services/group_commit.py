@@ -0,0 +1,197 @@
+"""Group commit for small, concurrent writes such as ``save_messages``.
+
+When many chat streams finish together, each save is a tiny transaction
+paying its own commit and fsync. With ``group_commit_enabled``, routes
+hand their write to ``group_commit_writer.submit``. The writer collects
+jobs for up to ``group_commit_window_ms`` (or ``group_commit_max_batch``
+jobs) and runs them in one transaction with one commit. Each caller's
+``submit`` returns only after that commit, so a response still means the
+write is durable.
+
+If any job in a batch fails, the batch is rolled back and each job is
+re-run in its own transaction. One bad request then fails alone and
+cannot take the others down with it. The queue is bounded: when it is
+full, ``submit`` raises ``WriterOverloaded`` and the route answers 503.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from models.base import async_session
+from models.replica import replica_router
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram; the last bucket is "more"
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class WriterOverloaded(Exception):
+    """The group-commit queue is full."""
+
+
+@dataclass(slots=True)
+class _Job:
+    fn: Callable[[AsyncSession], Awaitable[Any]]
+    future: asyncio.Future
+    enqueued_at: float
+    sticky_keys: list[str]
+
+
+class GroupCommitWriter:
+    def __init__(self, factory: async_sessionmaker[AsyncSession] = async_session) -> None:
+        self.factory = factory
+        # Jobs, or None to stop the loop
+        self._queue: asyncio.Queue[_Job | None] | None = None
+        self._task: asyncio.Task | None = None
+        self.clear()
+
+    def clear(self) -> None:
+        self.batches = 0
+        self.jobs = 0
+        self.rejected = 0
+        # Batches that failed together and were re-run job by job
+        self.isolated = 0
+        self.batch_sizes = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        # Time from submit to the batch starting: the latency group commit adds
+        self.wait_ms_sum = 0.0
+        self.wait_ms_max = 0.0
+        self.flush_ms_sum = 0.0
+
+    def _ensure_started(self) -> asyncio.Queue:
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=settings.group_commit_max_queue)
+            self._task = asyncio.create_task(self._run())
+        return self._queue
+
+    async def submit(
+        self,
+        fn: Callable[[AsyncSession], Awaitable[Any]],
+        sticky_keys: Iterable[str] = (),
+    ) -> Any:
+        """Run ``fn(db)`` in the next batch; return its result once committed.
+
+        ``fn`` must not commit. ``sticky_keys`` pin the caller's reads to the
+        primary after the commit, as a request's own session would.
+        """
+        queue = self._ensure_started()
+        job = _Job(fn, asyncio.get_running_loop().create_future(), time.perf_counter(), list(sticky_keys))
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise WriterOverloaded from None
+        return await job.future
+
+    async def stop(self) -> None:
+        """Flush everything queued, then end the loop. Called by the app lifespan."""
+        if self._task is None or self._task.done():
+            return
+        # Sentinel: the loop flushes what it holds and returns
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        # Submitted while stopping: nothing will run them
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            if job is not None and not job.future.done():
+                job.future.set_exception(WriterOverloaded())
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            batch = [job]
+            # A full batch is already waiting: no point holding the window open
+            if queue.qsize() < settings.group_commit_max_batch - 1:
+                await asyncio.sleep(settings.group_commit_window_ms / 1000)
+            stopping = False
+            while len(batch) < settings.group_commit_max_batch and not queue.empty():
+                job = queue.get_nowait()
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list[_Job]) -> None:
+        started = time.perf_counter()
+        for job in batch:
+            wait_ms = (started - job.enqueued_at) * 1000
+            self.wait_ms_sum += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+        if len(batch) == 1:
+            await self._run_alone(batch[0])
+        else:
+            try:
+                async with self.factory() as db:
+                    results = [await job.fn(db) for job in batch]
+                    await db.commit()
+            except Exception as exc:
+                logger.warning("[group-commit] Batch of %d failed (%s); retrying one by one", len(batch), exc)
+                self.isolated += 1
+                for job in batch:
+                    await self._run_alone(job)
+            else:
+                for job, result in zip(batch, results):
+                    self._settle(job, result=result)
+
+        self.batches += 1
+        self.jobs += len(batch)
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if len(batch) <= bound), -1)
+        self.batch_sizes[bucket] += 1
+        self.flush_ms_sum += (time.perf_counter() - started) * 1000
+
+    async def _run_alone(self, job: _Job) -> None:
+        try:
+            async with self.factory() as db:
+                result = await job.fn(db)
+                await db.commit()
+        except Exception as exc:
+            self._settle(job, exc=exc)
+        else:
+            self._settle(job, result=result)
+
+    def _settle(self, job: _Job, result: Any = None, exc: BaseException | None = None) -> None:
+        if exc is None and job.sticky_keys:
+            replica_router.mark_write(job.sticky_keys)
+        # The caller may have gone away (client disconnect cancels the await)
+        if job.future.done():
+            return
+        if exc is None:
+            job.future.set_result(result)
+        else:
+            job.future.set_exception(exc)
+
+    def stats(self) -> dict:
+        batches = self.batches or 1
+        jobs = self.jobs or 1
+        labels = [str(bound) for bound in BATCH_SIZE_BUCKETS] + ["+Inf"]
+        return {
+            "enabled": settings.group_commit_enabled,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "rejected": self.rejected,
+            "isolated": self.isolated,
+            "avgBatchSize": round(self.jobs / batches, 2),
+            "batchSizes": dict(zip(labels, self.batch_sizes)),
+            "avgWaitMs": round(self.wait_ms_sum / jobs, 2),
+            "maxWaitMs": round(self.wait_ms_max, 2),
+            "avgFlushMs": round(self.flush_ms_sum / batches, 2),
+        }
+
+
+group_commit_writer = GroupCommitWriter()
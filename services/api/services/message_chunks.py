@@ -0,0 +1,317 @@
+"""Append-only storage for messages that grow while they stream.
+
+Re-saving a growing message through ``save_messages`` rewrites the whole
+``content`` every time, so a reply streamed in n deltas costs O(n²) bytes of
+writes and WAL. ``append_chunk`` instead stores each delta as a
+``MessageChunk`` row keyed by its character offset; readers see
+``Message.content`` followed by the pending chunks (``pending_tails``).
+
+``compact_message`` folds the chunks back into ``Message.content``. It runs
+when a stream finishes, whenever the pending chunks grow as long as the
+already-folded content (so the folded content at least doubles between
+rewrites and the total bytes rewritten stay within about twice the final
+size), and from ``run_compaction_loop`` for streams that went idle. A
+message stays plain text while it streams, since appends need its length;
+the final and idle folds store it through ``services.message_codec``.
+Search sees the folded content only: pending chunks are not indexed.
+
+Run an idle sweep as a CLI:
+
+    python -m services.message_chunks
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from models.base import async_session, engine
+from models.chat import Chat, Message, MessageChunk
+from models.project import Project
+from services.context_window import estimate_tokens, lock_chat, resequence_offsets
+from services.message_codec import decode_content, encode_content
+from services.message_search import search_text
+from services.messages import _insert, content_hash
+from services.project_summary import message_preview
+
+logger = logging.getLogger(__name__)
+
+COMPACT_BATCH_SIZE = 100
+
+
+class OffsetConflict(ValueError):
+    """The chunk does not start where the stored message ends."""
+
+    def __init__(self, expected: int):
+        super().__init__(f"Expected offset {expected}")
+        self.expected = expected
+
+
+class AppendResult(NamedTuple):
+    # This append created the Message row
+    created: bool
+    # A retry of a chunk that is already stored; nothing was written
+    duplicate: bool
+    # Message length in characters after the append
+    length: int
+
+
+async def pending_tails(db: AsyncSession, message_ids: list[str]) -> dict[str, str]:
+    """``message_id -> concatenated pending chunks`` for messages that have any."""
+    if not message_ids:
+        return {}
+    rows = await db.execute(
+        select(MessageChunk.messageId, MessageChunk.content)
+        .where(MessageChunk.messageId.in_(message_ids))
+        .order_by(MessageChunk.messageId, MessageChunk.start)
+    )
+    parts: dict[str, list[str]] = defaultdict(list)
+    for message_id, content in rows:
+        parts[message_id].append(content)
+    return {message_id: "".join(chunks) for message_id, chunks in parts.items()}
+
+
+async def _folded_content(db: AsyncSession, message_id: str) -> str:
+    row = (
+        await db.execute(select(Message.content, Message.contentZstd).where(Message.id == message_id))
+    ).one()
+    return decode_content(*row)
+
+
+async def _lengths(db: AsyncSession, chat_id: str, message_id: str) -> tuple[int, int] | None:
+    """``(folded length, total length)`` of a message in ``chat_id``, or None."""
+    # Chunks are contiguous, so the last one by start (a primary key probe) ends the message
+    chunks_end = (
+        select(MessageChunk.start + func.length(MessageChunk.content))
+        .where(MessageChunk.messageId == Message.id)
+        .order_by(MessageChunk.start.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    row = (
+        await db.execute(
+            select(func.length(Message.content), Message.contentZstd.is_not(None), chunks_end).where(
+                Message.id == message_id, Message.chatId == chat_id
+            )
+        )
+    ).first()
+    if row is None:
+        return None
+    folded, compressed, end = row
+    if compressed:
+        # Rare: appending to a finished message that was stored compressed
+        folded = len(await _folded_content(db, message_id))
+    return folded, folded if end is None else end
+
+
+async def append_chunk(
+    db: AsyncSession,
+    chat_id: str,
+    message_id: str,
+    role: str,
+    offset: int,
+    chunk: str,
+    now: datetime,
+) -> AppendResult:
+    """Append ``chunk`` at character ``offset`` of the message.
+
+    The first chunk (offset 0) creates the ``Message`` row. Any other offset
+    must equal the current length; a chunk that repeats stored text at its
+    offset is a client retry and is acknowledged without writing. Raises
+    ``OffsetConflict`` with the expected offset otherwise. Of concurrent
+    appends at one offset the first to commit wins; the others are then
+    judged like a late retry.
+    """
+    dialect = db.get_bind().dialect.name
+    await lock_chat(db, chat_id)
+    lengths = await _lengths(db, chat_id, message_id)
+    if lengths is None:
+        if offset != 0:
+            raise OffsetConflict(0)
+        created = (
+            await db.execute(
+                _insert(dialect)
+                .values(
+                    id=message_id,
+                    chatId=chat_id,
+                    role=role,
+                    content=chunk,
+                    contentHash=content_hash(chunk),
+                    tokenCount=estimate_tokens(chunk),
+                    searchVector=search_text(chunk),
+                    createdAt=now,
+                )
+                .on_conflict_do_nothing(index_elements=[Message.id])
+                .returning(Message.id)
+            )
+        ).first()
+        if created is not None:
+            await resequence_offsets(db, chat_id, since=(now, message_id))
+            return AppendResult(created=True, duplicate=False, length=len(chunk))
+        return await _after_conflict(db, chat_id, message_id, offset, chunk)
+
+    folded, end = lengths
+    if offset != end:
+        if offset < end and await _repeats_stored(db, message_id, offset, chunk):
+            return AppendResult(created=False, duplicate=True, length=end)
+        raise OffsetConflict(end)
+
+    stored = (
+        await db.execute(
+            _insert(dialect, MessageChunk)
+            .values(messageId=message_id, start=offset, content=chunk, createdAt=now)
+            .on_conflict_do_nothing(index_elements=[MessageChunk.messageId, MessageChunk.start])
+            .returning(MessageChunk.start)
+        )
+    ).first()
+    if stored is None:
+        return await _after_conflict(db, chat_id, message_id, offset, chunk)
+    end += len(chunk)
+    if end - folded >= max(folded, settings.message_compact_min_chars):
+        await compact_message(db, message_id, compress=False)
+    return AppendResult(created=False, duplicate=False, length=end)
+
+
+async def _repeats_stored(db: AsyncSession, message_id: str, offset: int, chunk: str) -> bool:
+    tail = (await pending_tails(db, [message_id])).get(message_id, "")
+    content = await _folded_content(db, message_id)
+    return (content + tail)[offset : offset + len(chunk)] == chunk
+
+
+async def _after_conflict(
+    db: AsyncSession, chat_id: str, message_id: str, offset: int, chunk: str
+) -> AppendResult:
+    """A concurrent append wrote at ``offset`` first: a duplicate, or a conflict."""
+    lengths = await _lengths(db, chat_id, message_id)
+    if lengths is None:
+        # The id belongs to a message of another chat
+        raise OffsetConflict(0)
+    end = lengths[1]
+    if await _repeats_stored(db, message_id, offset, chunk):
+        return AppendResult(created=False, duplicate=True, length=end)
+    raise OffsetConflict(end)
+
+
+async def compact_message(db: AsyncSession, message_id: str, compress: bool = True) -> int:
+    """Fold pending chunks into ``Message.content``; returns characters folded.
+
+    ``compress=False`` keeps the body plain for a message still streaming.
+    """
+    chat_id = (await db.execute(select(Message.chatId).where(Message.id == message_id))).scalar_one_or_none()
+    if chat_id is None:
+        return 0
+    # Read the body under the lock so a concurrent save's rewrite is not lost
+    await lock_chat(db, chat_id)
+    message = (
+        await db.execute(
+            select(Message.content, Message.contentZstd, Message.chatId, Message.createdAt).where(
+                Message.id == message_id
+            )
+        )
+    ).first()
+    chunks = (
+        await db.execute(
+            select(MessageChunk.start, MessageChunk.content)
+            .where(MessageChunk.messageId == message_id)
+            .order_by(MessageChunk.start)
+        )
+    ).all()
+    if message is None or not chunks:
+        return 0
+
+    tail = "".join(content for _, content in chunks)
+    content = decode_content(message.content, message.contentZstd) + tail
+    stored, packed = encode_content(content) if compress else (content, None)
+    await db.execute(
+        update(Message)
+        .where(Message.id == message_id)
+        .values(
+            content=stored,
+            contentZstd=packed,
+            contentHash=content_hash(content),
+            tokenCount=estimate_tokens(content),
+            searchVector=search_text(content),
+        )
+    )
+    await resequence_offsets(db, message.chatId, since=(message.createdAt, message_id))
+    # Only the chunks read above; a concurrent append stays pending
+    await db.execute(
+        delete(MessageChunk).where(
+            MessageChunk.messageId == message_id, MessageChunk.start <= chunks[-1].start
+        )
+    )
+    # The project list previews the newest message; refresh it if this is it
+    await db.execute(
+        update(Project)
+        .where(
+            Project.id == select(Chat.projectId).where(Chat.id == message.chatId).scalar_subquery(),
+            Project.lastActivityAt == message.createdAt,
+        )
+        .values(lastMessagePreview=message_preview(content), updatedAt=Project.updatedAt)
+        .execution_options(synchronize_session=False)
+    )
+    return len(tail)
+
+
+async def compact_idle_messages(
+    factory: async_sessionmaker[AsyncSession] = async_session,
+    idle_seconds: float | None = None,
+    batch_size: int = COMPACT_BATCH_SIZE,
+) -> dict:
+    """Fold every message whose newest chunk is older than ``idle_seconds``."""
+    idle = settings.message_compact_idle_seconds if idle_seconds is None else idle_seconds
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=idle)
+    start = time.perf_counter()
+    compacted = 0
+    while True:
+        async with factory() as db:
+            message_ids = (
+                await db.execute(
+                    select(MessageChunk.messageId)
+                    .group_by(MessageChunk.messageId)
+                    .having(func.max(MessageChunk.createdAt) <= cutoff)
+                    .limit(batch_size)
+                )
+            ).scalars().all()
+            for message_id in message_ids:
+                await compact_message(db, message_id)
+            await db.commit()
+        compacted += len(message_ids)
+        if len(message_ids) < batch_size:
+            break
+        # Let request handlers run between batches
+        await asyncio.sleep(0)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if compacted:
+        logger.info("[compact] Folded chunks of %d idle messages in %.1fms", compacted, elapsed_ms)
+    return {"compacted": compacted, "elapsedMs": round(elapsed_ms, 1)}
+
+
+async def run_compaction_loop(interval_seconds: float | None = None) -> None:
+    """Compact idle streams forever on a fixed cadence. Cancelled by the app lifespan."""
+    interval = interval_seconds or settings.message_compact_interval_seconds
+    while True:
+        try:
+            await compact_idle_messages()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.error("[compact] Idle message compaction failed: %s", exc)
+        await asyncio.sleep(interval)
+
+
+async def _main() -> None:
+    print(await compact_idle_messages())
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
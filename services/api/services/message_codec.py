@@ -0,0 +1,210 @@
+"""Storage codec for ``Message`` bodies: zstd for large ones.
+
+Assistant messages often embed whole generated source files and tool
+output. A body of at least ``message_compress_min_bytes`` UTF-8 bytes is
+stored zstd-compressed in ``Message.contentZstd`` with ``content`` left
+empty; smaller bodies, and ones that barely shrink, stay plain text.
+``contentHash`` is always the digest of the plain text, so upserts compare
+bodies without decompressing anything.
+
+Writers build their columns with ``encode_content``; readers select both
+columns and call ``decode_content``. An optional trained dictionary
+(``message_zstd_dictionary``) improves the ratio on mid-sized bodies.
+Frames record the dictionary id, so rows written before one was configured
+still decode.
+
+The web client saves a body as ``JSON.stringify`` of its parts (prompt
+parts, or the assistant's reasoning, text and tool calls). ``message_text``
+reads the text parts back out for previews and search.
+
+Compress existing rows, or train a dictionary from stored messages:
+
+    python -m services.message_codec backfill
+    python -m services.message_codec train dictionary.zstd [max_samples]
+"""
+
+import asyncio
+import functools
+import logging
+import sys
+import time
+
+import orjson
+import zstandard
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from models.base import async_session, engine
+from models.chat import Message
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 200
+# Keep a body plain unless compression saves at least 10%
+MAX_STORED_RATIO = 0.9
+DICTIONARY_SIZE = 112_640
+
+
+@functools.lru_cache(maxsize=4)
+def _dictionary(path: str) -> zstandard.ZstdCompressionDict | None:
+    if not path:
+        return None
+    with open(path, "rb") as f:
+        return zstandard.ZstdCompressionDict(f.read())
+
+
+@functools.lru_cache(maxsize=4)
+def _compressor(level: int, dictionary_path: str) -> zstandard.ZstdCompressor:
+    return zstandard.ZstdCompressor(level=level, dict_data=_dictionary(dictionary_path))
+
+
+@functools.lru_cache(maxsize=4)
+def _decompressor(dictionary_path: str) -> zstandard.ZstdDecompressor:
+    return zstandard.ZstdDecompressor(dict_data=_dictionary(dictionary_path))
+
+
+def encode_content(content: str) -> tuple[str, bytes | None]:
+    """``(content, contentZstd)`` column values for a message body."""
+    raw = content.encode()
+    if len(raw) < settings.message_compress_min_bytes:
+        return content, None
+    packed = _compressor(settings.message_zstd_level, settings.message_zstd_dictionary).compress(raw)
+    if len(packed) > len(raw) * MAX_STORED_RATIO:
+        return content, None
+    return "", packed
+
+
+def decode_content(content: str, packed: bytes | None) -> str:
+    """The plain-text body from the ``(content, contentZstd)`` columns."""
+    if packed is None:
+        return content
+    dict_id = zstandard.get_frame_parameters(packed).dict_id
+    if dict_id:
+        dictionary = _dictionary(settings.message_zstd_dictionary)
+        if dictionary is None or dictionary.dict_id() != dict_id:
+            raise ValueError(f"Message was compressed with zstd dictionary {dict_id}, which is not configured")
+        return _decompressor(settings.message_zstd_dictionary).decompress(packed).decode()
+    return _decompressor("").decompress(packed).decode()
+
+
+def message_text(content: str) -> str:
+    """The text parts of a decoded body, newline-joined.
+
+    Bodies that are not a JSON array of parts, or a JSON string, are
+    returned as they are.
+    """
+    if not content.startswith(("[", '"')):
+        return content
+    try:
+        parsed = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return content
+    if isinstance(parsed, str):
+        return parsed
+    if not isinstance(parsed, list) or not all(isinstance(part, dict) for part in parsed):
+        return content
+    return "\n".join(
+        part["text"] for part in parsed if part.get("type") == "text" and isinstance(part.get("text"), str)
+    )
+
+
+async def backfill_compression(
+    factory: async_sessionmaker[AsyncSession] = async_session,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+) -> dict:
+    """Compress plain-text bodies written before the codec, in id batches.
+
+    Each batch commits on its own, so the job can be stopped and re-run;
+    rows it already compressed are skipped.
+    """
+    start = time.perf_counter()
+    checked = compressed = bytes_before = bytes_after = 0
+    # A character is at most 4 UTF-8 bytes: shorter bodies cannot qualify
+    min_chars = settings.message_compress_min_bytes // 4
+    last_id = ""
+    while True:
+        async with factory() as db:
+            rows = (
+                await db.execute(
+                    select(Message.id, Message.content)
+                    .where(
+                        Message.id > last_id,
+                        Message.contentZstd.is_(None),
+                        func.length(Message.content) >= min_chars,
+                    )
+                    .order_by(Message.id)
+                    .limit(batch_size)
+                )
+            ).all()
+            if not rows:
+                break
+            changes = []
+            for message_id, content in rows:
+                stored, packed = encode_content(content)
+                if packed is None:
+                    continue
+                changes.append({"id": message_id, "content": stored, "contentZstd": packed})
+                bytes_before += len(content.encode())
+                bytes_after += len(packed)
+            if changes:
+                # Bulk UPDATE by primary key: one executemany per batch
+                await db.execute(update(Message), changes)
+            await db.commit()
+
+        checked += len(rows)
+        compressed += len(changes)
+        last_id = rows[-1].id
+        # Let request handlers run between batches
+        await asyncio.sleep(0)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(
+        "[codec] Checked %d messages, compressed %d (%d -> %d bytes) in %.1fms",
+        checked, compressed, bytes_before, bytes_after, elapsed_ms,
+    )
+    return {
+        "checked": checked,
+        "compressed": compressed,
+        "bytesBefore": bytes_before,
+        "bytesAfter": bytes_after,
+        "elapsedMs": round(elapsed_ms, 1),
+    }
+
+
+async def train_dictionary(
+    factory: async_sessionmaker[AsyncSession] = async_session,
+    max_samples: int = 5000,
+    size: int = DICTIONARY_SIZE,
+) -> bytes:
+    """Train a zstd dictionary on the most recent assistant messages."""
+    async with factory() as db:
+        rows = (
+            await db.execute(
+                select(Message.content, Message.contentZstd)
+                .where(Message.role == "assistant")
+                .order_by(Message.createdAt.desc())
+                .limit(max_samples)
+            )
+        ).all()
+    samples = [decode_content(content, packed).encode() for content, packed in rows]
+    return zstandard.train_dictionary(size, samples).as_bytes()
+
+
+async def _main(args: list[str]) -> None:
+    if args[:1] == ["backfill"]:
+        print(await backfill_compression())
+    elif args[:1] == ["train"] and len(args) >= 2:
+        max_samples = int(args[2]) if len(args) > 2 else 5000
+        dictionary = await train_dictionary(max_samples=max_samples)
+        with open(args[1], "wb") as f:
+            f.write(dictionary)
+        print(f"Wrote {len(dictionary)} byte dictionary to {args[1]}")
+    else:
+        print(__doc__)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
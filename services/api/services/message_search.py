@@ -0,0 +1,278 @@
+"""Ranked full-text search over a chat's messages.
+
+Every write of a message body also writes ``Message.searchVector`` from
+its text parts (``search_text``). The JSON the web client wraps them in,
+and the reasoning and tool calls beside them, are left out. On Postgres
+the column is a ``tsvector``, indexed together with ``chatId`` by a GIN
+index (btree_gin), so a search touches only the chat's matching rows
+however many messages the table holds. Queries use
+``websearch_to_tsquery`` and rank with ``ts_rank_cd``. SQLite (tests) uses
+an FTS5 table kept in sync by triggers and ranks with ``bm25`` (see
+``models.search``).
+
+When the full-text query finds nothing, e.g. for a fragment of an
+identifier, the search falls back to a case-insensitive substring match
+on ``content``, served by a trigram index on Postgres. ``content`` holds
+the stored JSON, so candidates are checked against their text parts
+before they count. A request checks at most
+``chat_search_substring_scan_rows`` candidates and flags the page
+``partial`` if it stopped there. Bodies stored compressed keep
+``content`` empty, so the fallback only sees plain-stored messages:
+prompts and shorter replies.
+
+Highlights are computed here on the text parts of each hit, since
+compressed bodies have no text in the database. They mark words starting
+with a lightly stemmed query term, an approximation of the index's own
+stemming.
+
+Index rows written before the column existed, or reindex every row:
+
+    python -m services.message_search
+    python -m services.message_search reindex
+"""
+
+import asyncio
+import logging
+import re
+import sys
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import column, func, literal, literal_column, select, table, text, true, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from models.base import async_session, engine
+from models.chat import Message
+from models.search import FTS_TABLE, SEARCH_CONFIG
+from services.message_codec import decode_content, message_text
+
+logger = logging.getLogger(__name__)
+
+# Longer bodies are indexed by their start; Postgres caps a tsvector at 1 MB
+SEARCH_TEXT_MAX_CHARS = 200_000
+BACKFILL_BATCH_SIZE = 200
+# Substring candidates checked per query while filling a page
+SUBSTRING_SCAN_BATCH = 200
+
+_TERM = re.compile(r"\w+")
+_SUFFIXES = ("ing", "ed", "es", "s")
+
+
+class SearchHit(NamedTuple):
+    id: str
+    role: str
+    # Text parts of the body (``message_text``)
+    text: str
+    createdAt: datetime
+    # Higher is better; 0 for substring matches, which are newest first
+    rank: float
+
+
+class SearchPage(NamedTuple):
+    hits: list[SearchHit]
+    # "fulltext" or "substring"
+    match: str
+    has_more: bool
+    # The substring scan hit its cap; later matches were not looked for
+    partial: bool = False
+
+
+def search_text(content: str) -> str:
+    """What ``searchVector`` is bound from for a message body: its text parts."""
+    return message_text(content)[:SEARCH_TEXT_MAX_CHARS]
+
+
+def _columns():
+    return (Message.id, Message.role, Message.content, Message.contentZstd, Message.createdAt)
+
+
+def _fulltext_stmt(dialect: str, chat_id: str, query: str):
+    """Matching rows with a ``rank`` column, best first; None if nothing to match."""
+    if dialect == "postgresql":
+        tsquery = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), query)
+        rank = func.ts_rank_cd(Message.searchVector, tsquery)
+        return (
+            select(*_columns(), rank.label("rank"))
+            .where(Message.chatId == chat_id, Message.searchVector.op("@@")(tsquery))
+            .order_by(rank.desc(), Message.createdAt.desc(), Message.id)
+        )
+    if dialect == "sqlite":
+        # Quoted terms, implicitly AND-ed: user input never reaches FTS5
+        # syntax. Unlike Postgres there are no stop words to drop.
+        terms = _TERM.findall(query)
+        if not terms:
+            return None
+        fts = table(FTS_TABLE, column("rowid"))
+        rank = func.bm25(literal_column(f'"{FTS_TABLE}"'))
+        return (
+            select(*_columns(), (-rank).label("rank"))
+            .select_from(fts)
+            .join(Message, literal_column('"Message".rowid') == fts.c.rowid)
+            .where(
+                text(f'"{FTS_TABLE}" MATCH :terms').bindparams(terms=" ".join(f'"{t}"' for t in terms)),
+                Message.chatId == chat_id,
+            )
+            .order_by(rank, Message.createdAt.desc(), Message.id)
+        )
+    raise NotImplementedError(f"No full-text search for dialect {dialect!r}")
+
+
+def _substring_stmt(chat_id: str, query: str):
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return (
+        select(*_columns(), literal(0.0).label("rank"))
+        .where(Message.chatId == chat_id, Message.content.ilike(f"%{escaped}%", escape="\\"))
+        .order_by(Message.createdAt.desc(), Message.id.desc())
+    )
+
+
+async def _hits(db: AsyncSession, stmt, limit: int, offset: int) -> list[SearchHit]:
+    rows = await db.execute(stmt.limit(limit).offset(offset))
+    return [
+        SearchHit(id_, role, message_text(decode_content(content, packed)), created_at, float(rank))
+        for id_, role, content, packed, created_at, rank in rows
+    ]
+
+
+async def _substring_hits(
+    db: AsyncSession, chat_id: str, query: str, limit: int, offset: int
+) -> tuple[list[SearchHit], bool]:
+    """Substring matches in the text parts, and whether the scan cap cut them short.
+
+    The SQL match also sees the JSON around the text, so candidates are
+    checked here, up to ``chat_search_substring_scan_rows`` of them.
+    """
+    stmt = _substring_stmt(chat_id, query)
+    needle = query.lower()
+    hits: list[SearchHit] = []
+    skipped = scanned = 0
+    while len(hits) < limit:
+        batch = min(SUBSTRING_SCAN_BATCH, settings.chat_search_substring_scan_rows - scanned)
+        if batch <= 0:
+            return hits, True
+        candidates = await _hits(db, stmt, batch, scanned)
+        for hit in candidates:
+            if needle not in hit.text.lower():
+                continue
+            if skipped < offset:
+                skipped += 1
+            elif len(hits) < limit:
+                hits.append(hit)
+        if len(candidates) < batch:
+            break
+        scanned += batch
+    return hits, False
+
+
+async def search_messages(
+    db: AsyncSession, chat_id: str, query: str, limit: int, offset: int = 0
+) -> SearchPage:
+    """One page of the chat's messages matching ``query``, best first.
+
+    Full-text matches if there are any, otherwise substring matches. An
+    empty page past the first is checked against the full-text index so a
+    paged substring search stays in substring mode.
+    """
+    fulltext = _fulltext_stmt(db.get_bind().dialect.name, chat_id, query)
+    hits = await _hits(db, fulltext, limit + 1, offset) if fulltext is not None else []
+    match = "fulltext"
+    partial = False
+    if not hits and (fulltext is None or offset == 0 or not await _hits(db, fulltext, 1, 0)):
+        hits, partial = await _substring_hits(db, chat_id, query, limit + 1, offset)
+        match = "substring"
+    return SearchPage(hits[:limit], match, len(hits) > limit, partial)
+
+
+def _stem(term: str) -> str:
+    term = term.lower()
+    for suffix in _SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            return term[: -len(suffix)]
+    return term
+
+
+def highlight_pattern(query: str, match: str) -> re.Pattern | None:
+    """What to mark in a hit: the substring, or words starting with a query stem."""
+    if match == "substring":
+        return re.compile(re.escape(query), re.IGNORECASE)
+    # "or" is websearch_to_tsquery syntax, not a term
+    stems = sorted({_stem(t) for t in _TERM.findall(query) if t.lower() != "or"}, key=len, reverse=True)
+    if not stems:
+        return None
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, stems)) + r")\w*", re.IGNORECASE)
+
+
+def highlight(content: str, pattern: re.Pattern | None, width: int) -> tuple[str, list[tuple[int, int]]]:
+    """A ``width``-character snippet around the first match, and match spans in it.
+
+    Whitespace is collapsed; "…" marks cut ends. Spans are ``(start, end)``
+    character offsets into the snippet, so clients mark them up themselves.
+    """
+    flat = " ".join(content.split())
+    first = pattern.search(flat) if pattern is not None else None
+    start = 0
+    if first is not None and first.end() > width:
+        # Some context before the match, starting at a word boundary
+        start = max(0, first.start() - width // 4)
+        space = flat.find(" ", start, first.start())
+        start = space + 1 if space != -1 else start
+    end = min(len(flat), start + width)
+    body = flat[start:end]
+    prefix = "…" if start > 0 else ""
+    spans = [] if pattern is None else [
+        (m.start() + len(prefix), m.end() + len(prefix)) for m in pattern.finditer(body)
+    ]
+    return prefix + body + ("…" if end < len(flat) else ""), spans
+
+
+async def backfill_search_vectors(
+    factory: async_sessionmaker[AsyncSession] = async_session,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    reindex: bool = False,
+) -> dict:
+    """Write ``searchVector`` for rows that have none, or for every row with
+    ``reindex``; batches commit on their own."""
+    start = time.perf_counter()
+    indexed = 0
+    pending = true() if reindex else Message.searchVector.is_(None)
+    last_id = ""
+    while True:
+        async with factory() as db:
+            rows = (
+                await db.execute(
+                    select(Message.id, Message.content, Message.contentZstd)
+                    .where(Message.id > last_id, pending)
+                    .order_by(Message.id)
+                    .limit(batch_size)
+                )
+            ).all()
+            if not rows:
+                break
+            await db.execute(update(Message), [
+                {"id": id_, "searchVector": search_text(decode_content(content, packed))}
+                for id_, content, packed in rows
+            ])
+            await db.commit()
+        indexed += len(rows)
+        last_id = rows[-1].id
+        # Let request handlers run between batches
+        await asyncio.sleep(0)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info("[search] Indexed %d messages in %.1fms", indexed, elapsed_ms)
+    return {"indexed": indexed, "elapsedMs": round(elapsed_ms, 1)}
+
+
+async def _main(args: list[str]) -> None:
+    if args in ([], ["reindex"]):
+        print(await backfill_search_vectors(reindex=bool(args)))
+    else:
+        print(__doc__)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,151 @@
+"""Message writes for ``save_messages``.
+
+The chat route saves the turn's user message and its new assistant reply.
+``upsert_messages`` writes the batch as one ``INSERT ... ON CONFLICT (id)
+DO UPDATE`` whose ``WHERE`` clause only lets a conflicting row through when
+its ``contentHash`` differs, so a retried or duplicate save, which carries
+the same ids and content, costs no write, no WAL and no dead tuple. Rows saved before
+``contentHash`` existed have a NULL digest and are rewritten (and so
+backfilled) on their next save. Bodies are stored through
+``services.message_codec``, so large ones land compressed, and are indexed
+for search in the same statement (``services.message_search``). A rewritten
+row supersedes any streamed chunks still pending for it (see
+``services.message_chunks``).
+"""
+
+import hashlib
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import Boolean, delete, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.chat import Message, MessageChunk
+from services.context_window import estimate_tokens, lock_chat, resequence_offsets
+from services.message_codec import encode_content
+from services.message_search import search_text
+
+
+class UpsertResult(NamedTuple):
+    inserted: int
+    updated: int
+    # createdAt of the newest inserted message, or None if nothing was inserted
+    last_inserted_at: datetime | None
+
+
+def content_hash(content: str) -> str:
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def _insert(dialect: str, model=Message):
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"No upsert for dialect {dialect!r}")
+
+
+def _upsert(dialect: str):
+    """The batch upsert, returning ``(id, createdAt)`` of written rows, and on
+    Postgres whether each was inserted."""
+    stmt = _insert(dialect)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Message.id],
+        set_={
+            "content": stmt.excluded.content,
+            "contentZstd": stmt.excluded.contentZstd,
+            "contentHash": stmt.excluded.contentHash,
+            "tokenCount": stmt.excluded.tokenCount,
+            "searchVector": stmt.excluded.searchVector,
+        },
+        where=Message.contentHash.is_distinct_from(stmt.excluded.contentHash),
+    ).returning(Message.id, Message.createdAt)
+    if dialect == "postgresql":
+        # xmax is 0 only on a row version this statement inserted
+        stmt = stmt.returning(literal_column('("Message".xmax = 0)', Boolean).label("inserted"))
+    return stmt
+
+
+async def upsert_messages(
+    db: AsyncSession,
+    chat_id: str,
+    messages: list,
+    now: datetime,
+) -> UpsertResult:
+    """Insert new messages and rewrite changed ones in a single statement.
+
+    ``messages`` are objects with ``id``, ``role`` and ``content``. New rows
+    get ``createdAt`` = ``now`` plus their index in milliseconds, so a batch
+    keeps its order: the column is ``timestamp(3)`` on Postgres, where
+    microsecond steps would round onto one value and leave the order to the
+    random id. ``RETURNING`` yields only rows that were written. Postgres
+    tells inserts from updates by ``xmax``; SQLite (tests) has no ``xmax``,
+    so the ids present before the statement are the updates there.
+    """
+    if not messages:
+        return UpsertResult(0, 0, None)
+
+    await lock_chat(db, chat_id)
+    stamps = {m.id: now + timedelta(milliseconds=i) for i, m in enumerate(messages)}
+    rows = []
+    for m in messages:
+        stored, packed = encode_content(m.content)
+        rows.append({
+            "id": m.id,
+            "chatId": chat_id,
+            "role": m.role,
+            "content": stored,
+            "contentZstd": packed,
+            "contentHash": content_hash(m.content),
+            "tokenCount": estimate_tokens(m.content),
+            "searchVector": search_text(m.content),
+            "createdAt": stamps[m.id],
+        })
+    dialect = db.get_bind().dialect.name
+    stmt = _upsert(dialect)
+    if dialect == "postgresql":
+        written = (await db.execute(stmt, rows)).all()
+    else:
+        existing = set((await db.execute(select(Message.id).where(Message.id.in_(list(stamps))))).scalars())
+        written = [(msg_id, created, msg_id not in existing) for msg_id, created in await db.execute(stmt, rows)]
+    inserted_at = [created for _, created, inserted in written if inserted]
+    updated_ids = [msg_id for msg_id, _, inserted in written if not inserted]
+    if updated_ids:
+        # The full content just written already includes any streamed deltas
+        await db.execute(delete(MessageChunk).where(MessageChunk.messageId.in_(updated_ids)))
+    if written:
+        # Token offsets from the earliest written row on; usually just the new tail
+        await resequence_offsets(db, chat_id, since=min((created, msg_id) for msg_id, created, _ in written))
+    return UpsertResult(
+        inserted=len(inserted_at),
+        updated=len(updated_ids),
+        last_inserted_at=max(inserted_at, default=None),
+    )
+
+
+async def restore_messages(db: AsyncSession, chat_id: str, records: list[dict]) -> int:
+    """Insert archived messages back into the chat; returns rows inserted.
+
+    ``records`` have ``id``, ``role``, ``content``, ``tokenCount`` and
+    ``createdAt``. A message that exists already was written after it was
+    archived and is kept as it is. Callers resequence token offsets.
+    """
+    if not records:
+        return 0
+    rows = []
+    for record in records:
+        stored, packed = encode_content(record["content"])
+        rows.append({
+            "id": record["id"],
+            "chatId": chat_id,
+            "role": record["role"],
+            "content": stored,
+            "contentZstd": packed,
+            "contentHash": content_hash(record["content"]),
+            "tokenCount": record["tokenCount"],
+            "searchVector": search_text(record["content"]),
+            "createdAt": record["createdAt"],
+        })
+    stmt = _insert(db.get_bind().dialect.name).on_conflict_do_nothing(index_elements=[Message.id]).returning(Message.id)
+    return len((await db.execute(stmt, rows)).all())
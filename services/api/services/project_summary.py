@@ -0,0 +1,157 @@
+"""Denormalized chat summary on ``Project``: message count, last activity, preview.
+
+``save_messages`` keeps the columns current in the same transaction that
+writes the messages, so ``list_projects`` reads them straight off the
+``Project`` rows. ``repair_project_summaries`` recomputes them from
+``Message`` in primary-key batches and rewrites only the rows that drifted,
+e.g. after messages were deleted outside the API. Projects whose chat is
+archived (``services.chat_archive``) are skipped: their messages are not in
+``Message``, and their summary was current when they were archived.
+
+Run the repair as a CLI:
+
+    python -m services.project_summary
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from models.base import async_session, engine
+from models.chat import Chat, Message
+from models.project import Project
+from services.message_codec import decode_content, message_text
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 140
+REPAIR_BATCH_SIZE = 500
+
+
+def message_preview(content: str) -> str:
+    """First ``PREVIEW_LENGTH`` characters of the text parts, whitespace collapsed."""
+    preview = " ".join(message_text(content)[: PREVIEW_LENGTH * 2].split())
+    if len(preview) > PREVIEW_LENGTH:
+        preview = preview[: PREVIEW_LENGTH - 1].rstrip() + "…"
+    return preview
+
+
+async def _actual_summaries(
+    db: AsyncSession, project_ids: list[str]
+) -> dict[str, tuple[int, datetime, str]]:
+    """``project_id -> (count, newest createdAt, preview)`` for projects with messages."""
+    ranked = (
+        select(
+            Chat.projectId.label("project_id"),
+            Message.content,
+            Message.contentZstd,
+            Message.createdAt,
+            func.count().over(partition_by=Chat.projectId).label("message_count"),
+            func.row_number()
+            .over(partition_by=Chat.projectId, order_by=(Message.createdAt.desc(), Message.id.desc()))
+            .label("rank"),
+        )
+        .join(Message, Message.chatId == Chat.id)
+        .where(Chat.projectId.in_(project_ids))
+        .subquery()
+    )
+    rows = await db.execute(
+        select(
+            ranked.c.project_id,
+            ranked.c.message_count,
+            ranked.c.createdAt,
+            ranked.c.content,
+            ranked.c.contentZstd,
+        ).where(ranked.c.rank == 1)
+    )
+    return {
+        project_id: (count, created_at, message_preview(decode_content(content, packed)))
+        for project_id, count, created_at, content, packed in rows
+    }
+
+
+async def repair_project_summaries(
+    factory: async_sessionmaker[AsyncSession] = async_session,
+    batch_size: int = REPAIR_BATCH_SIZE,
+) -> dict:
+    """Recompute every project's summary; returns checked/repaired counts."""
+    start = time.perf_counter()
+    checked = repaired = 0
+    last_id = ""
+    while True:
+        async with factory() as db:
+            current = (
+                await db.execute(
+                    select(
+                        Project.id,
+                        Project.messageCount,
+                        Project.lastActivityAt,
+                        Project.lastMessagePreview,
+                    )
+                    .where(Project.id > last_id)
+                    .order_by(Project.id)
+                    .limit(batch_size)
+                )
+            ).all()
+            if not current:
+                break
+            actual = await _actual_summaries(db, [row.id for row in current])
+            archived = set(
+                (
+                    await db.execute(
+                        select(Chat.projectId).where(
+                            Chat.projectId.in_([row.id for row in current]), Chat.archivedAt.is_not(None)
+                        )
+                    )
+                ).scalars()
+            )
+
+            for project_id, count, last_activity, preview in current:
+                if project_id in archived:
+                    continue
+                expected_count, newest, expected_preview = actual.get(project_id, (0, None, None))
+                # save_messages stamps activity at save time, which can be later
+                # than the newest message's createdAt (streamed edits)
+                if newest is not None and last_activity is not None and last_activity > newest:
+                    expected_activity = last_activity
+                else:
+                    expected_activity = newest
+                if (count, last_activity, preview) == (expected_count, expected_activity, expected_preview):
+                    continue
+                await db.execute(
+                    update(Project)
+                    .where(Project.id == project_id)
+                    .values(
+                        messageCount=expected_count,
+                        lastActivityAt=expected_activity,
+                        lastMessagePreview=expected_preview,
+                        # A repair is not user activity
+                        updatedAt=Project.updatedAt,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                repaired += 1
+            await db.commit()
+
+        checked += len(current)
+        last_id = current[-1].id
+        # Let request handlers run between batches
+        await asyncio.sleep(0)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info("[summary] Checked %d projects, repaired %d in %.1fms", checked, repaired, elapsed_ms)
+    return {"checked": checked, "repaired": repaired, "elapsedMs": round(elapsed_ms, 1)}
+
+
+async def _main() -> None:
+    print(await repair_project_summaries())
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
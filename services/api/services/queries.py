@@ -0,0 +1,93 @@
+"""Pre-built SQLAlchemy Core statements for the hottest read paths.
+
+These lookups run on nearly every request but only need a handful of columns,
+so they skip ORM entity loading and identity-map bookkeeping entirely. The
+statements are built once at import time against the mapped ``Table`` objects
+(so their cache keys are memoized) and always execute with a dedicated
+``compiled_cache``, keeping them compiled regardless of what else churns
+through the engine-wide statement cache.
+
+Results come back as small ``NamedTuple`` records that expose the same
+attribute names as the ORM models, so callers can read them the same way.
+"""
+
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.util import LRUCache
+
+from models.project import Sandbox
+from models.user import Session, User
+
+_compiled_cache = LRUCache(64)
+_EXECUTION_OPTIONS = {"compiled_cache": _compiled_cache}
+
+_sessions = Session.__table__
+_users = User.__table__
+_sandboxes = Sandbox.__table__
+
+
+class UserRow(NamedTuple):
+    id: str
+    email: str
+    name: str | None
+    emailVerified: bool
+    image: str | None
+    createdAt: datetime
+    updatedAt: datetime
+
+
+class SessionRow(NamedTuple):
+    id: str
+    userId: str
+    token: str
+    expiresAt: datetime
+    ipAddress: str | None
+    userAgent: str | None
+    createdAt: datetime
+    updatedAt: datetime
+    user: UserRow
+
+
+class SandboxRow(NamedTuple):
+    id: str
+    modalId: str | None
+    tunnelUrl: str | None
+    status: str
+
+
+_SESSION_COLUMNS = [_sessions.c[name] for name in SessionRow._fields if name != "user"]
+_USER_COLUMNS = [_users.c[name] for name in UserRow._fields]
+
+SESSION_BY_TOKEN = (
+    select(*_SESSION_COLUMNS, *_USER_COLUMNS)
+    .select_from(_sessions.join(_users, _sessions.c.userId == _users.c.id))
+    .where(_sessions.c.token == bindparam("token"))
+)
+
+SANDBOX_BY_PROJECT = select(
+    *(_sandboxes.c[name] for name in SandboxRow._fields)
+).where(_sandboxes.c.projectId == bindparam("project_id"))
+
+
+async def _first(db: AsyncSession, stmt, params: dict):
+    conn = await db.connection()
+    result = await conn.execute(stmt, params, execution_options=_EXECUTION_OPTIONS)
+    return result.first()
+
+
+async def fetch_session_by_token(db: AsyncSession, token: str) -> SessionRow | None:
+    """Session + user for a plain session token, or None."""
+    row = await _first(db, SESSION_BY_TOKEN, {"token": token})
+    if row is None:
+        return None
+    n = len(_SESSION_COLUMNS)
+    return SessionRow(*row[:n], user=UserRow(*row[n:]))
+
+
+async def fetch_sandbox(db: AsyncSession, project_id: str) -> SandboxRow | None:
+    """The sandbox row for a project, or None."""
+    row = await _first(db, SANDBOX_BY_PROJECT, {"project_id": project_id})
+    return SandboxRow(*row) if row is not None else None
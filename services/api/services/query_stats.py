@@ -0,0 +1,123 @@
+"""Per-request query accounting, slow-statement logging and N+1 detection.
+
+``instrument(engine)`` hooks the engine's cursor events. Every statement
+executed while a ``track_queries()`` block is active is counted and timed
+into that block's ``QueryStats``; ``middleware.query_stats`` opens one
+such block per HTTP request. Stats live in a ``ContextVar``, which
+SQLAlchemy's async greenlets share with the calling task.
+
+Statements slower than ``query_slow_ms`` are logged whether or not a block
+is active. Parameters are never logged, only their types and sizes, since
+they carry session tokens and message content. A request that runs the same
+statement ``query_repeat_warn`` times or more (the shape of an N+1 loop) is
+logged as a warning.
+"""
+
+import logging
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar["QueryStats | None"] = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    __slots__ = ("count", "total_ms", "slow", "statements")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.slow: list[tuple[float, str]] = []
+        self.statements: Counter[str] = Counter()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] += 1
+        if elapsed_ms >= settings.query_slow_ms:
+            self.slow.append((elapsed_ms, statement))
+
+    def merge(self, other: "QueryStats") -> None:
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.slow.extend(other.slow)
+        self.statements.update(other.statements)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements run at least ``threshold`` times, most frequent first."""
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Collect stats for statements run inside the block.
+
+    Nested blocks fold their totals into the enclosing one on exit, so a
+    test can wrap requests whose middleware tracks them separately.
+    """
+    stats = QueryStats()
+    parent = _current.get()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        if parent is not None:
+            parent.merge(stats)
+
+
+def redact_parameters(parameters) -> str:
+    """Describe bound parameters by type (and length for strings/bytes) only."""
+
+    def describe(value) -> str:
+        if value is None:
+            return "None"
+        if isinstance(value, (str, bytes)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {describe(v)}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(describe(v) for v in parameters) + ")"
+    return describe(parameters)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+    if elapsed_ms >= settings.query_slow_ms:
+        logger.warning(
+            "[db] Slow query (%.1fms): %s params=%s",
+            elapsed_ms, " ".join(statement.split()),
+            "[batch]" if executemany else redact_parameters(parameters),
+        )
+
+
+def _handle_error(exception_context) -> None:
+    # The statement failed, so after_cursor_execute will not pop its start time
+    conn = exception_context.connection
+    if conn is not None and exception_context.cursor is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+def instrument(engine: AsyncEngine) -> None:
+    target = engine.sync_engine
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "handle_error", _handle_error)
@@ -6,9 +6,10 @@ import posixpath
 
 import modal
 from cuid2 import cuid_wrapper
-from sqlalchemy import select
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from services.queries import fetch_sandbox
 from services.storage import StorageService
 
 logger = logging.getLogger(__name__)
@@ -67,17 +68,14 @@ class SandboxManager:
                 now = datetime.now(timezone.utc).replace(tzinfo=None)
                 modal_id = sb.object_id
 
-                # Upsert sandbox row
-                stmt = select(SandboxModel).where(SandboxModel.projectId == sandbox_id)
-                result = await db.execute(stmt)
-                existing = result.scalar_one_or_none()
-
-                if existing:
-                    existing.modalId = modal_id
-                    existing.status = "running"
-                    existing.tunnelUrl = None
-                    existing.updatedAt = now
-                else:
+                # Upsert sandbox row: update in place, insert only if missing
+                result = await db.execute(
+                    update(SandboxModel)
+                    .where(SandboxModel.projectId == sandbox_id)
+                    .values(modalId=modal_id, status="running", tunnelUrl=None, updatedAt=now)
+                )
+
+                if result.rowcount == 0:
                     sandbox_row = SandboxModel(
                         id=cuid(),
                         projectId=sandbox_id,
@@ -135,9 +133,7 @@ class SandboxManager:
 
         # Try to reconnect from DB
         if db:
-            stmt = select(SandboxModel).where(SandboxModel.projectId == sandbox_id)
-            result = await db.execute(stmt)
-            sandbox_row = result.scalar_one_or_none()
+            sandbox_row = await fetch_sandbox(db, sandbox_id)
 
             if sandbox_row and sandbox_row.modalId:
                 try:
@@ -156,9 +152,13 @@ class SandboxManager:
                     )
                     from datetime import datetime, timezone
 
-                    sandbox_row.status = "expired"
-                    sandbox_row.updatedAt = datetime.now(timezone.utc).replace(
-                        tzinfo=None
+                    await db.execute(
+                        update(SandboxModel)
+                        .where(SandboxModel.projectId == sandbox_id)
+                        .values(
+                            status="expired",
+                            updatedAt=datetime.now(timezone.utc).replace(tzinfo=None),
+                        )
                     )
                     await db.commit()
 
@@ -287,15 +287,15 @@ class SandboxManager:
         if tunnel:
             # Persist tunnel URL to DB
             if db:
-                stmt = select(SandboxModel).where(SandboxModel.projectId == sandbox_id)
-                result = await db.execute(stmt)
-                sandbox_row = result.scalar_one_or_none()
-                if sandbox_row:
-                    sandbox_row.tunnelUrl = tunnel.url
-                    sandbox_row.updatedAt = datetime.now(timezone.utc).replace(
-                        tzinfo=None
+                await db.execute(
+                    update(SandboxModel)
+                    .where(SandboxModel.projectId == sandbox_id)
+                    .values(
+                        tunnelUrl=tunnel.url,
+                        updatedAt=datetime.now(timezone.utc).replace(tzinfo=None),
                     )
-                    await db.commit()
+                )
+                await db.commit()
 
             return {"previewUrl": tunnel.url, "status": "ready"}
         return {"previewUrl": None, "status": "not_ready"}
@@ -363,12 +363,14 @@ class SandboxManager:
 
         # Update DB status
         if db:
-            stmt = select(SandboxModel).where(SandboxModel.projectId == sandbox_id)
-            result = await db.execute(stmt)
-            sandbox_row = result.scalar_one_or_none()
-            if sandbox_row:
-                sandbox_row.status = "terminated"
-                sandbox_row.updatedAt = datetime.now(timezone.utc).replace(tzinfo=None)
-                await db.commit()
+            await db.execute(
+                update(SandboxModel)
+                .where(SandboxModel.projectId == sandbox_id)
+                .values(
+                    status="terminated",
+                    updatedAt=datetime.now(timezone.utc).replace(tzinfo=None),
+                )
+            )
+            await db.commit()
 
         return {"status": "terminated"}
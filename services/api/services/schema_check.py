@@ -0,0 +1,100 @@
+"""Verify that the live database has the indexes the hot queries rely on.
+
+The schema is owned by Prisma (``db:push`` from packages/database), so the
+indexes declared on the SQLAlchemy models are a statement of what the API
+needs rather than something it creates. ``missing_indexes`` compares the
+two by column list, not by name, so a unique constraint covering the same
+columns also counts. Indexes declared for one dialect only (``ddl_if``)
+are required only there.
+
+Run as a CLI (exit status 1 if anything is missing):
+
+    python -m services.schema_check
+"""
+
+import asyncio
+import logging
+import sys
+
+from sqlalchemy import Connection, Index, inspect
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from models import Base
+from models.base import engine
+
+logger = logging.getLogger(__name__)
+
+
+def _applies(index: Index, dialect: str | None) -> bool:
+    condition = index._ddl_if
+    return dialect is None or condition is None or condition.dialect in (None, dialect)
+
+
+def required_indexes(dialect: str | None = None) -> dict[str, list[tuple[str, ...]]]:
+    """Column lists, per table, of every index and unique column on the models.
+
+    With ``dialect``, indexes declared for other dialects are left out.
+    """
+    required: dict[str, list[tuple[str, ...]]] = {}
+    for table in Base.metadata.sorted_tables:
+        columns = [
+            tuple(c.name for c in index.columns) for index in table.indexes if _applies(index, dialect)
+        ]
+        columns += [(c.name,) for c in table.columns if c.unique]
+        if columns:
+            required[table.name] = columns
+    return required
+
+
+def _existing_indexes(conn: Connection) -> dict[str, set[tuple[str, ...]]]:
+    inspector = inspect(conn)
+    existing: dict[str, set[tuple[str, ...]]] = {}
+    for table in required_indexes(conn.dialect.name):
+        if not inspector.has_table(table):
+            existing[table] = set()
+            continue
+        found = {tuple(ix["column_names"]) for ix in inspector.get_indexes(table)}
+        found |= {tuple(uc["column_names"]) for uc in inspector.get_unique_constraints(table)}
+        existing[table] = found
+    return existing
+
+
+async def missing_indexes(db_engine: AsyncEngine = engine) -> list[str]:
+    """``Table(col, ...)`` for each required index absent from the live schema."""
+    async with db_engine.connect() as conn:
+        existing = await conn.run_sync(_existing_indexes)
+    return [
+        f"{table}({', '.join(columns)})"
+        for table, required in required_indexes(db_engine.dialect.name).items()
+        for columns in required
+        if columns not in existing[table]
+    ]
+
+
+async def check_indexes(db_engine: AsyncEngine = engine) -> list[str]:
+    """Log any missing indexes; failures to inspect are logged, not raised."""
+    try:
+        missing = await missing_indexes(db_engine)
+    except Exception as exc:
+        logger.warning("[schema] Index check skipped: %s", exc)
+        return []
+    if missing:
+        logger.warning(
+            "[schema] Missing indexes (run db:push from packages/database): %s",
+            ", ".join(missing),
+        )
+    return missing
+
+
+async def _main() -> int:
+    missing = await missing_indexes()
+    await engine.dispose()
+    for name in missing:
+        print(f"missing index: {name}")
+    if not missing:
+        print("all required indexes present")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
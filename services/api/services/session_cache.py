@@ -0,0 +1,143 @@
+"""Process-local cache for better-auth session lookups.
+
+Both the FastAPI auth dependencies and the Socket.IO ``connect`` handler
+resolve a session token to a ``Session`` row (with its ``User`` joined) on
+every request. This cache keeps recently resolved sessions in a bounded LRU
+so most requests never touch the DB pool.
+
+Entries live for ``session_cache_ttl_seconds`` but never past the session's
+own ``expiresAt``. Unknown tokens are cached as misses for a shorter
+``session_cache_negative_ttl_seconds`` so a stream of bad cookies cannot
+hammer the table. Sessions are revoked by better-auth (in the Next.js app),
+so the TTL bounds how long a revoked session may still be accepted here;
+in-process revocation should call ``invalidate`` / ``invalidate_user``.
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from services.queries import SessionRow, fetch_session_by_token
+
+
+class SessionCache:
+    """Bounded LRU + TTL cache mapping plain session tokens to ``SessionRow``s.
+
+    Cached values are immutable tuples with ``user`` already populated, so they
+    are safe to share between requests. All operations are synchronous and run
+    on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        # token -> (deadline on the monotonic clock, SessionRow or None for a miss)
+        self._entries: OrderedDict[str, tuple[float, SessionRow | None]] = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, token: str) -> tuple[bool, SessionRow | None]:
+        """Return ``(found, session)``; ``found`` is False on a cache miss."""
+        entry = self._entries.get(token)
+        if entry is None:
+            return False, None
+        deadline, session = entry
+        if deadline <= time.monotonic():
+            del self._entries[token]
+            return False, None
+        self._entries.move_to_end(token)
+        return True, session
+
+    def _store(self, token: str, session: SessionRow | None, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        self._entries[token] = (time.monotonic() + ttl, session)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def resolve(self, db: AsyncSession, token: str) -> SessionRow | None:
+        """Resolve a plain session token to its session (user joined).
+
+        Returns None for unknown tokens. Expired rows are returned uncached so
+        callers keep ownership of the expiry check and its error message.
+        """
+        if self.enabled:
+            found, session = self._lookup(token)
+            if found:
+                if session is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return session
+            self.misses += 1
+
+        session = await fetch_session_by_token(db, token)
+
+        if not self.enabled:
+            return session
+
+        if session is None:
+            self._store(token, None, self.negative_ttl_seconds)
+            return None
+
+        remaining = (
+            session.expiresAt.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)
+        ).total_seconds()
+        if remaining > 0:
+            self._store(token, session, min(self.ttl_seconds, remaining))
+        return session
+
+    def invalidate(self, token: str) -> None:
+        """Drop a single token, e.g. after logout."""
+        self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop every cached session belonging to ``user_id``. Returns the count."""
+        tokens = [
+            token
+            for token, (_, session) in self._entries.items()
+            if session is not None and session.userId == user_id
+        ]
+        for token in tokens:
+            del self._entries[token]
+        return len(tokens)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxSize": self.max_size,
+            "hits": self.hits,
+            "negativeHits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+session_cache = SessionCache(
+    max_size=settings.session_cache_max_size,
+    ttl_seconds=settings.session_cache_ttl_seconds,
+    negative_ttl_seconds=settings.session_cache_negative_ttl_seconds,
+)
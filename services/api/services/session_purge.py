@@ -0,0 +1,88 @@
+"""Background purge of expired better-auth ``Session`` and ``Verification`` rows.
+
+better-auth never deletes expired rows on its own, so the tables (and the
+unique ``token`` index used by every authenticated request) grow without
+bound. The purge deletes in primary-key batches, each in its own short
+transaction, so it never holds row locks for long.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from models.base import async_session
+from models.user import Session, Verification
+
+logger = logging.getLogger(__name__)
+
+PURGED_MODELS = (Session, Verification)
+
+
+async def _purge_model(
+    factory: async_sessionmaker[AsyncSession],
+    model: type[Session] | type[Verification],
+    cutoff: datetime,
+    batch_size: int,
+) -> int:
+    """Delete expired rows of ``model`` in batches. Returns the number deleted."""
+    purged = 0
+    while True:
+        batch = (
+            select(model.id)
+            .where(model.expiresAt < cutoff)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        async with factory() as db:
+            result = await db.execute(
+                delete(model)
+                .where(model.id.in_(batch))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        deleted = result.rowcount or 0
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+        # Let request handlers run between batches
+        await asyncio.sleep(0)
+
+
+async def purge_expired_rows(
+    factory: async_sessionmaker[AsyncSession] = async_session,
+    batch_size: int | None = None,
+) -> dict:
+    """Run one purge pass over every table in ``PURGED_MODELS``."""
+    batch_size = batch_size or settings.session_purge_batch_size
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None)
+    start = time.perf_counter()
+
+    purged: dict[str, int] = {}
+    for model in PURGED_MODELS:
+        purged[model.__tablename__] = await _purge_model(factory, model, cutoff, batch_size)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(
+        "[purge] Removed %s expired rows in %.1fms",
+        ", ".join(f"{count} {name}" for name, count in purged.items()),
+        elapsed_ms,
+    )
+    return {"purged": purged, "elapsedMs": round(elapsed_ms, 1)}
+
+
+async def run_purge_loop(interval_seconds: float | None = None) -> None:
+    """Purge forever on a fixed cadence. Cancelled by the app lifespan."""
+    interval = interval_seconds or settings.session_purge_interval_seconds
+    while True:
+        try:
+            await purge_expired_rows()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.error("[purge] Expired row purge failed: %s", exc)
+        await asyncio.sleep(interval)
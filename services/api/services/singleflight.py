@@ -0,0 +1,93 @@
+"""Coalesce identical concurrent reads into a single computation.
+
+The web app fetches the same project, chat and sandbox status from several
+tabs and from the chat route at once. ``SingleFlight.run`` lets the first
+caller for a key (the leader) do the work while concurrent callers with the
+same key await its result. With ``ttl_seconds`` > 0 the result is also kept
+for a few milliseconds after completion to absorb bursts.
+
+Keys must include everything the result depends on — route, parameters and
+the authenticated user — since the result is handed to every caller sharing
+the key.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from config import settings
+
+
+class SingleFlight:
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._recent: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.leaders = 0
+        self.shared = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            recent = self._recent.get(key)
+            if recent is not None:
+                if recent[0] > time.monotonic():
+                    self.shared += 1
+                    return recent[1]
+                del self._recent[key]
+
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leader was cancelled (e.g. its client disconnected);
+                # try again, possibly as the new leader. If we ourselves were
+                # cancelled the future is still pending and we re-raise.
+                if future.cancelled():
+                    continue
+                raise
+            self.shared += 1
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark retrieved so a leader without followers does not warn
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(result)
+        if self.ttl_seconds > 0:
+            self._recent[key] = (time.monotonic() + self.ttl_seconds, result)
+            while len(self._recent) > self.max_entries:
+                self._recent.popitem(last=False)
+        return result
+
+    def forget(self, key: Hashable) -> None:
+        """Drop a recently completed result, e.g. after a write."""
+        self._recent.pop(key, None)
+
+    def forget_prefix(self, prefix: tuple) -> None:
+        """Drop recently completed results for every key starting with ``prefix``."""
+        n = len(prefix)
+        for key in [k for k in self._recent if isinstance(k, tuple) and k[:n] == prefix]:
+            del self._recent[key]
+
+    def clear(self) -> None:
+        self._recent.clear()
+
+
+read_coalescer = SingleFlight(ttl_seconds=settings.coalesce_ttl_ms / 1000)
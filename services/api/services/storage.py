@@ -1,4 +1,4 @@
-"""S3-compatible storage service for project file snapshots."""
+"""S3-compatible storage service for project file snapshots and archived chat segments."""
 
 import io
 import logging
@@ -15,7 +15,7 @@ EXCLUDED_DIRS = {"node_modules", ".next", ".git", "__pycache__"}
 
 
 class StorageService:
-    """Upload and download project file snapshots to S3/MinIO."""
+    """Upload and download project file snapshots and chat segments to S3/MinIO."""
 
     def __init__(self) -> None:
         self._session = aioboto3.Session()
@@ -33,6 +33,9 @@ class StorageService:
     def _s3_key(self, project_id: str) -> str:
         return f"snapshots/{project_id}/latest.tar.gz"
 
+    def _segment_key(self, chat_id: str, segment_id: str) -> str:
+        return f"chat-archive/{chat_id}/{segment_id}.ndjson.zst"
+
     async def _ensure_bucket(self, client) -> None:
         """Create the bucket if it doesn't exist."""
         try:
@@ -124,3 +127,28 @@ class StorageService:
                 return True
             except Exception:
                 return False
+
+    async def upload_chat_segment(self, chat_id: str, segment_id: str, data: bytes) -> str:
+        """Upload an archived chat segment; returns its S3 key."""
+        key = self._segment_key(chat_id, segment_id)
+        async with self._session.client(**self._client_kwargs()) as client:
+            await self._ensure_bucket(client)
+            await client.put_object(Bucket=settings.s3_bucket, Key=key, Body=data)
+        return key
+
+    async def download_chat_segment(self, key: str) -> bytes:
+        """Download an archived chat segment. Unlike snapshots, errors raise:
+        a missing segment is missing messages."""
+        async with self._session.client(**self._client_kwargs()) as client:
+            response = await client.get_object(Bucket=settings.s3_bucket, Key=key)
+            return await response["Body"].read()
+
+    async def delete_chat_segments(self, keys: list[str]) -> None:
+        """Delete segments that no stub references any more."""
+        async with self._session.client(**self._client_kwargs()) as client:
+            # DeleteObjects takes at most 1000 keys per call
+            for i in range(0, len(keys), 1000):
+                await client.delete_objects(
+                    Bucket=settings.s3_bucket,
+                    Delete={"Objects": [{"Key": key} for key in keys[i : i + 1000]], "Quiet": True},
+                )
@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta, timezone
 from collections.abc import AsyncGenerator
+from contextlib import contextmanager
 
 import pytest
 import pytest_asyncio
@@ -13,6 +14,7 @@ from sqlalchemy.ext.asyncio import (
 
 from models.base import Base
 from models.user import User, Session as UserSession
+from services.query_stats import instrument, track_queries
 
 # In the DB better-auth stores the plain token.
 # The cookie carries "TOKEN.HMAC_SIGNATURE"; _extract_token strips the signature.
@@ -33,6 +35,9 @@ test_async_session = async_sessionmaker(
 )
 
 
+instrument(test_engine)
+
+
 # SQLite needs foreign keys enabled explicitly
 @event.listens_for(test_engine.sync_engine, "connect")
 def _set_sqlite_pragma(dbapi_conn, connection_record):
@@ -46,6 +51,46 @@ def _set_sqlite_pragma(dbapi_conn, connection_record):
 # ---------------------------------------------------------------------------
 
 
+@pytest.fixture(autouse=True)
+def _reset_session_cache():
+    """The session cache is process-wide; keep tests isolated from each other."""
+    from services.session_cache import session_cache
+
+    session_cache.clear()
+    yield
+    session_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_rate_limiter():
+    from middleware.security import rate_limiter
+
+    rate_limiter.clear()
+    yield
+    rate_limiter.clear()
+
+
+@pytest.fixture
+def query_budget():
+    """Fail the test if a block runs more statements than its budget.
+
+        with query_budget(3):
+            await auth_client.get("/api/projects")
+    """
+
+    @contextmanager
+    def budget(max_queries: int):
+        with track_queries() as stats:
+            yield stats
+        if stats.count > max_queries:
+            statements = "\n".join(
+                f"  {n}x {' '.join(s.split())[:160]}" for s, n in stats.statements.most_common()
+            )
+            pytest.fail(f"{stats.count} queries, budget was {max_queries}:\n{statements}")
+
+    return budget
+
+
 @pytest_asyncio.fixture
 async def db_session() -> AsyncGenerator[AsyncSession, None]:
     """Create all tables, yield a session, then drop everything."""
@@ -98,13 +143,14 @@ async def test_session(db_session: AsyncSession, test_user: User) -> UserSession
 @pytest_asyncio.fixture
 async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
     """Create a test client with DB dependency overridden."""
-    from dependencies.database import get_db
+    from dependencies.database import get_db, get_session_factory
     from main import app
 
     async def _override_get_db():
         yield db_session
 
     app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: test_async_session
 
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as c:
@@ -118,13 +164,14 @@ async def auth_client(
     db_session: AsyncSession, test_session: UserSession
 ) -> AsyncGenerator[AsyncClient, None]:
     """Create a test client that sends a valid session cookie."""
-    from dependencies.database import get_db
+    from dependencies.database import get_db, get_session_factory
     from main import app
 
     async def _override_get_db():
         yield db_session
 
     app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: test_async_session
 
     transport = ASGITransport(app=app)
     cookies = {"better-auth.session_token": SIGNED_TEST_COOKIE}
@@ -134,3 +181,45 @@ async def auth_client(
         yield c
 
     app.dependency_overrides.clear()
+
+
+@pytest_asyncio.fixture
+async def csrf_headers(auth_client: AsyncClient) -> dict:
+    """Headers that pass the CSRF check on ``auth_client``'s writes."""
+    csrf_resp = await auth_client.get("/api/security/csrf-token")
+    return {
+        "x-csrf-token": csrf_resp.json()["csrfToken"],
+        "origin": "http://localhost:3000",
+    }
+
+
+@pytest.fixture
+def create_project(auth_client: AsyncClient, csrf_headers: dict):
+    """Create a project owned by the test user; returns its id."""
+
+    async def _create(name: str = "P") -> str:
+        response = await auth_client.post("/api/projects", json={"name": name}, headers=csrf_headers)
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    return _create
+
+
+@pytest_asyncio.fixture
+async def project_id(create_project) -> str:
+    return await create_project()
+
+
+@pytest.fixture
+def save_messages(auth_client: AsyncClient, csrf_headers: dict):
+    """Save ``messages`` to the project's chat the way the web app's chat route does."""
+
+    async def _save(project_id: str, messages: list[dict]) -> None:
+        response = await auth_client.post(
+            f"/api/projects/{project_id}/chat/messages",
+            json={"userId": "test-user-id", "messages": messages},
+            headers=csrf_headers,
+        )
+        assert response.status_code == 200
+
+    return _save
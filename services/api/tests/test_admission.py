@@ -0,0 +1,51 @@
+import pytest
+from httpx import AsyncClient
+
+from config import settings
+from middleware.admission import admission_controller, loop_lag_monitor, route_class
+from models.base import engine
+
+
+def test_route_classes():
+    assert route_class("/health") == "critical"
+    assert route_class("/api/user/me") == "critical"
+    assert route_class("/sandbox/run-command") == "sandbox"
+    assert route_class("/api/projects") == "default"
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_sheds_default_lane_but_not_health(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(loop_lag_monitor, "lag_ms", settings.admission_max_loop_lag_ms + 1)
+
+    response = await client.get("/api/projects/p1/sandbox-status")
+    assert response.status_code == 503
+    assert response.json() == {"error": "Service overloaded"}
+    assert response.headers["retry-after"] == str(settings.admission_retry_after_seconds)
+
+    assert (await client.get("/health")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_pool_wait_sheds_until_checkout_completes(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(settings, "admission_max_pool_wait_ms", 0.0)
+    wait_id = engine.pool.stats.begin_wait()
+    try:
+        assert (await client.get("/api/projects/p1/sandbox-status")).status_code == 503
+    finally:
+        engine.pool.stats.end_wait(wait_id)
+    assert (await client.get("/api/projects/p1/sandbox-status")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_in_flight_cap_per_lane(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(settings, "admission_max_inflight", {"critical": 1, "sandbox": 1, "default": 1})
+    monkeypatch.setitem(admission_controller.in_flight, "default", 1)
+    assert (await client.get("/api/projects/p1/sandbox-status")).status_code == 503
+    # Other lanes have their own budget
+    assert (await client.get("/health")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_in_flight_is_released(client: AsyncClient):
+    await client.get("/health")
+    assert admission_controller.in_flight == {"critical": 0, "sandbox": 0, "default": 0}
@@ -0,0 +1,135 @@
+import json
+from datetime import datetime
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from config import settings
+
+
+@pytest.mark.asyncio
+async def test_get_chat_empty(auth_client: AsyncClient):
+    response = await auth_client.get("/api/projects/nonexistent-id/chat")
+    assert response.status_code == 200
+    assert response.json() == {"chat": None, "messages": [], "olderCursor": None, "newerCursor": None}
+
+
+@pytest.mark.asyncio
+async def test_save_and_get_messages(auth_client: AsyncClient, csrf_headers: dict, project_id: str):
+    response = await auth_client.post(
+        f"/api/projects/{project_id}/chat/messages",
+        json={
+            "userId": "test-user-id",
+            "messages": [
+                {"id": "m1", "role": "user", "content": "Build a todo app"},
+                {"id": "m2", "role": "assistant", "content": "Sure"},
+            ],
+        },
+        headers=csrf_headers,
+    )
+    assert response.status_code == 200
+    chat_id = response.json()["chatId"]
+
+    data = (await auth_client.get(f"/api/projects/{project_id}/chat")).json()
+    assert data["chat"]["id"] == chat_id
+    assert data["chat"]["projectId"] == project_id
+    assert [(m["id"], m["role"], m["content"]) for m in data["messages"]] == [
+        ("m1", "user", "Build a todo app"),
+        ("m2", "assistant", "Sure"),
+    ]
+    # Datetimes keep the isoformat() wire format the web app parses
+    created_at = data["messages"][0]["createdAt"]
+    assert datetime.fromisoformat(created_at).isoformat() == created_at
+
+
+@pytest.mark.asyncio
+async def test_project_responses_keep_wire_format(auth_client: AsyncClient, project_id: str):
+    listed = (await auth_client.get("/api/projects")).json()
+    fetched = (await auth_client.get(f"/api/projects/{project_id}")).json()
+    assert listed == [fetched]
+    assert fetched["sandbox"] is None
+    assert set(fetched) == {
+        "id", "name", "description", "userId", "createdAt", "updatedAt",
+        "messageCount", "lastActivityAt", "lastMessagePreview", "sandbox",
+    }
+
+
+@pytest.mark.asyncio
+async def test_chat_history_pages_by_cursor(auth_client: AsyncClient, csrf_headers: dict, project_id: str):
+    url = f"/api/projects/{project_id}/chat"
+    messages = [{"id": f"m{i:02}", "role": "user", "content": str(i)} for i in range(7)]
+    await auth_client.post(f"{url}/messages", json={"userId": "test-user-id", "messages": messages}, headers=csrf_headers)
+
+    def ids(page: dict) -> list[str]:
+        return [m["id"] for m in page["messages"]]
+
+    latest = (await auth_client.get(url, params={"limit": 3})).json()
+    assert ids(latest) == ["m04", "m05", "m06"]
+    assert latest["newerCursor"] is None
+
+    older = (await auth_client.get(url, params={"limit": 3, "before": latest["olderCursor"]})).json()
+    assert ids(older) == ["m01", "m02", "m03"]
+    oldest = (await auth_client.get(url, params={"limit": 3, "before": older["olderCursor"]})).json()
+    assert ids(oldest) == ["m00"]
+    assert oldest["olderCursor"] is None
+
+    newer = (await auth_client.get(url, params={"limit": 3, "after": oldest["newerCursor"]})).json()
+    assert ids(newer) == ["m01", "m02", "m03"]
+    rest = (await auth_client.get(url, params={"limit": 10, "after": newer["newerCursor"]})).json()
+    assert ids(rest) == ["m04", "m05", "m06"]
+    assert rest["newerCursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_chat_history_rejects_bad_cursors(auth_client: AsyncClient):
+    url = "/api/projects/p1/chat"
+    assert (await auth_client.get(url, params={"before": "not-a-cursor"})).status_code == 400
+    assert (await auth_client.get(url, params={"before": "a", "after": "b"})).status_code == 400
+    assert (await auth_client.get(url, params={"limit": 0})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_streams_ndjson_in_batches(
+    auth_client: AsyncClient, monkeypatch, csrf_headers: dict, project_id: str
+):
+    monkeypatch.setattr(settings, "chat_export_batch_size", 2)
+    url = f"/api/projects/{project_id}/chat"
+    messages = [{"id": f"m{i}", "role": "user", "content": f"message {i}"} for i in range(5)]
+    await auth_client.post(f"{url}/messages", json={"userId": "test-user-id", "messages": messages}, headers=csrf_headers)
+    # A message still streaming is exported with its pending chunks
+    for offset, chunk in [(0, "stre"), (4, "aming")]:
+        chunk_body = {"userId": "test-user-id", "offset": offset, "chunk": chunk}
+        await auth_client.post(f"{url}/messages/a1/chunks", json=chunk_body, headers=csrf_headers)
+
+    from main import app
+
+    bodies = []
+
+    async def recording_app(scope, receive, send):
+        async def record(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                bodies.append(message["body"])
+            await send(message)
+
+        await app(scope, receive, record)
+
+    transport = ASGITransport(app=recording_app)
+    async with AsyncClient(transport=transport, base_url="http://test", cookies=auth_client.cookies) as client:
+        response = await client.get(f"{url}/export", headers={"accept-encoding": "identity"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    # Header line, then one body message per cursor batch of two rows
+    assert len(bodies) == 4
+    header, *lines = [json.loads(line) for line in response.content.splitlines()]
+    assert header["chat"]["projectId"] == project_id
+    assert [(m["id"], m["content"]) for m in lines] == [
+        *[(f"m{i}", f"message {i}") for i in range(5)],
+        ("a1", "streaming"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_without_chat_is_header_only(auth_client: AsyncClient):
+    response = await auth_client.get("/api/projects/nonexistent-id/chat/export")
+    assert response.status_code == 200
+    assert response.text == '{"chat":null}\n'
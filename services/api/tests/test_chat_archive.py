@@ -0,0 +1,233 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.chat import Chat, ChatArchiveSegment, Message
+from models.project import Project
+from services import chat_archive
+from services.chat_archive import archive_chat, archive_idle_chats, hydrate_chat
+from services.project_summary import repair_project_summaries
+from tests import conftest
+
+
+class MemoryStore:
+    """In-memory stand-in for the S3 bucket, with the segment methods of StorageService."""
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self.fail_downloads = False
+        self.on_upload = None
+        self.on_download = None
+
+    async def upload_chat_segment(self, chat_id: str, segment_id: str, data: bytes) -> str:
+        key = f"chat-archive/{chat_id}/{segment_id}.ndjson.zst"
+        self.objects[key] = data
+        if self.on_upload is not None:
+            await self.on_upload()
+        return key
+
+    async def download_chat_segment(self, key: str) -> bytes:
+        if self.fail_downloads:
+            raise ConnectionError("storage down")
+        if self.on_download is not None:
+            await self.on_download()
+        return self.objects[key]
+
+    async def delete_chat_segments(self, keys: list[str]) -> None:
+        for key in keys:
+            self.objects.pop(key, None)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    memory = MemoryStore()
+    monkeypatch.setattr(chat_archive, "archive_store", memory)
+    return memory
+
+
+async def _age(db: AsyncSession, days: float = 365) -> None:
+    await db.execute(update(Chat).values(updatedAt=datetime.now() - timedelta(days=days)))
+    await db.commit()
+
+
+async def _count(db: AsyncSession, model) -> int:
+    return (await db.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_archive_then_open_restores_the_chat(
+    auth_client: AsyncClient, db_session: AsyncSession, store: MemoryStore, monkeypatch,
+    project_id: str, save_messages,
+):
+    monkeypatch.setattr(settings, "chat_archive_segment_messages", 2)
+    big = "".join(f"export const step{i} = {i};\n" for i in range(1000))
+    await save_messages(project_id, [
+        {"id": "m0", "role": "system", "content": "You build apps"},
+        {"id": "m1", "role": "user", "content": "Add a pricing page"},
+        {"id": "m2", "role": "assistant", "content": big},
+        {"id": "m3", "role": "user", "content": "Thanks"},
+        {"id": "m4", "role": "assistant", "content": "Done"},
+    ])
+    url = f"/api/projects/{project_id}/chat"
+    before = (await auth_client.get(url)).json()
+    projects_before = (await auth_client.get("/api/projects")).json()
+    await _age(db_session)
+
+    result = await archive_idle_chats(conftest.test_async_session)
+    assert (result["chats"], result["messages"], result["segments"]) == (1, 5, 3)
+    assert await _count(db_session, Message) == 0
+    assert await _count(db_session, ChatArchiveSegment) == len(store.objects) == 3
+    # Segments compress as a whole, so they beat the per-message codec
+    assert result["bytes"] < len(big.encode()) / 10
+    # The project list reads the summary columns, which archiving leaves alone
+    assert (await auth_client.get("/api/projects")).json() == projects_before
+
+    assert (await auth_client.get(url)).json()["messages"] == before["messages"]
+    db_session.expire_all()
+    chat = (await db_session.execute(select(Chat))).scalar_one()
+    assert chat.archivedAt is None and chat.hydratedAt is not None
+    assert await _count(db_session, Message) == 5
+    context = (await auth_client.get(f"{url}/context", params={"budget": 10_000})).json()
+    assert [m["id"] for m in context["messages"]] == ["m0", "m1", "m2", "m3", "m4"]
+    assert (await auth_client.get(f"{url}/search", params={"q": "pricing"})).json()["results"][0]["id"] == "m1"
+
+    # Recently opened: not archived again. Its old segments are swept.
+    result = await archive_idle_chats(conftest.test_async_session)
+    assert (result["chats"], result["swept"]) == (0, 3)
+    assert store.objects == {}
+    assert await _count(db_session, ChatArchiveSegment) == 0
+
+
+@pytest.mark.asyncio
+async def test_save_to_archived_chat_appends_after_its_history(
+    auth_client: AsyncClient, db_session: AsyncSession, store: MemoryStore, project_id: str, save_messages
+):
+    history = [{"id": f"m{i}", "role": "user", "content": f"step {i}"} for i in range(3)]
+    await save_messages(project_id, history)
+    await _age(db_session)
+    assert (await archive_idle_chats(conftest.test_async_session))["chats"] == 1
+
+    await save_messages(project_id, [*history, {"id": "m3", "role": "user", "content": "step 3"}])
+    data = (await auth_client.get(f"/api/projects/{project_id}/chat")).json()
+    assert [m["id"] for m in data["messages"]] == ["m0", "m1", "m2", "m3"]
+    project = (await auth_client.get(f"/api/projects/{project_id}")).json()
+    assert project["messageCount"] == 4
+
+
+@pytest.mark.asyncio
+async def test_chat_written_during_upload_is_left_alone(
+    auth_client: AsyncClient, db_session: AsyncSession, store: MemoryStore, project_id: str, save_messages
+):
+    await save_messages(project_id, [{"id": "m0", "role": "user", "content": "hi"}])
+    await _age(db_session)
+    chat_id = (await db_session.execute(select(Chat.id))).scalar_one()
+    await db_session.close()
+    pool = conftest.test_engine.sync_engine.pool
+    checked_out = Counter()
+
+    def on_checkout(*args):
+        checked_out["connections"] += 1
+
+    def on_checkin(*args):
+        checked_out["connections"] -= 1
+
+    async def concurrent_save():
+        # The archive run holds no connection, so no transaction, while uploading
+        assert checked_out["connections"] == 0
+        async with conftest.test_async_session() as other:
+            await other.execute(update(Chat).values(updatedAt=datetime.now()))
+            await other.commit()
+
+    store.on_upload = concurrent_save
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
+    try:
+        assert await archive_chat(conftest.test_async_session, chat_id) is None
+    finally:
+        event.remove(pool, "checkout", on_checkout)
+        event.remove(pool, "checkin", on_checkin)
+    assert store.objects == {}
+    assert await _count(db_session, Message) == 1
+
+
+@pytest.mark.asyncio
+async def test_hydration_downloads_with_no_transaction_open(
+    auth_client: AsyncClient, db_session: AsyncSession, store: MemoryStore, monkeypatch,
+    project_id: str, save_messages,
+):
+    monkeypatch.setattr(settings, "chat_archive_segment_messages", 1)
+    monkeypatch.setattr(settings, "chat_archive_download_concurrency", 2)
+    await save_messages(project_id, [
+        {"id": f"m{i}", "role": "user", "content": f"message {i}"} for i in range(6)
+    ])
+    await _age(db_session)
+    await archive_idle_chats(conftest.test_async_session)
+    chat_id = (await db_session.execute(select(Chat.id))).scalar_one()
+
+    pool = conftest.test_engine.sync_engine.pool
+    checked_out = Counter()
+
+    def on_checkout(*args):
+        checked_out["connections"] += 1
+
+    def on_checkin(*args):
+        checked_out["connections"] -= 1
+
+    async def download():
+        # Neither a connection nor the chat row is held while downloading
+        assert checked_out["connections"] == 0
+        checked_out["downloads"] += 1
+        checked_out["peak"] = max(checked_out["peak"], checked_out["downloads"])
+        await asyncio.sleep(0.01)
+        checked_out["downloads"] -= 1
+
+    store.on_download = download
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
+    try:
+        assert await hydrate_chat(conftest.test_async_session, chat_id) == 6
+    finally:
+        event.remove(pool, "checkout", on_checkout)
+        event.remove(pool, "checkin", on_checkin)
+    assert checked_out["peak"] == 2
+    assert await hydrate_chat(conftest.test_async_session, chat_id) == 0
+
+
+@pytest.mark.asyncio
+async def test_unreadable_segment_is_503_and_stays_archived(
+    auth_client: AsyncClient, db_session: AsyncSession, store: MemoryStore, project_id: str, save_messages
+):
+    await save_messages(project_id, [{"id": "m0", "role": "user", "content": "hi"}])
+    await _age(db_session)
+    await archive_idle_chats(conftest.test_async_session)
+
+    store.fail_downloads = True
+    response = await auth_client.get(f"/api/projects/{project_id}/chat")
+    assert response.status_code == 503
+    assert response.json() == {"error": "Chat history is temporarily unavailable"}
+    db_session.expire_all()
+    assert (await db_session.execute(select(Chat.archivedAt))).scalar_one() is not None
+    assert len(store.objects) == 1
+
+    store.fail_downloads = False
+    data = (await auth_client.get(f"/api/projects/{project_id}/chat")).json()
+    assert [m["id"] for m in data["messages"]] == ["m0"]
+
+
+@pytest.mark.asyncio
+async def test_summary_repair_skips_archived_projects(
+    auth_client: AsyncClient, db_session: AsyncSession, store: MemoryStore, project_id: str, save_messages
+):
+    await save_messages(project_id, [{"id": "m0", "role": "user", "content": "hi"}])
+    await _age(db_session)
+    await archive_idle_chats(conftest.test_async_session)
+
+    assert (await repair_project_summaries(conftest.test_async_session))["repaired"] == 0
+    db_session.expire_all()
+    assert (await db_session.get(Project, project_id)).messageCount == 1
@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from config import settings
+from middleware.compression import CompressionMiddleware, negotiate_encoding
+from models.chat import Chat, Message
+from models.project import Project
+from models.user import User
+
+
+def test_negotiate_encoding():
+    supported = ("zstd", "br", "gzip")
+    assert negotiate_encoding("gzip, br", supported) == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", supported) == "gzip"
+    assert negotiate_encoding("zstd;q=0, gzip", supported) == "gzip"
+    assert negotiate_encoding("identity", supported) is None
+    assert negotiate_encoding("", supported) is None
+
+
+@pytest.mark.asyncio
+async def test_small_responses_are_not_compressed(client: AsyncClient):
+    response = await client.get("/health", headers={"accept-encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_large_chat_history_is_compressed(
+    client: AsyncClient, db_session: AsyncSession, test_user: User
+):
+    now = datetime.now(timezone.utc)
+    db_session.add(Project(id="p1", name="P", userId=test_user.id, createdAt=now, updatedAt=now))
+    db_session.add(Chat(id="c1", projectId="p1", userId=test_user.id, createdAt=now, updatedAt=now))
+    for i in range(50):
+        db_session.add(
+            Message(id=f"m{i}", chatId="c1", role="assistant", content="export default function Page() {}\n" * 20, createdAt=now)
+        )
+    await db_session.commit()
+
+    response = await client.get("/api/projects/p1/chat", headers={"accept-encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) < len(response.content) / 5
+    assert len(response.json()["messages"]) == 50
+
+
+async def _get(app, accept_encoding: str = "gzip"):
+    transport = ASGITransport(app=CompressionMiddleware(app))
+    async with AsyncClient(transport=transport, base_url="http://test") as c:
+        return await c.get("/", headers={"accept-encoding": accept_encoding})
+
+
+@pytest.mark.asyncio
+async def test_large_body_is_streamed_in_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "compression_offload_size", 4096)
+    payload = {"logs": ["npm run build step %d" % i for i in range(5000)]}
+    response = await _get(JSONResponse(payload))
+    assert response.headers["content-encoding"] == "gzip"
+    # Streamed: no precomputed length, decoded body intact
+    assert "content-length" not in response.headers
+    assert response.json() == payload
+
+
+@pytest.mark.asyncio
+async def test_streaming_response_is_flushed_per_chunk():
+    async def chunks():
+        for i in range(3):
+            yield ('{"n": %d}\n' % i).encode() * 200
+
+    response = await _get(StreamingResponse(chunks(), media_type="application/x-ndjson"))
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text.count('{"n": 2}') == 200
+
+
+@pytest.mark.asyncio
+async def test_incompressible_type_passes_through():
+    response = await _get(PlainTextResponse("x" * 5000, media_type="image/png"))
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_other_encodings_when_available():
+    pytest.importorskip("brotli")
+    pytest.importorskip("zstandard")
+    body = "hello world " * 1000
+    for encoding in ("br", "zstd"):
+        raw = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                raw.append(dict(message["headers"]))
+            elif message.get("body"):
+                raw.append(message["body"])
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", encoding.encode())]}
+        await CompressionMiddleware(PlainTextResponse(body))(scope, receive, capture)
+        assert raw[0][b"content-encoding"] == encoding.encode()
+        assert len(b"".join(raw[1:])) < len(body) / 5
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.chat import Chat, Message
+from models.project import Project
+from models.user import User
+from services.context_window import MESSAGE_OVERHEAD_TOKENS, backfill_token_counts, estimate_tokens
+from tests import conftest
+
+
+async def _offsets(db: AsyncSession) -> list[tuple[str, int, int]]:
+    db.expire_all()
+    rows = await db.execute(
+        select(Message.id, Message.tokenCount, Message.tokenOffset).order_by(Message.createdAt, Message.id)
+    )
+    return [tuple(row) for row in rows]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == MESSAGE_OVERHEAD_TOKENS
+    assert estimate_tokens("abcd" * 10) == MESSAGE_OVERHEAD_TOKENS + 10
+    # Counts UTF-8 bytes, not characters
+    assert estimate_tokens("é" * 4) == MESSAGE_OVERHEAD_TOKENS + 2
+
+
+@pytest.mark.asyncio
+async def test_offsets_are_a_running_sum_kept_through_edits(
+    auth_client: AsyncClient, db_session: AsyncSession, project_id: str, save_messages
+):
+    messages = [{"id": f"m{i}", "role": "user", "content": "x" * 40} for i in range(3)]
+    await save_messages(project_id, messages)
+    assert await _offsets(db_session) == [("m0", 14, 0), ("m1", 14, 14), ("m2", 14, 28)]
+
+    # Growing an earlier message shifts everything after it
+    messages[1]["content"] = "x" * 80
+    await save_messages(project_id, messages)
+    assert await _offsets(db_session) == [("m0", 14, 0), ("m1", 24, 14), ("m2", 14, 38)]
+
+
+def _locks_before_message_writes(statements: list[str]) -> bool:
+    lock = next(i for i, s in enumerate(statements) if s.startswith('SELECT "Chat".id \nFROM "Chat" \nWHERE'))
+    write = next(i for i, s in enumerate(statements) if s.startswith(('INSERT INTO "Message"', 'UPDATE "Message"')))
+    return lock < write
+
+
+@pytest.mark.asyncio
+async def test_writers_lock_the_chat_before_writing_messages(
+    auth_client: AsyncClient, csrf_headers: dict, project_id: str, save_messages
+):
+    await save_messages(project_id, [{"id": "m0", "role": "user", "content": "hi"}])
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(conftest.test_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        await save_messages(project_id, [
+            {"id": "m0", "role": "user", "content": "hi"},
+            {"id": "m1", "role": "assistant", "content": "hello"},
+        ])
+        assert _locks_before_message_writes(statements)
+
+        statements.clear()
+        url = f"/api/projects/{project_id}/chat/messages/m2/chunks"
+        body = {"userId": "test-user-id", "offset": 0, "chunk": "streamed", "final": False}
+        assert (await auth_client.post(url, json=body, headers=csrf_headers)).status_code == 200
+        assert _locks_before_message_writes(statements)
+    finally:
+        event.remove(conftest.test_engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.mark.asyncio
+async def test_context_returns_newest_that_fit_plus_pinned(
+    auth_client: AsyncClient, project_id: str, save_messages
+):
+    await save_messages(project_id, [
+        {"id": "sys", "role": "system", "content": "Summary: building a todo app"},
+        *[{"id": f"m{i}", "role": "user", "content": "x" * 40} for i in range(6)],
+    ])
+    url = f"/api/projects/{project_id}/chat/context"
+
+    data = (await auth_client.get(url, params={"budget": 40})).json()
+    # 11 pinned tokens leave room for two 14-token messages
+    assert [m["id"] for m in data["messages"]] == ["sys", "m4", "m5"]
+    assert (data["tokenCount"], data["truncated"]) == (39, True)
+
+    everything = (await auth_client.get(url, params={"budget": 10_000})).json()
+    assert len(everything["messages"]) == 7
+    assert everything["truncated"] is False
+
+    # Budget smaller than the pinned messages: pinned only
+    assert [m["id"] for m in (await auth_client.get(url, params={"budget": 5})).json()["messages"]] == ["sys"]
+    assert (await auth_client.get(url)).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_context_query_count_does_not_grow_with_history(
+    auth_client: AsyncClient, query_budget, project_id: str, save_messages
+):
+    await save_messages(project_id, [
+        {"id": f"m{i:03}", "role": "user", "content": "x" * 40} for i in range(200)
+    ])
+    # chat, end offset, pinned, window, truncation probe, pending chunks
+    with query_budget(6):
+        data = (await auth_client.get(f"/api/projects/{project_id}/chat/context", params={"budget": 50})).json()
+    assert [m["id"] for m in data["messages"]] == ["m197", "m198", "m199"]
+
+
+@pytest.mark.asyncio
+async def test_backfill_counts_and_sequences_old_rows(db_session: AsyncSession, test_user: User):
+    now = datetime(2025, 1, 1)
+    db_session.add(Project(id="p1", name="P", userId=test_user.id, createdAt=now, updatedAt=now))
+    db_session.add(Chat(id="c1", projectId="p1", userId=test_user.id, createdAt=now, updatedAt=now))
+    for i in range(3):
+        db_session.add(Message(
+            id=f"m{i}", chatId="c1", role="user", content="x" * 40, createdAt=now + timedelta(seconds=i)
+        ))
+    await db_session.commit()
+
+    result = await backfill_token_counts(conftest.test_async_session, batch_size=2)
+    assert (result["counted"], result["chats"]) == (3, 1)
+    assert await _offsets(db_session) == [("m0", 14, 0), ("m1", 14, 14), ("m2", 14, 28)]
+    assert (await backfill_token_counts(conftest.test_async_session))["counted"] == 0
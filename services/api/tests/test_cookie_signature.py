@@ -0,0 +1,58 @@
+from urllib.parse import quote
+
+import pytest
+from httpx import AsyncClient
+
+from config import settings
+from dependencies.auth import _extract_token, sign_token
+from services.session_cache import session_cache
+from tests.conftest import PLAIN_TEST_TOKEN
+
+TEST_SECRET = "test-better-auth-secret"
+
+
+@pytest.fixture
+def signing_secret(monkeypatch):
+    monkeypatch.setattr(settings, "better_auth_secret", TEST_SECRET)
+    return TEST_SECRET
+
+
+def test_extract_token_without_secret_strips_signature():
+    assert _extract_token("abc.anything") == "abc"
+    assert _extract_token("abc") == "abc"
+
+
+def test_extract_token_accepts_valid_signature(signing_secret):
+    cookie = quote(sign_token("abc", signing_secret), safe="")
+    assert _extract_token(cookie) == "abc"
+
+
+def test_extract_token_rejects_forged_signature(signing_secret):
+    forged = sign_token("abc", "some-other-secret")
+    assert _extract_token(forged) is None
+    assert _extract_token("abc.fakesignature") is None
+    assert _extract_token("abc") is None
+
+
+def test_verification_can_be_disabled(signing_secret, monkeypatch):
+    monkeypatch.setattr(settings, "verify_session_signature", False)
+    assert _extract_token("abc.fakesignature") == "abc"
+
+
+@pytest.mark.asyncio
+async def test_forged_cookie_never_reaches_db(client: AsyncClient, test_session, signing_secret):
+    before = session_cache.stats()
+    client.cookies.set("better-auth.session_token", f"{PLAIN_TEST_TOKEN}.fakesignature")
+    response = await client.get("/api/user/profile")
+    assert response.status_code == 401
+    assert session_cache.misses == before["misses"]
+
+
+@pytest.mark.asyncio
+async def test_signed_cookie_authenticates(client: AsyncClient, test_session, signing_secret):
+    client.cookies.set(
+        "better-auth.session_token", quote(sign_token(PLAIN_TEST_TOKEN, signing_secret), safe="")
+    )
+    response = await client.get("/api/user/profile")
+    assert response.status_code == 200
+    assert response.json()["user"]["email"] == "test@example.com"
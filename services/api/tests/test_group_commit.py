@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.chat import Message
+from services.group_commit import GroupCommitWriter, WriterOverloaded, group_commit_writer
+from tests import conftest
+
+
+@pytest_asyncio.fixture
+async def writer(monkeypatch):
+    monkeypatch.setattr(settings, "group_commit_enabled", True)
+    monkeypatch.setattr(settings, "group_commit_window_ms", 20.0)
+    monkeypatch.setattr(group_commit_writer, "factory", conftest.test_async_session)
+    group_commit_writer.clear()
+    yield group_commit_writer
+    await group_commit_writer.stop()
+
+
+@pytest.fixture
+def commits():
+    count = [0]
+
+    def _count(conn):
+        count[0] += 1
+
+    event.listen(conftest.test_engine.sync_engine, "commit", _count)
+    yield count
+    event.remove(conftest.test_engine.sync_engine, "commit", _count)
+
+
+async def _save(client: AsyncClient, headers: dict, project_id: str, message_id: str):
+    return await client.post(
+        f"/api/projects/{project_id}/chat/messages",
+        json={"userId": "test-user-id", "messages": [{"id": message_id, "role": "user", "content": "hi"}]},
+        headers=headers,
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_saves_share_one_commit(
+    auth_client: AsyncClient, db_session: AsyncSession, writer, commits, csrf_headers: dict, create_project
+):
+    project_ids = [await create_project(f"P{i}") for i in range(8)]
+    commits[0] = 0
+
+    responses = await asyncio.gather(*[
+        _save(auth_client, csrf_headers, project_id, f"m{i}") for i, project_id in enumerate(project_ids)
+    ])
+    assert [r.status_code for r in responses] == [200] * 8
+    # Every response came after its batch committed
+    assert (await db_session.execute(select(func.count()).select_from(Message))).scalar_one() == 8
+
+    stats = writer.stats()
+    assert stats["jobs"] == 8
+    assert stats["batches"] < 8
+    assert commits[0] == stats["batches"]
+    assert stats["avgWaitMs"] > 0
+
+
+@pytest.mark.asyncio
+async def test_failing_save_is_isolated_from_its_batch(
+    auth_client: AsyncClient, writer, csrf_headers: dict, create_project
+):
+    project_ids = [await create_project(f"P{i}") for i in range(2)]
+
+    responses = await asyncio.gather(
+        _save(auth_client, csrf_headers, project_ids[0], "m0"),
+        _save(auth_client, csrf_headers, "missing-project", "m1"),
+        _save(auth_client, csrf_headers, project_ids[1], "m2"),
+    )
+    assert [r.status_code for r in responses] == [200, 404, 200]
+    assert writer.stats()["isolated"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_and_stop_flushes(db_session: AsyncSession, monkeypatch):
+    monkeypatch.setattr(settings, "group_commit_max_queue", 1)
+    monkeypatch.setattr(settings, "group_commit_window_ms", 50.0)
+    writer = GroupCommitWriter(conftest.test_async_session)
+
+    async def job(db: AsyncSession) -> int:
+        return (await db.execute(text("SELECT 1"))).scalar_one()
+
+    first = asyncio.create_task(writer.submit(job))
+    await asyncio.sleep(0.01)  # the loop has taken it and holds the window open
+    second = asyncio.create_task(writer.submit(job))
+    await asyncio.sleep(0)
+    with pytest.raises(WriterOverloaded):
+        await writer.submit(job)
+
+    await writer.stop()
+    assert (await first, await second) == (1, 1)
+    assert writer.stats()["rejected"] == 1
@@ -0,0 +1,87 @@
+import re
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.base import Base
+from services.schema_check import missing_indexes, required_indexes
+from tests import conftest
+
+# "SCAN Project" (or "SCAN TABLE Project" on older SQLite) is a full table
+# scan; "SCAN Project USING INDEX ..." walks an index and is fine. Scans of
+# materialized subqueries ("SCAN anon_1") read only the subquery's own rows.
+_SCAN = re.compile(r"^SCAN (TABLE )?(\S+)$")
+
+
+@pytest.fixture
+def captured_statements():
+    statements: list[tuple[str, tuple]] = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(conftest.test_engine.sync_engine, "before_cursor_execute", _capture)
+    yield statements
+    event.remove(conftest.test_engine.sync_engine, "before_cursor_execute", _capture)
+
+
+async def _full_scans(db: AsyncSession, statements: list[tuple[str, tuple]]) -> list[str]:
+    conn = await db.connection()
+    scans = []
+    for statement, parameters in statements:
+        plan = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()
+        for row in plan:
+            match = _SCAN.match(row[-1])
+            if match and match.group(2) in Base.metadata.tables:
+                scans.append(f"{row[-1]}  <-  {statement}")
+    return scans
+
+
+@pytest.mark.asyncio
+async def test_declared_indexes_exist_after_create_all(db_session: AsyncSession):
+    assert await missing_indexes(conftest.test_engine) == []
+    assert ("userId", "updatedAt") in required_indexes()["Project"]
+    assert ("chatId", "createdAt") in required_indexes()["Message"]
+    assert ("projectId",) in required_indexes()["Sandbox"]
+    # Search indexes are Postgres-only: SQLite uses an FTS5 table instead
+    assert ("chatId", "searchVector") in required_indexes("postgresql")["Message"]
+    assert ("chatId", "searchVector") not in required_indexes("sqlite")["Message"]
+
+
+@pytest.mark.asyncio
+async def test_missing_index_is_reported(db_session: AsyncSession):
+    await db_session.execute(text('DROP INDEX "Message_chatId_createdAt_idx"'))
+    await db_session.commit()
+    assert await missing_indexes(conftest.test_engine) == ["Message(chatId, createdAt)"]
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_indexes(auth_client: AsyncClient, db_session: AsyncSession, captured_statements):
+    csrf_resp = await auth_client.get("/api/security/csrf-token")
+    headers = {"x-csrf-token": csrf_resp.json()["csrfToken"], "origin": "http://localhost:3000"}
+    project_id = (await auth_client.post("/api/projects", json={"name": "P"}, headers=headers)).json()["id"]
+    messages = [{"id": "m1", "role": "user", "content": "hi"}]
+    body = {"userId": "test-user-id", "messages": messages}
+
+    captured_statements.clear()
+    # Twice, so both the insert and the update branch run
+    for _ in range(2):
+        response = await auth_client.post(f"/api/projects/{project_id}/chat/messages", json=body, headers=headers)
+        assert response.status_code == 200
+    chunks_url = f"/api/projects/{project_id}/chat/messages/a1/chunks"
+    for offset, chunk, final in [(0, "Hel", False), (3, "lo", False), (5, "!", True)]:
+        chunk_body = {"userId": "test-user-id", "offset": offset, "chunk": chunk, "final": final}
+        response = await auth_client.post(chunks_url, json=chunk_body, headers=headers)
+        assert response.status_code == 200
+    assert (await auth_client.get(f"/api/projects/{project_id}/chat")).status_code == 200
+    assert (await auth_client.get(f"/api/projects/{project_id}/chat/export")).status_code == 200
+    # Full-text hit, then a fragment that falls back to substring matching
+    for q in ("hello", "ell"):
+        assert (await auth_client.get(f"/api/projects/{project_id}/chat/search", params={"q": q})).status_code == 200
+    assert (await auth_client.get("/api/projects")).status_code == 200
+
+    assert captured_statements
+    assert await _full_scans(db_session, list(captured_statements)) == []
@@ -0,0 +1,154 @@
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.chat import Message, MessageChunk
+from services import message_chunks
+from services.message_chunks import compact_idle_messages
+from services.messages import content_hash
+from tests import conftest
+
+
+async def _append(client: AsyncClient, headers: dict, project_id: str, offset: int, chunk: str, **extra):
+    return await client.post(
+        f"/api/projects/{project_id}/chat/messages/a1/chunks",
+        json={"userId": "test-user-id", "offset": offset, "chunk": chunk, **extra},
+        headers=headers,
+    )
+
+
+async def _content(client: AsyncClient, project_id: str) -> str:
+    [message] = (await client.get(f"/api/projects/{project_id}/chat")).json()["messages"]
+    return message["content"]
+
+
+async def _chunk_count(db: AsyncSession) -> int:
+    return (await db.execute(select(func.count()).select_from(MessageChunk))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_chunks_assemble_on_read_and_compact_on_final(
+    auth_client: AsyncClient, db_session: AsyncSession, csrf_headers: dict, project_id: str
+):
+    offset = 0
+    for chunk in ["Sure", ", starting", " with the list view"]:
+        response = await _append(auth_client, csrf_headers, project_id, offset, chunk)
+        assert response.status_code == 200
+        offset = response.json()["length"]
+
+    assert await _content(auth_client, project_id) == "Sure, starting with the list view"
+    # First chunk lives in the row, the rest are pending
+    assert await _chunk_count(db_session) == 2
+    [project] = (await auth_client.get("/api/projects")).json()
+    assert (project["messageCount"], project["lastMessagePreview"]) == (1, "Sure")
+
+    response = await _append(auth_client, csrf_headers, project_id, offset, ".", final=True)
+    assert response.json()["length"] == len("Sure, starting with the list view.")
+    assert await _chunk_count(db_session) == 0
+    message = (await db_session.execute(select(Message))).scalar_one()
+    assert message.content == "Sure, starting with the list view."
+    assert message.contentHash == content_hash(message.content)
+    [project] = (await auth_client.get("/api/projects")).json()
+    assert (project["messageCount"], project["lastMessagePreview"]) == (1, "Sure, starting with the list view.")
+
+
+@pytest.mark.asyncio
+async def test_wrong_offset_conflicts_and_retry_is_acknowledged(
+    auth_client: AsyncClient, csrf_headers: dict, project_id: str
+):
+    response = await _append(auth_client, csrf_headers, project_id, 3, "late")
+    assert response.status_code == 409
+    assert response.json()["expectedOffset"] == 0
+
+    await _append(auth_client, csrf_headers, project_id, 0, "abc")
+    await _append(auth_client, csrf_headers, project_id, 3, "def")
+    # Retried chunk: acknowledged, not stored twice
+    response = await _append(auth_client, csrf_headers, project_id, 3, "def")
+    assert (response.status_code, response.json()["length"]) == (200, 6)
+    # Gap and overlapping rewrite both report where to resume
+    for offset, chunk in [(9, "ghi"), (3, "xyz")]:
+        response = await _append(auth_client, csrf_headers, project_id, offset, chunk)
+        assert (response.status_code, response.json()["expectedOffset"]) == (409, 6)
+    assert await _content(auth_client, project_id) == "abcdef"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_append_at_one_offset_is_acknowledged_or_conflicts(
+    auth_client: AsyncClient, monkeypatch, csrf_headers: dict, project_id: str
+):
+    await _append(auth_client, csrf_headers, project_id, 0, "abc")
+    read_lengths = message_chunks._lengths
+    racing = {"chunk": "def"}
+
+    async def lengths_then_race(db, chat_id, message_id):
+        lengths = await read_lengths(db, chat_id, message_id)
+        # Another request stores its chunk at this offset before ours inserts
+        if racing:
+            async with conftest.test_async_session() as other:
+                other.add(MessageChunk(
+                    messageId=message_id, start=lengths[1], content=racing.pop("chunk"), createdAt=datetime.now()
+                ))
+                await other.commit()
+        return lengths
+
+    monkeypatch.setattr(message_chunks, "_lengths", lengths_then_race)
+    response = await _append(auth_client, csrf_headers, project_id, 3, "def")
+    assert (response.status_code, response.json()["length"]) == (200, 6)
+
+    racing["chunk"] = "ghi"
+    response = await _append(auth_client, csrf_headers, project_id, 6, "xyz")
+    assert (response.status_code, response.json()["expectedOffset"]) == (409, 9)
+    assert await _content(auth_client, project_id) == "abcdefghi"
+
+
+@pytest.mark.asyncio
+async def test_folded_content_grows_geometrically(
+    auth_client: AsyncClient, db_session: AsyncSession, monkeypatch, csrf_headers: dict, project_id: str
+):
+    monkeypatch.setattr(settings, "message_compact_min_chars", 8)
+    folded_lengths = []
+    offset = 0
+    for _ in range(64):
+        offset = (await _append(auth_client, csrf_headers, project_id, offset, "ab")).json()["length"]
+        folded = (await db_session.execute(select(func.length(Message.content)))).scalar_one()
+        if not folded_lengths or folded != folded_lengths[-1]:
+            folded_lengths.append(folded)
+        db_session.expire_all()
+
+    # Each rewrite at least doubles the folded content: O(log n) rewrites
+    assert folded_lengths == [2, 10, 20, 40, 80]
+    assert await _content(auth_client, project_id) == "ab" * 64
+
+
+@pytest.mark.asyncio
+async def test_full_save_supersedes_pending_chunks(
+    auth_client: AsyncClient, db_session: AsyncSession, csrf_headers: dict, project_id: str
+):
+    await _append(auth_client, csrf_headers, project_id, 0, "Hel")
+    await _append(auth_client, csrf_headers, project_id, 3, "lo")
+
+    await auth_client.post(
+        f"/api/projects/{project_id}/chat/messages",
+        json={"userId": "test-user-id", "messages": [{"id": "a1", "role": "assistant", "content": "Hello!"}]},
+        headers=csrf_headers,
+    )
+    assert await _content(auth_client, project_id) == "Hello!"
+    assert await _chunk_count(db_session) == 0
+
+
+@pytest.mark.asyncio
+async def test_idle_sweep_compacts_abandoned_streams(
+    auth_client: AsyncClient, db_session: AsyncSession, csrf_headers: dict, project_id: str
+):
+    await _append(auth_client, csrf_headers, project_id, 0, "partial ")
+    await _append(auth_client, csrf_headers, project_id, 8, "reply")
+
+    assert (await compact_idle_messages(conftest.test_async_session))["compacted"] == 0
+    result = await compact_idle_messages(conftest.test_async_session, idle_seconds=0)
+    assert result["compacted"] == 1
+    assert await _chunk_count(db_session) == 0
+    assert await _content(auth_client, project_id) == "partial reply"
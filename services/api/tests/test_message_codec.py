@@ -0,0 +1,101 @@
+import os
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.chat import Chat, Message
+from models.project import Project
+from models.user import User
+from services import message_codec
+from services.message_codec import backfill_compression, decode_content, encode_content, train_dictionary
+from tests import conftest
+
+_SOURCE = "".join(
+    f"export function Component{i}() {{\n  return <div className=\"card\">Item {i}</div>;\n}}\n\n"
+    for i in range(200)
+)
+
+
+def test_small_and_poorly_compressible_bodies_stay_plain(monkeypatch):
+    assert encode_content("hello") == ("hello", None)
+    # Hex noise shrinks to just over half its size
+    noise = os.urandom(4096).hex()
+    assert encode_content(noise)[1] is not None
+    monkeypatch.setattr(message_codec, "MAX_STORED_RATIO", 0.5)
+    assert encode_content(noise) == (noise, None)
+
+
+def test_large_bodies_round_trip_compressed():
+    stored, packed = encode_content(_SOURCE)
+    assert stored == ""
+    assert len(packed) < len(_SOURCE) / 10
+    assert decode_content(stored, packed) == _SOURCE
+
+
+@pytest.mark.asyncio
+async def test_save_and_get_chat_decompress_transparently(auth_client: AsyncClient, db_session: AsyncSession):
+    csrf_resp = await auth_client.get("/api/security/csrf-token")
+    headers = {"x-csrf-token": csrf_resp.json()["csrfToken"], "origin": "http://localhost:3000"}
+    project_id = (await auth_client.post("/api/projects", json={"name": "P"}, headers=headers)).json()["id"]
+    body = {"userId": "test-user-id", "messages": [{"id": "a1", "role": "assistant", "content": _SOURCE}]}
+    await auth_client.post(f"/api/projects/{project_id}/chat/messages", json=body, headers=headers)
+
+    content, packed = (await db_session.execute(select(Message.content, Message.contentZstd))).one()
+    assert content == "" and packed is not None
+    [message] = (await auth_client.get(f"/api/projects/{project_id}/chat")).json()["messages"]
+    assert message["content"] == _SOURCE
+    [project] = (await auth_client.get("/api/projects")).json()
+    assert project["lastMessagePreview"].startswith("export function Component0()")
+
+
+@pytest.mark.asyncio
+async def test_backfill_compresses_plain_rows_in_batches(db_session: AsyncSession, test_user: User):
+    now = datetime(2025, 1, 1)
+    db_session.add(Project(id="p1", name="P", userId=test_user.id, createdAt=now, updatedAt=now))
+    db_session.add(Chat(id="c1", projectId="p1", userId=test_user.id, createdAt=now, updatedAt=now))
+    for i in range(3):
+        db_session.add(Message(id=f"big{i}", chatId="c1", role="assistant", content=_SOURCE, createdAt=now))
+    db_session.add(Message(id="small", chatId="c1", role="user", content="hi", createdAt=now))
+    await db_session.commit()
+
+    result = await backfill_compression(conftest.test_async_session, batch_size=2)
+    assert (result["checked"], result["compressed"]) == (3, 3)
+    assert result["bytesAfter"] < result["bytesBefore"] / 10
+
+    db_session.expire_all()
+    rows = (await db_session.execute(select(Message.id, Message.content, Message.contentZstd))).all()
+    assert {id_: decode_content(c, p) for id_, c, p in rows} == {
+        "big0": _SOURCE, "big1": _SOURCE, "big2": _SOURCE, "small": "hi"
+    }
+    # Re-running skips what is already compressed
+    assert (await backfill_compression(conftest.test_async_session))["compressed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_trained_dictionary_is_used_and_required(
+    db_session: AsyncSession, test_user: User, tmp_path, monkeypatch
+):
+    now = datetime(2025, 1, 1)
+    db_session.add(Project(id="p1", name="P", userId=test_user.id, createdAt=now, updatedAt=now))
+    db_session.add(Chat(id="c1", projectId="p1", userId=test_user.id, createdAt=now, updatedAt=now))
+    for i in range(200):
+        content = f"Created src/components/Card{i}.tsx with a {i % 7}-column grid layout and hover states."
+        db_session.add(Message(id=f"m{i}", chatId="c1", role="assistant", content=content, createdAt=now))
+    await db_session.commit()
+
+    path = tmp_path / "messages.dict"
+    path.write_bytes(await train_dictionary(conftest.test_async_session, size=2048))
+    monkeypatch.setattr(settings, "message_zstd_dictionary", str(path))
+    monkeypatch.setattr(settings, "message_compress_min_bytes", 64)
+
+    body = "Created src/components/Card9000.tsx with a 3-column grid layout and hover states."
+    stored, packed = encode_content(body)
+    assert stored == "" and decode_content(stored, packed) == body
+
+    monkeypatch.setattr(settings, "message_zstd_dictionary", "")
+    with pytest.raises(ValueError, match="not configured"):
+        decode_content(stored, packed)
@@ -0,0 +1,226 @@
+from datetime import datetime, timedelta
+
+import orjson
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.chat import Chat, Message
+from models.project import Project
+from models.user import User
+from services.message_search import (
+    _fulltext_stmt,
+    backfill_search_vectors,
+    highlight,
+    highlight_pattern,
+)
+from tests import conftest
+
+
+async def _search(client: AsyncClient, project_id: str, q: str, **params) -> dict:
+    response = await client.get(f"/api/projects/{project_id}/chat/search", params={"q": q, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def _marked(result: dict) -> list[str]:
+    return [result["snippet"][start:end] for start, end in result["highlights"]]
+
+
+def test_highlight_snippet_and_spans():
+    pattern = highlight_pattern("generated pages", "fulltext")
+    content = "intro " * 50 + "It generates the  auth page.\n" + "outro " * 50
+    snippet, spans = highlight(content, pattern, 60)
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert len(snippet) == 62
+    assert [snippet[start:end] for start, end in spans] == ["generates", "page"]
+
+    # Match near the start: no leading cut
+    assert highlight("auth page", pattern, 60) == ("auth page", [(5, 9)])
+    assert highlight("nothing here", None, 60) == ("nothing here", [])
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_and_highlights_matches(auth_client: AsyncClient, project_id: str, save_messages):
+    await save_messages(project_id, [
+        {"id": "m0", "role": "user", "content": "Build me a landing page"},
+        {"id": "m1", "role": "assistant", "content": "I generated the auth page with a login form and an auth hook"},
+        {"id": "m2", "role": "user", "content": "Now add dark mode"},
+        {"id": "m3", "role": "assistant", "content": "Dark mode is on; the auth page follows it too"},
+    ])
+
+    data = await _search(auth_client, project_id, "generate auth page")
+    assert data["match"] == "fulltext"
+    assert [r["id"] for r in data["results"]] == ["m1"]
+    assert _marked(data["results"][0]) == ["generated", "auth", "page", "auth"]
+
+    data = await _search(auth_client, project_id, "auth page")
+    # m1 mentions auth twice
+    assert [r["id"] for r in data["results"]] == ["m1", "m3"]
+    assert data["results"][0]["rank"] >= data["results"][1]["rank"] > 0
+    assert data["nextOffset"] is None
+
+
+def _parts(*parts: dict) -> str:
+    # As the web client saves bodies: JSON.stringify of the parts
+    return orjson.dumps(list(parts)).decode()
+
+
+@pytest.mark.asyncio
+async def test_search_sees_only_the_text_parts(auth_client: AsyncClient, project_id: str, save_messages):
+    await save_messages(project_id, [
+        {"id": "m0", "role": "user", "content": _parts({"type": "text", "text": "Add a pricing page"})},
+        {"id": "m1", "role": "assistant", "content": _parts(
+            {"type": "reasoning", "text": "Pricing needs tiers"},
+            {"type": "text", "text": "Added the pricing page"},
+            {"type": "tool-call", "toolCallId": "t1", "toolName": "writeFile", "args": {"path": "pricing.tsx"}},
+        )},
+        {"id": "m2", "role": "user", "content": _parts({"type": "text", "text": "Use a serif font type"})},
+    ])
+
+    for q in ["type", "ype"]:
+        data = await _search(auth_client, project_id, q)
+        assert [r["id"] for r in data["results"]] == ["m2"], q
+        assert data["results"][0]["snippet"] == "Use a serif font type"
+    for q in ["text", "writeFile"]:
+        assert (await _search(auth_client, project_id, q))["results"] == [], q
+
+    data = await _search(auth_client, project_id, "pricing")
+    assert sorted(r["id"] for r in data["results"]) == ["m0", "m1"]
+    assert {r["snippet"] for r in data["results"]} == {"Add a pricing page", "Added the pricing page"}
+
+
+@pytest.mark.asyncio
+async def test_substring_scan_stops_at_its_cap(
+    auth_client: AsyncClient, monkeypatch, project_id: str, save_messages
+):
+    monkeypatch.setattr(settings, "chat_search_substring_scan_rows", 3)
+    # Every body has "ype" in its JSON, only the oldest in its text
+    await save_messages(project_id, [
+        {"id": "m0", "role": "user", "content": _parts({"type": "text", "text": "Pick a font type"})},
+        *({"id": f"m{i}", "role": "user", "content": _parts({"type": "text", "text": f"step {i}"})}
+          for i in range(1, 6)),
+    ])
+
+    data = await _search(auth_client, project_id, "ype")
+    assert (data["results"], data["partial"], data["nextOffset"]) == ([], True, None)
+
+    monkeypatch.setattr(settings, "chat_search_substring_scan_rows", 10)
+    data = await _search(auth_client, project_id, "ype")
+    assert ([r["id"] for r in data["results"]], data["partial"]) == (["m0"], False)
+
+
+@pytest.mark.asyncio
+async def test_search_finds_compressed_bodies(
+    auth_client: AsyncClient, db_session: AsyncSession, project_id: str, save_messages
+):
+    body = "".join(f"line {i}: const widget{i} = render();\n" for i in range(300)) + "export function LoginForm() {}"
+    assert len(body.encode()) >= settings.message_compress_min_bytes
+    await save_messages(project_id, [{"id": "big", "role": "assistant", "content": body}])
+    assert (await db_session.get(Message, "big")).contentZstd is not None
+
+    data = await _search(auth_client, project_id, "LoginForm")
+    [result] = data["results"]
+    assert result["snippet"].startswith("…")
+    assert _marked(result) == ["LoginForm"]
+
+
+@pytest.mark.asyncio
+async def test_substring_fallback_for_identifier_fragments(
+    auth_client: AsyncClient, project_id: str, save_messages
+):
+    await save_messages(project_id, [
+        {"id": "m0", "role": "assistant", "content": "Wrapped the app in useAuthSession()"},
+        {"id": "m1", "role": "assistant", "content": "Added 100% coverage"},
+    ])
+
+    data = await _search(auth_client, project_id, "AuthSess")
+    assert data["match"] == "substring"
+    assert [r["id"] for r in data["results"]] == ["m0"]
+    assert _marked(data["results"][0]) == ["AuthSess"]
+    # LIKE wildcards in the query are literal
+    assert [r["id"] for r in (await _search(auth_client, project_id, "0%"))["results"]] == ["m1"]
+    assert (await _search(auth_client, project_id, "%_%"))["results"] == []
+
+
+@pytest.mark.asyncio
+async def test_search_pages_and_follows_edits(auth_client: AsyncClient, project_id: str, save_messages):
+    messages = [{"id": f"m{i}", "role": "user", "content": f"tweak the navbar, pass {i}"} for i in range(5)]
+    await save_messages(project_id, messages)
+
+    seen, offset = [], 0
+    while offset is not None:
+        data = await _search(auth_client, project_id, "navbar", limit=2, offset=offset)
+        seen += [r["id"] for r in data["results"]]
+        offset = data["nextOffset"]
+    assert sorted(seen) == [f"m{i}" for i in range(5)]
+
+    # Re-saving an edited body re-indexes it
+    messages[0]["content"] = "tweak the footer instead"
+    await save_messages(project_id, messages)
+    assert len((await _search(auth_client, project_id, "navbar"))["results"]) == 4
+    assert [r["id"] for r in (await _search(auth_client, project_id, "footer"))["results"]] == ["m0"]
+
+    no_chat = await auth_client.get("/api/projects/none/chat/search", params={"q": "x"})
+    assert no_chat.json() == {
+        "chat": None, "results": [], "match": "fulltext", "nextOffset": None, "partial": False
+    }
+    assert (await auth_client.get(f"/api/projects/{project_id}/chat/search")).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_streamed_message_is_indexed_when_folded(
+    auth_client: AsyncClient, csrf_headers: dict, project_id: str
+):
+    url = f"/api/projects/{project_id}/chat/messages/s1/chunks"
+    chunks = ["Creating the ", "checkout flow"]
+    offset = 0
+    for i, chunk in enumerate(chunks):
+        body = {"userId": "test-user-id", "offset": offset, "chunk": chunk, "final": i == len(chunks) - 1}
+        assert (await auth_client.post(url, json=body, headers=csrf_headers)).status_code == 200
+        offset += len(chunk)
+
+    data = await _search(auth_client, project_id, "checkout")
+    assert [r["id"] for r in data["results"]] == ["s1"]
+    assert data["match"] == "fulltext"
+
+
+@pytest.mark.asyncio
+async def test_backfill_indexes_old_rows(auth_client: AsyncClient, db_session: AsyncSession, test_user: User):
+    now = datetime(2025, 1, 1)
+    db_session.add(Project(id="p1", name="P", userId=test_user.id, createdAt=now, updatedAt=now))
+    db_session.add(Chat(id="c1", projectId="p1", userId=test_user.id, createdAt=now, updatedAt=now))
+    await db_session.flush()
+    # Rows from before the column existed have no vector
+    await db_session.execute(insert(Message), [
+        {"id": f"m{i}", "chatId": "c1", "role": "user", "content": f"old pricing table {i}",
+         "createdAt": now + timedelta(seconds=i)}
+        for i in range(3)
+    ])
+    await db_session.commit()
+    assert (await _search(auth_client, "p1", "pricing"))["match"] == "substring"
+
+    assert (await backfill_search_vectors(conftest.test_async_session, batch_size=2))["indexed"] == 3
+    data = await _search(auth_client, "p1", "pricing")
+    assert (data["match"], len(data["results"])) == ("fulltext", 3)
+    assert (await backfill_search_vectors(conftest.test_async_session))["indexed"] == 0
+
+    # Vectors built from the whole JSON body are rebuilt from its text parts
+    await db_session.execute(update(Message).values(content=_parts({"type": "text", "text": "new pricing grid"})))
+    await db_session.commit()
+    assert (await backfill_search_vectors(conftest.test_async_session, reindex=True))["indexed"] == 3
+    assert len((await _search(auth_client, "p1", "grid"))["results"]) == 3
+
+
+def test_postgres_statements_use_tsvector():
+    dialect = postgresql.asyncpg.dialect()
+    written = str(insert(Message).values(id="m", searchVector="auth page").compile(dialect=dialect))
+    assert "to_tsvector('english'::regconfig, $" in written
+
+    searched = str(_fulltext_stmt("postgresql", "c1", "auth page").compile(dialect=dialect))
+    assert "websearch_to_tsquery('english'::regconfig, $" in searched
+    assert '"Message"."searchVector" @@ websearch_to_tsquery' in searched
+    assert "ts_rank_cd(" in searched
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import re
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.chat import Chat, Message
+from models.project import Project
+from models.user import User
+from services.messages import _upsert, content_hash, upsert_messages
+from tests import conftest
+
+
+def _msg(id: str, content: str, role: str = "user"):
+    return SimpleNamespace(id=id, role=role, content=content)
+
+
+@pytest.mark.asyncio
+async def test_upsert_inserts_updates_and_skips_unchanged(db_session: AsyncSession, test_user: User):
+    now = datetime(2025, 1, 1, 12, 0, 0)
+    db_session.add(Project(id="p1", name="P", userId=test_user.id, createdAt=now, updatedAt=now))
+    db_session.add(Chat(id="c1", projectId="p1", userId=test_user.id, createdAt=now, updatedAt=now))
+    await db_session.flush()
+
+    first = await upsert_messages(db_session, "c1", [_msg("m1", "hi"), _msg("m2", "hel", "assistant")], now)
+    assert (first.inserted, first.updated) == (2, 0)
+    assert first.last_inserted_at == now + timedelta(milliseconds=1)
+
+    later = now + timedelta(seconds=5)
+    second = await upsert_messages(
+        db_session, "c1", [_msg("m1", "hi"), _msg("m2", "hello", "assistant"), _msg("m3", "next")], later
+    )
+    assert (second.inserted, second.updated) == (1, 1)
+    assert second.last_inserted_at == later + timedelta(milliseconds=2)
+
+    third = await upsert_messages(db_session, "c1", [_msg("m1", "hi"), _msg("m2", "hello", "assistant")], later)
+    assert (third.inserted, third.updated) == (0, 0)
+
+    rows = (await db_session.execute(
+        select(Message.id, Message.content, Message.contentHash, Message.createdAt).order_by(Message.createdAt)
+    )).all()
+    assert [(r.id, r.content) for r in rows] == [("m1", "hi"), ("m2", "hello"), ("m3", "next")]
+    assert rows[1].contentHash == content_hash("hello")
+    # Updates keep the original createdAt
+    assert rows[1].createdAt == now + timedelta(milliseconds=1)
+
+
+@pytest.mark.asyncio
+async def test_rows_without_hash_are_rewritten_once(db_session: AsyncSession, test_user: User):
+    now = datetime(2025, 1, 1)
+    db_session.add(Project(id="p1", name="P", userId=test_user.id, createdAt=now, updatedAt=now))
+    db_session.add(Chat(id="c1", projectId="p1", userId=test_user.id, createdAt=now, updatedAt=now))
+    db_session.add(Message(id="legacy", chatId="c1", role="user", content="old row", createdAt=now))
+    await db_session.flush()
+
+    later = now + timedelta(seconds=1)
+    assert (await upsert_messages(db_session, "c1", [_msg("legacy", "old row")], later)).updated == 1
+    assert (await upsert_messages(db_session, "c1", [_msg("legacy", "old row")], later)).updated == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_order_survives_millisecond_timestamps(db_session: AsyncSession, test_user: User):
+    now = datetime(2025, 1, 1, 12, 0, 0, 999_600)
+    db_session.add(Project(id="p1", name="P", userId=test_user.id, createdAt=now, updatedAt=now))
+    db_session.add(Chat(id="c1", projectId="p1", userId=test_user.id, createdAt=now, updatedAt=now))
+    await db_session.flush()
+
+    # The reply's id sorts before the prompt's, as random ids may
+    await upsert_messages(db_session, "c1", [_msg("zz", "prompt"), _msg("aa", "reply", "assistant")], now)
+    rows = (await db_session.execute(select(Message.id, Message.createdAt))).all()
+    # Ordered by (createdAt, id) as timestamp(3) rounds the stamps
+    stored = sorted((round(r.createdAt.timestamp() * 1000), r.id) for r in rows)
+    assert [msg_id for _, msg_id in stored] == ["zz", "aa"]
+
+
+_MICROS = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{3})\d{3}$")
+
+
+@pytest.mark.asyncio
+async def test_inserts_are_counted_when_timestamps_lose_microseconds(db_session: AsyncSession, test_user: User):
+    now = datetime(2025, 1, 1, 12, 0, 0, 123_456)
+    db_session.add(Project(id="p1", name="P", userId=test_user.id, createdAt=now, updatedAt=now))
+    db_session.add(Chat(id="c1", projectId="p1", userId=test_user.id, createdAt=now, updatedAt=now))
+    await db_session.flush()
+
+    # Store stamps as timestamp(3) does, so RETURNING never echoes what was sent
+    def to_millis(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("INSERT INTO \"Message\""):
+            return statement, parameters
+        return statement, tuple(
+            _MICROS.sub(r"\g<1>000", p) if isinstance(p, str) else p for p in parameters
+        )
+
+    event.listen(conftest.test_engine.sync_engine, "before_cursor_execute", to_millis, retval=True)
+    try:
+        first = await upsert_messages(db_session, "c1", [_msg("m1", "hi"), _msg("m2", "hel", "assistant")], now)
+        second = await upsert_messages(
+            db_session, "c1", [_msg("m1", "hi"), _msg("m2", "hello", "assistant"), _msg("m3", "next")], now
+        )
+    finally:
+        event.remove(conftest.test_engine.sync_engine, "before_cursor_execute", to_millis)
+
+    assert (first.inserted, first.updated) == (2, 0)
+    assert first.last_inserted_at == datetime(2025, 1, 1, 12, 0, 0, 124_000)
+    assert (second.inserted, second.updated) == (1, 1)
+    stored = (await db_session.execute(select(Message.createdAt))).scalars().all()
+    assert all(created.microsecond % 1000 == 0 for created in stored)
+
+
+def test_postgres_upsert_reports_inserts_by_xmax():
+    compiled = str(_upsert("postgresql").compile(dialect=postgresql.asyncpg.dialect()))
+    assert 'RETURNING "Message".id, "Message"."createdAt", ("Message".xmax = 0) AS inserted' in compiled
@@ -0,0 +1,76 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from models.pool import (
+    InstrumentedAsyncQueuePool,
+    PoolStats,
+    pool_metrics,
+    track_connections,
+    warm_up,
+)
+
+
+def _engine(url: str = "sqlite+aiosqlite:///:memory:"):
+    engine = create_async_engine(url, poolclass=InstrumentedAsyncQueuePool, pool_size=3, max_overflow=2)
+    track_connections(engine)
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_connections_and_returns_them_to_the_pool():
+    engine = _engine()
+    pool_stats = engine.pool.stats
+    try:
+        assert await warm_up(engine, 3) == 3
+        metrics = pool_metrics(engine.pool)
+        assert metrics["checkedIn"] == 3
+        assert metrics["checkedOut"] == 0
+        assert metrics["overflow"] == 0
+        assert pool_stats.connections_opened == 3
+    finally:
+        await engine.dispose()
+    assert pool_stats.connections_closed >= 3
+    # Dispose recreates the pool; its numbers carry over
+    assert engine.pool.stats is pool_stats
+
+
+@pytest.mark.asyncio
+async def test_each_engine_keeps_its_own_stats():
+    primary, replica = _engine(), _engine()
+    try:
+        await warm_up(primary, 3)
+        await warm_up(replica, 1)
+        assert pool_metrics(primary.pool)["connectionsOpened"] == 3
+        assert pool_metrics(replica.pool)["connectionsOpened"] == 1
+        assert primary.pool.stats.checkouts == 3
+        assert replica.pool.stats.checkouts == 1
+    finally:
+        await primary.dispose()
+        await replica.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_failure_is_logged_not_raised():
+    engine = _engine("sqlite+aiosqlite:////nonexistent-dir/db.sqlite")
+    try:
+        assert await warm_up(engine, 2) == 0
+    finally:
+        await engine.dispose()
+
+
+def test_wait_histogram_is_cumulative():
+    stats = PoolStats()
+    for _ in range(3):
+        stats.end_wait(stats.begin_wait())
+    histogram = stats.wait_histogram()
+    assert histogram["+Inf"] == 3
+    assert list(histogram.values()) == sorted(histogram.values())
+
+
+@pytest.mark.asyncio
+async def test_pool_metrics_endpoint(client: AsyncClient):
+    response = await client.get("/health/db")
+    assert response.status_code == 200
+    data = response.json()
+    assert {"checkedOut", "overflow", "waitHistogramMs", "connectionAgeS"} <= set(data)
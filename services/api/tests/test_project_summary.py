@@ -0,0 +1,88 @@
+import orjson
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.project import Project
+from services.project_summary import PREVIEW_LENGTH, message_preview, repair_project_summaries
+from tests import conftest
+
+
+def test_message_preview_collapses_whitespace_and_truncates():
+    assert message_preview("  hello\n\n  world ") == "hello world"
+    preview = message_preview("word " * 100)
+    assert len(preview) == PREVIEW_LENGTH
+    assert preview.endswith("…")
+
+
+def test_message_preview_reads_text_parts_of_saved_json():
+    # As the web client saves them: JSON.stringify of the parts
+    prompt = orjson.dumps([{"type": "text", "text": "Build a\n todo app"}]).decode()
+    assert message_preview(prompt) == "Build a todo app"
+    reply = orjson.dumps([
+        {"type": "reasoning", "text": "The user wants a list"},
+        {"type": "text", "text": "Creating the list view."},
+        {"type": "tool-call", "toolCallId": "t1", "toolName": "writeFile", "args": {"path": "a.tsx"}},
+        {"type": "text", "text": "Done."},
+    ]).decode()
+    assert message_preview(reply) == "Creating the list view. Done."
+    assert message_preview('"plain string"') == "plain string"
+    assert message_preview("[not json") == "[not json"
+
+
+@pytest.mark.asyncio
+async def test_save_messages_maintains_summary(auth_client: AsyncClient, project_id: str, save_messages):
+    [project] = (await auth_client.get("/api/projects")).json()
+    assert (project["messageCount"], project["lastActivityAt"], project["lastMessagePreview"]) == (0, None, None)
+
+    messages = [
+        {"id": "m1", "role": "user", "content": "Build a todo app"},
+        {"id": "m2", "role": "assistant", "content": "Sure, starting"},
+    ]
+    await save_messages(project_id, messages)
+    # Streamed growth of m2 plus a new message: only m3 is counted
+    messages[1]["content"] = "Sure, starting with the list view"
+    messages.append({"id": "m3", "role": "user", "content": '[{"type":"text","text":"Add due dates"}]'})
+    await save_messages(project_id, messages)
+
+    [project] = (await auth_client.get("/api/projects")).json()
+    assert project["messageCount"] == 3
+    assert project["lastMessagePreview"] == "Add due dates"
+    assert project["lastActivityAt"] is not None
+
+
+@pytest.mark.asyncio
+async def test_list_projects_is_one_query(
+    auth_client: AsyncClient, query_budget, project_id: str, create_project, save_messages
+):
+    await save_messages(project_id, [{"id": "m1", "role": "user", "content": "hi"}])
+    await create_project()
+
+    # Session already cached by the requests above
+    with query_budget(1):
+        response = await auth_client.get("/api/projects")
+    assert [p["messageCount"] for p in response.json()] == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_repair_fixes_drifted_summaries_only(
+    auth_client: AsyncClient, db_session: AsyncSession, project_id: str, create_project, save_messages
+):
+    empty_project_id = await create_project()
+    await save_messages(project_id, [
+        {"id": "m1", "role": "user", "content": "first"},
+        {"id": "m2", "role": "assistant", "content": "second"},
+    ])
+    assert (await repair_project_summaries(conftest.test_async_session))["repaired"] == 0
+
+    await db_session.execute(update(Project).where(Project.id == project_id).values(messageCount=99, lastMessagePreview="stale"))
+    await db_session.execute(update(Project).where(Project.id == empty_project_id).values(messageCount=5))
+    await db_session.commit()
+
+    result = await repair_project_summaries(conftest.test_async_session, batch_size=1)
+    assert (result["checked"], result["repaired"]) == (2, 2)
+
+    projects = {p["id"]: p for p in (await auth_client.get("/api/projects")).json()}
+    assert (projects[project_id]["messageCount"], projects[project_id]["lastMessagePreview"]) == (2, "second")
+    assert projects[empty_project_id]["messageCount"] == 0
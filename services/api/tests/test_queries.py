@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.project import Project, Sandbox
+from models.user import Session as UserSession, User
+from services.queries import fetch_sandbox, fetch_session_by_token
+from tests.conftest import PLAIN_TEST_TOKEN
+
+
+async def _add_project_with_sandbox(db: AsyncSession, user: User) -> None:
+    now = datetime.now(timezone.utc)
+    db.add(Project(id="proj-1", name="P", userId=user.id, createdAt=now, updatedAt=now))
+    db.add(
+        Sandbox(
+            id="sb-1",
+            projectId="proj-1",
+            modalId="modal-1",
+            tunnelUrl="https://tunnel.example",
+            status="running",
+            createdAt=now,
+            updatedAt=now,
+        )
+    )
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_fetch_session_by_token(db_session: AsyncSession, test_session: UserSession):
+    row = await fetch_session_by_token(db_session, PLAIN_TEST_TOKEN)
+    assert row is not None
+    assert row.id == test_session.id
+    assert row.user.email == "test@example.com"
+    assert isinstance(row.expiresAt, datetime)
+
+    assert await fetch_session_by_token(db_session, "missing") is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_sandbox(db_session: AsyncSession, test_user: User):
+    await _add_project_with_sandbox(db_session, test_user)
+    row = await fetch_sandbox(db_session, "proj-1")
+    assert row is not None
+    assert (row.modalId, row.status) == ("modal-1", "running")
+    assert await fetch_sandbox(db_session, "other") is None
+
+
+@pytest.mark.asyncio
+async def test_sandbox_status_endpoint(client: AsyncClient, db_session: AsyncSession, test_user: User):
+    assert (await client.get("/api/projects/proj-1/sandbox-status")).json() == {"status": "none"}
+
+    await _add_project_with_sandbox(db_session, test_user)
+    response = await client.get("/api/projects/proj-1/sandbox-status")
+    assert response.json() == {"status": "running", "tunnelUrl": "https://tunnel.example"}
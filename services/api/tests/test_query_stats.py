@@ -0,0 +1,101 @@
+import logging
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import PlainTextResponse
+
+from config import settings
+from middleware.query_stats import QueryStatsMiddleware
+from services.query_stats import redact_parameters, track_queries
+
+
+def test_redact_parameters_hides_values():
+    redacted = redact_parameters(("secret-token", 3, None, b"\x00\x01"))
+    assert "secret" not in redacted
+    assert redacted == "(str[12], int, None, bytes[2])"
+    assert redact_parameters({"token": "abc"}) == "{token: str[3]}"
+
+
+@pytest.mark.asyncio
+async def test_nested_blocks_fold_into_parent(auth_client: AsyncClient):
+    with track_queries() as outer:
+        await auth_client.get("/api/projects")
+    # Session lookup + project list
+    assert outer.count == 2
+    assert outer.total_ms > 0
+
+
+@pytest.mark.asyncio
+async def test_save_messages_query_count_does_not_grow_with_messages(
+    auth_client: AsyncClient, query_budget, csrf_headers: dict, project_id: str
+):
+    url = f"/api/projects/{project_id}/chat/messages"
+    messages = [{"id": f"m{i}", "role": "user", "content": "hi"} for i in range(20)]
+    await auth_client.post(url, json={"userId": "test-user-id", "messages": messages}, headers=csrf_headers)
+
+    for m in messages:
+        m["content"] = "edited"
+    # project + chat lookup, chat row lock, existing ids (SQLite only), message
+    # upsert, DELETE superseded chunks, token offsets, UPDATE chat, UPDATE project summary
+    with query_budget(8):
+        response = await auth_client.post(url, json={"userId": "test-user-id", "messages": messages}, headers=csrf_headers)
+    assert response.status_code == 200
+
+    # Nothing changed: lookup, lock, existing ids (SQLite only) and a no-op upsert
+    with query_budget(4):
+        response = await auth_client.post(url, json={"userId": "test-user-id", "messages": messages}, headers=csrf_headers)
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_query_budget_fails_when_exceeded(auth_client: AsyncClient, query_budget):
+    with pytest.raises(pytest.fail.Exception, match="budget was 1"):
+        with query_budget(1):
+            await auth_client.get("/api/projects")
+
+
+@pytest.mark.asyncio
+async def test_middleware_headers_and_n_plus_one_warning(db_session: AsyncSession, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "query_debug_headers", True)
+    monkeypatch.setattr(settings, "query_repeat_warn", 3)
+
+    async def app(scope, receive, send):
+        for i in range(3):
+            await db_session.execute(text("SELECT :i"), {"i": i})
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    transport = ASGITransport(app=QueryStatsMiddleware(app))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        with caplog.at_level(logging.WARNING, logger="middleware.query_stats"):
+            response = await client.get("/loop")
+
+    assert response.headers["x-db-query-count"] == "3"
+    assert float(response.headers["x-db-time-ms"]) >= 0
+    assert "Possible N+1 in GET /loop: statement ran 3 times" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_debug_headers_are_never_sent_in_production(db_session: AsyncSession, monkeypatch):
+    monkeypatch.setattr(settings, "query_debug_headers", True)
+    monkeypatch.setattr(settings, "node_env", "production")
+
+    async def app(scope, receive, send):
+        await db_session.execute(text("SELECT 1"))
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    transport = ASGITransport(app=QueryStatsMiddleware(app))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/")
+    assert "x-db-query-count" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_slow_query_log_redacts_parameters(db_session: AsyncSession, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "query_slow_ms", 0.0)
+    with caplog.at_level(logging.WARNING, logger="services.query_stats"):
+        await db_session.execute(text("SELECT :token"), {"token": "secret-session-token"})
+    assert "Slow query" in caplog.text
+    assert "str[20]" in caplog.text
+    assert "secret-session-token" not in caplog.text
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from config import settings
+from middleware.rate_limit import GCRALimiter, InMemoryCounterStore, SharedRateLimitBackend
+
+PERIOD_MS = 60_000
+
+
+def test_allows_burst_then_rejects():
+    limiter = GCRALimiter(max_keys=100)
+    results = [limiter.hit("ip", limit=3, period_ms=PERIOD_MS, now_ms=0) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.remaining for r in results[:3]] == [2, 1, 0]
+    # One emission interval later a single request is allowed again
+    assert results[3].retry_after_ms == pytest.approx(PERIOD_MS / 3)
+    assert limiter.hit("ip", limit=3, period_ms=PERIOD_MS, now_ms=PERIOD_MS / 3).allowed
+
+
+def test_route_cost_consumes_more_budget():
+    limiter = GCRALimiter(max_keys=100)
+    assert limiter.hit("ip", cost=8, limit=10, period_ms=PERIOD_MS, now_ms=0).remaining == 2
+    assert not limiter.hit("ip", cost=8, limit=10, period_ms=PERIOD_MS, now_ms=0).allowed
+    assert limiter.hit("ip", cost=1, limit=10, period_ms=PERIOD_MS, now_ms=0).allowed
+
+
+def test_expired_keys_are_swept_incrementally():
+    limiter = GCRALimiter(max_keys=100, sweep_batch=2)
+    for i in range(5):
+        limiter.hit(f"ip{i}", limit=10, period_ms=PERIOD_MS, now_ms=0)
+    assert len(limiter) == 5
+    # Every key has fully refilled; each hit sweeps at most two of them
+    limiter.hit("fresh", limit=10, period_ms=PERIOD_MS, now_ms=PERIOD_MS)
+    assert len(limiter) == 4
+    limiter.hit("fresh", limit=10, period_ms=PERIOD_MS, now_ms=PERIOD_MS)
+    assert len(limiter) == 2
+
+
+def test_key_count_is_capped():
+    limiter = GCRALimiter(max_keys=3)
+    for i in range(10):
+        limiter.hit(f"ip{i}", limit=10, period_ms=PERIOD_MS, now_ms=0)
+    assert len(limiter) == 3
+    assert limiter.evictions == 7
+
+
+@pytest.mark.asyncio
+async def test_middleware_returns_429_when_exhausted(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_max", 2)
+    assert (await client.get("/health")).status_code == 200
+    assert (await client.get("/health")).status_code == 200
+    response = await client.get("/health")
+    assert response.status_code == 429
+    assert response.json() == {"error": "Too many requests"}
+    assert response.headers["x-ratelimit-remaining"] == "0"
+    assert int(response.headers["retry-after"]) >= 1
+
+
+@pytest.mark.asyncio
+async def test_route_cost_above_the_burst_is_clamped(monkeypatch):
+    from starlette.responses import PlainTextResponse
+
+    from middleware.security import RateLimitMiddleware
+
+    monkeypatch.setattr(settings, "rate_limit_max", 2)
+    monkeypatch.setattr(settings, "rate_limit_route_costs", {"/export": 5})
+
+    async def endpoint(scope, receive, send):
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    transport = ASGITransport(app=RateLimitMiddleware(endpoint))
+    async with AsyncClient(transport=transport, base_url="http://test") as c:
+        response = await c.get("/export")
+        # Charged the whole burst rather than refused forever
+        assert response.status_code == 200
+        assert response.headers["x-ratelimit-remaining"] == "0"
+        assert (await c.get("/export")).status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_shared_backend_enforces_limit_across_workers():
+    store = InMemoryCounterStore()
+    # An infinite flush interval means only the explicit flushes below reach the store
+    workers = [
+        SharedRateLimitBackend(store, flush_interval_ms=float("inf"), max_keys=100) for _ in range(2)
+    ]
+
+    for worker in workers:
+        for _ in range(3):
+            result = await worker.acquire("ip:GET", cost=1, limit=10, period_ms=PERIOD_MS)
+            assert result.allowed
+    assert store.batches == 0
+
+    for worker in workers:
+        await worker.flush()
+    assert store.batches == 2
+
+    # Worker 1 flushed last, so it already sees all 6 requests
+    assert (await workers[1].acquire("ip:GET", cost=1, limit=10, period_ms=PERIOD_MS)).remaining == 3
+    # Worker 0 only learns the global total when it next flushes its own traffic
+    assert (await workers[0].acquire("ip:GET", cost=1, limit=10, period_ms=PERIOD_MS)).remaining == 6
+    await workers[0].flush()
+    assert not (await workers[0].acquire("ip:GET", cost=4, limit=10, period_ms=PERIOD_MS)).allowed
+
+
+@pytest.mark.asyncio
+async def test_shared_backend_batches_flushes_in_background():
+    store = InMemoryCounterStore()
+    backend = SharedRateLimitBackend(store, flush_interval_ms=1e12, max_keys=100)
+    for i in range(50):
+        await backend.acquire(f"ip{i}:GET", cost=1, limit=10, period_ms=PERIOD_MS)
+    await asyncio.sleep(0)
+    # The first request scheduled one background flush carrying all 50 keys
+    assert store.batches == 1
+    assert len(store._values) == 50
+
+    for i in range(50):
+        await backend.acquire(f"ip{i}:GET", cost=1, limit=10, period_ms=PERIOD_MS)
+    await asyncio.sleep(0)
+    # Still inside the flush interval: no further round trips
+    assert store.batches == 1
+    await backend.stop()
+
+
+@pytest.mark.asyncio
+async def test_shared_backend_fails_open_and_retries():
+    class FlakyStore(InMemoryCounterStore):
+        fail = True
+
+        async def incr_batch(self, items):
+            if self.fail:
+                raise ConnectionError("down")
+            return await super().incr_batch(items)
+
+    store = FlakyStore()
+    backend = SharedRateLimitBackend(store, flush_interval_ms=1e12, max_keys=100)
+    await backend.acquire("ip:GET", cost=2, limit=10, period_ms=PERIOD_MS)
+    await backend.flush()
+
+    store.fail = False
+    await backend.flush()
+    assert list(store._values.values())[0][0] == 2
+    await backend.stop()
+
+
+@pytest.mark.asyncio
+async def test_shared_backend_flushes_idle_increments_on_a_timer():
+    store = InMemoryCounterStore()
+    backend = SharedRateLimitBackend(store, flush_interval_ms=20, max_keys=100)
+    # The first request flushes at once; the second lands inside the interval
+    await backend.acquire("ip:GET", cost=1, limit=10, period_ms=PERIOD_MS)
+    await asyncio.sleep(0)
+    await backend.acquire("ip:GET", cost=1, limit=10, period_ms=PERIOD_MS)
+    await asyncio.sleep(0)
+    assert store.batches == 1
+
+    # No further requests: the timer pushes the pending increment
+    await asyncio.sleep(0.1)
+    assert store.batches == 2
+    assert list(store._values.values())[0][0] == 2
+
+    await backend.acquire("ip:GET", cost=3, limit=10, period_ms=PERIOD_MS)
+    await backend.stop()
+    assert list(store._values.values())[0][0] == 5
+    assert backend._timer is None
@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from starlette.requests import Request
+
+import models.base
+from models.base import Base
+from models.project import Project
+from models.replica import probe_lag, replica_router
+from services.queries import UserRow
+
+
+@pytest_asyncio.fixture
+async def replica(monkeypatch):
+    """A second in-memory SQLite standing in for the read replica.
+
+    It holds one project the primary does not, so responses show which
+    database served the read.
+    """
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with sessions() as session:
+        now = datetime(2025, 1, 1)
+        session.add(Project(id="replica-project", name="On replica", userId="test-user-id", createdAt=now, updatedAt=now))
+        await session.commit()
+
+    monkeypatch.setattr(models.base, "read_async_session", sessions)
+    replica_router.clear()
+    yield sessions
+    replica_router.clear()
+    await engine.dispose()
+
+
+async def _project_ids(client: AsyncClient) -> list[str]:
+    response = await client.get("/api/projects")
+    assert response.status_code == 200
+    return [p["id"] for p in response.json()]
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica(auth_client: AsyncClient, replica):
+    assert await _project_ids(auth_client) == ["replica-project"]
+
+
+@pytest.mark.asyncio
+async def test_recent_writer_reads_from_primary(auth_client: AsyncClient, replica):
+    replica_router.mark_write(["user:test-user-id"])
+    assert await _project_ids(auth_client) == []
+    # Other users are unaffected
+    assert replica_router.use_replica(["user:someone-else"])
+
+
+@pytest.mark.asyncio
+async def test_commit_marks_request_keys_sticky(db_session: AsyncSession, replica):
+    request = Request({"type": "http", "path_params": {"project_id": "p1"}, "state": {}})
+    request.state.user = UserRow("u1", "u1@example.com", None, False, None, datetime.now(), datetime.now())
+    db_session.info["request"] = request
+    try:
+        await db_session.commit()
+    finally:
+        del db_session.info["request"]
+    assert replica_router.is_sticky(["user:u1"])
+    assert replica_router.is_sticky(["project:p1"])
+
+
+@pytest.mark.asyncio
+async def test_lagging_or_failed_replica_falls_back_to_primary(auth_client: AsyncClient, replica):
+    replica_router.record_probe(replica_router.max_lag_seconds + 1)
+    assert await _project_ids(auth_client) == []
+
+    replica_router.record_probe(None)
+    assert await _project_ids(auth_client) == []
+
+    replica_router.record_probe(0.0)
+    assert await _project_ids(auth_client) == ["replica-project"]
+
+
+@pytest.mark.asyncio
+async def test_unreachable_replica_falls_back_and_leaves_rotation(auth_client: AsyncClient, replica, monkeypatch):
+    broken = create_async_engine("sqlite+aiosqlite:////nonexistent-dir/replica.sqlite")
+    monkeypatch.setattr(models.base, "read_async_session", async_sessionmaker(broken, class_=AsyncSession))
+    try:
+        assert await _project_ids(auth_client) == []
+        assert replica_router.healthy is False
+    finally:
+        await broken.dispose()
+
+
+@pytest.mark.asyncio
+async def test_probe_lag_reports_unreachable_replica_as_none():
+    ok = create_async_engine("sqlite+aiosqlite:///:memory:")
+    broken = create_async_engine("sqlite+aiosqlite:////nonexistent-dir/replica.sqlite")
+    try:
+        assert await probe_lag(ok) == 0.0
+        assert await probe_lag(broken) is None
+    finally:
+        await ok.dispose()
+        await broken.dispose()
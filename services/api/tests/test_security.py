@@ -1,5 +1,5 @@
 import pytest
-from httpx import AsyncClient
+from httpx import ASGITransport, AsyncClient
 
 
 @pytest.mark.asyncio
@@ -47,3 +47,38 @@ async def test_rate_limit_headers(client: AsyncClient):
     assert "x-ratelimit-limit" in response.headers
     assert "x-ratelimit-remaining" in response.headers
     assert "x-ratelimit-reset" in response.headers
+
+
+@pytest.mark.asyncio
+async def test_security_headers_on_rejected_request(auth_client: AsyncClient):
+    response = await auth_client.post(
+        "/api/projects",
+        json={"name": "x"},
+        headers={"origin": "http://evil.com"},
+    )
+    assert response.status_code == 403
+    assert response.headers.get("x-frame-options") == "DENY"
+    assert "x-request-id" in response.headers
+
+
+@pytest.mark.asyncio
+async def test_middleware_stack_streams_chunks():
+    from starlette.responses import StreamingResponse
+
+    from middleware.security import RequestIdMiddleware, SecurityHeadersMiddleware
+
+    async def chunks():
+        for part in (b"one,", b"two,", b"three"):
+            yield part
+
+    async def endpoint(scope, receive, send):
+        await StreamingResponse(chunks(), media_type="text/plain")(scope, receive, send)
+
+    app = RequestIdMiddleware(SecurityHeadersMiddleware(endpoint))
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as c:
+        response = await c.get("/stream")
+
+    assert response.text == "one,two,three"
+    assert response.headers.get("x-content-type-options") == "nosniff"
+    assert "x-request-id" in response.headers
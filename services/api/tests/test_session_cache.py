@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.user import Session as UserSession, User
+from services.session_cache import SessionCache, session_cache
+from tests.conftest import PLAIN_TEST_TOKEN
+
+
+@pytest.mark.asyncio
+async def test_repeat_requests_hit_cache(auth_client: AsyncClient):
+    before = session_cache.stats()
+    first = await auth_client.get("/api/user/profile")
+    second = await auth_client.get("/api/user/profile")
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json()["user"]["email"] == "test@example.com"
+    assert session_cache.misses - before["misses"] == 1
+    assert session_cache.hits - before["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_token_is_negatively_cached(client: AsyncClient):
+    before = session_cache.stats()
+    client.cookies.set("better-auth.session_token", "unknown.sig")
+    for _ in range(3):
+        response = await client.get("/api/user/profile")
+        assert response.status_code == 401
+    assert session_cache.misses - before["misses"] == 1
+    assert session_cache.negative_hits - before["negativeHits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_forces_db_lookup(
+    auth_client: AsyncClient, db_session: AsyncSession, test_session: UserSession
+):
+    assert (await auth_client.get("/api/user/profile")).status_code == 200
+
+    await db_session.execute(delete(UserSession).where(UserSession.token == PLAIN_TEST_TOKEN))
+    await db_session.commit()
+    # Still served from cache until revoked in-process
+    assert (await auth_client.get("/api/user/profile")).status_code == 200
+
+    assert session_cache.invalidate_user(test_session.userId) == 1
+    assert (await auth_client.get("/api/user/profile")).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_expired_session_not_cached(db_session: AsyncSession, test_user: User):
+    db_session.add(
+        UserSession(
+            id="expired-session-id",
+            userId=test_user.id,
+            token="expired-token",
+            expiresAt=datetime.now(timezone.utc) - timedelta(minutes=1),
+            createdAt=datetime.now(timezone.utc),
+            updatedAt=datetime.now(timezone.utc),
+        )
+    )
+    await db_session.commit()
+
+    cache = SessionCache(max_size=10, ttl_seconds=60, negative_ttl_seconds=5)
+    session = await cache.resolve(db_session, "expired-token")
+    assert session is not None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction(db_session: AsyncSession):
+    cache = SessionCache(max_size=2, ttl_seconds=60, negative_ttl_seconds=60)
+    for token in ("a", "b", "c"):
+        assert await cache.resolve(db_session, token) is None
+    assert len(cache) == 2
+    assert cache.evictions == 1
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.user import Session as UserSession, User, Verification
+from services.session_purge import purge_expired_rows
+from tests import conftest
+
+
+@pytest.mark.asyncio
+async def test_purge_removes_only_expired_rows(
+    db_session: AsyncSession, test_user: User, test_session: UserSession
+):
+    now = datetime.now(timezone.utc)
+    for i in range(5):
+        db_session.add(
+            UserSession(
+                id=f"expired-{i}",
+                userId=test_user.id,
+                token=f"expired-token-{i}",
+                expiresAt=now - timedelta(hours=1),
+                createdAt=now,
+                updatedAt=now,
+            )
+        )
+        db_session.add(
+            Verification(
+                id=f"verification-{i}",
+                identifier="test@example.com",
+                value=f"code-{i}",
+                expiresAt=now - timedelta(minutes=1) if i < 3 else now + timedelta(hours=1),
+                createdAt=now,
+                updatedAt=now,
+            )
+        )
+    await db_session.commit()
+
+    # A batch size smaller than the backlog forces several delete rounds
+    report = await purge_expired_rows(conftest.test_async_session, batch_size=2)
+
+    assert report["purged"] == {"Session": 5, "Verification": 3}
+    assert report["elapsedMs"] >= 0
+
+    sessions = await db_session.scalar(select(func.count()).select_from(UserSession))
+    verifications = await db_session.scalar(select(func.count()).select_from(Verification))
+    assert sessions == 1
+    assert verifications == 2
+
+
+@pytest.mark.asyncio
+async def test_purge_with_nothing_expired(db_session: AsyncSession, test_session: UserSession):
+    report = await purge_expired_rows(conftest.test_async_session, batch_size=10)
+    assert report["purged"] == {"Session": 0, "Verification": 0}
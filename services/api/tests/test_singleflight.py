@@ -0,0 +1,159 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.project import Project
+from models.user import Session as UserSession, User
+from services.singleflight import SingleFlight, read_coalescer
+from tests import conftest
+
+
+def _slow(result, calls: list, delay: float = 0.01):
+    async def fn():
+        calls.append(result)
+        await asyncio.sleep(delay)
+        return {"value": result}
+
+    return fn
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_computation():
+    flight = SingleFlight(ttl_seconds=0)
+    calls: list = []
+    results = await asyncio.gather(*(flight.run(("k", 1), _slow("a", calls)) for _ in range(5)))
+    assert calls == ["a"]
+    assert all(r is results[0] for r in results)
+    assert (flight.leaders, flight.shared) == (1, 4)
+
+
+@pytest.mark.asyncio
+async def test_different_users_never_share():
+    flight = SingleFlight(ttl_seconds=10)
+    calls: list = []
+    alice, bob = await asyncio.gather(
+        flight.run(("get_project", "p1", "alice"), _slow("alice", calls)),
+        flight.run(("get_project", "p1", "bob"), _slow("bob", calls)),
+    )
+    assert alice == {"value": "alice"}
+    assert bob == {"value": "bob"}
+    assert sorted(calls) == ["alice", "bob"]
+    # Even the micro-TTL cache is per key
+    assert await flight.run(("get_project", "p1", "bob"), _slow("x", calls)) == {"value": "bob"}
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_cached():
+    flight = SingleFlight(ttl_seconds=10)
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise LookupError("missing")
+
+    results = await asyncio.gather(flight.run("k", boom), flight.run("k", boom), return_exceptions=True)
+    assert all(isinstance(r, LookupError) for r in results)
+    calls: list = []
+    assert await flight.run("k", _slow("ok", calls)) == {"value": "ok"}
+
+
+@pytest.mark.asyncio
+async def test_follower_recovers_when_leader_is_cancelled():
+    flight = SingleFlight(ttl_seconds=0)
+    calls: list = []
+    leader = asyncio.create_task(flight.run("k", _slow("leader", calls, delay=1)))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.run("k", _slow("follower", calls)))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == {"value": "follower"}
+
+
+@pytest.mark.asyncio
+async def test_micro_ttl_absorbs_bursts_until_forgotten():
+    flight = SingleFlight(ttl_seconds=10)
+    calls: list = []
+    await flight.run("k", _slow("first", calls))
+    assert await flight.run("k", _slow("second", calls)) == {"value": "first"}
+    flight.forget("k")
+    assert await flight.run("k", _slow("third", calls)) == {"value": "third"}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_project_reads_are_scoped_per_user(
+    db_session: AsyncSession, test_user: User, test_session: UserSession
+):
+    from dependencies.database import get_db
+    from main import app
+
+    now = datetime.now(timezone.utc)
+    db_session.add(User(id="other-user", email="other@example.com", createdAt=now, updatedAt=now))
+    db_session.add(
+        UserSession(
+            id="other-session",
+            userId="other-user",
+            token="other-token",
+            expiresAt=now + timedelta(days=1),
+            createdAt=now,
+            updatedAt=now,
+        )
+    )
+    db_session.add(Project(id="p1", name="Mine", userId=test_user.id, createdAt=now, updatedAt=now))
+    await db_session.commit()
+
+    async def _fresh_session():
+        async with conftest.test_async_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = _fresh_session
+    read_coalescer.ttl_seconds = 10
+    try:
+        transport = ASGITransport(app=app)
+        owner = AsyncClient(transport=transport, base_url="http://test", cookies={"better-auth.session_token": conftest.SIGNED_TEST_COOKIE})
+        other = AsyncClient(transport=transport, base_url="http://test", cookies={"better-auth.session_token": "other-token.sig"})
+        async with owner, other:
+            responses = await asyncio.gather(
+                owner.get("/api/projects/p1"),
+                other.get("/api/projects/p1"),
+                owner.get("/api/projects/p1"),
+                other.get("/api/projects/p1"),
+            )
+    finally:
+        read_coalescer.ttl_seconds = 0
+        read_coalescer.clear()
+        app.dependency_overrides.clear()
+
+    assert [r.status_code for r in responses] == [200, 404, 200, 404]
+    assert responses[0].json()["name"] == "Mine"
+
+
+@pytest.mark.asyncio
+async def test_chat_pages_are_not_shared_between_primary_and_replica(
+    auth_client: AsyncClient, db_session: AsyncSession, test_user: User
+):
+    from dependencies.database import get_read_db
+    from main import app
+
+    now = datetime.now(timezone.utc)
+    db_session.add(Project(id="p1", name="Mine", userId=test_user.id, createdAt=now, updatedAt=now))
+    await db_session.commit()
+
+    async def _replica_session():
+        async with conftest.test_async_session() as session:
+            yield session
+
+    leaders = read_coalescer.leaders
+    read_coalescer.ttl_seconds = 10
+    try:
+        assert (await auth_client.get("/api/projects/p1/chat")).status_code == 200
+        app.dependency_overrides[get_read_db] = _replica_session
+        assert (await auth_client.get("/api/projects/p1/chat")).status_code == 200
+    finally:
+        read_coalescer.ttl_seconds = 0
+        read_coalescer.clear()
+        app.dependency_overrides.pop(get_read_db, None)
+
+    # The replica read did not reuse the primary's cached page
+    assert read_coalescer.leaders - leaders == 2
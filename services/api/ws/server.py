@@ -1,26 +1,16 @@
 import logging
 from datetime import datetime, timezone
-from urllib.parse import unquote
 
 import socketio
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
 
 from config import settings
+from dependencies.auth import _extract_token
+from middleware.scope import parse_cookies
 from models.base import async_session
-from models.user import Session, User
+from services.session_cache import session_cache
 
 logger = logging.getLogger("socketio")
 
-
-def _extract_token(signed_cookie: str) -> str | None:
-    """Extract the plain token from a better-auth signed cookie (TOKEN.SIGNATURE)."""
-    value = unquote(signed_cookie)
-    last_dot = value.rfind(".")
-    if last_dot < 1:
-        return value
-    return value[:last_dot]
-
 sio = socketio.AsyncServer(
     async_mode="asgi",
     cors_allowed_origins=settings.trusted_origins_list,
@@ -28,18 +18,6 @@ sio = socketio.AsyncServer(
 )
 
 
-def _parse_cookies(cookie_header: str) -> dict[str, str]:
-    cookies: dict[str, str] = {}
-    for pair in cookie_header.split(";"):
-        pair = pair.strip()
-        if not pair:
-            continue
-        parts = pair.split("=", 1)
-        if len(parts) == 2:
-            cookies[parts[0].strip()] = parts[1].strip()
-    return cookies
-
-
 @sio.event
 async def connect(sid, environ, auth_data):
     """Authenticate WebSocket connections using the session cookie."""
@@ -47,19 +25,18 @@ async def connect(sid, environ, auth_data):
     if not cookie_header:
         raise socketio.exceptions.ConnectionRefusedError("Authentication required")
 
-    cookies = _parse_cookies(cookie_header)
+    cookies = parse_cookies(cookie_header)
     token = cookies.get(settings.better_auth_session_cookie)
     if not token:
         raise socketio.exceptions.ConnectionRefusedError("Authentication required")
 
+    plain_token = _extract_token(token)
+    if not plain_token:
+        raise socketio.exceptions.ConnectionRefusedError("Authentication required")
+
+    # The AsyncSession only checks out a connection on a cache miss
     async with async_session() as db:
-        stmt = (
-            select(Session)
-            .options(joinedload(Session.user))
-            .where(Session.token == _extract_token(token))
-        )
-        result = await db.execute(stmt)
-        session = result.unique().scalar_one_or_none()
+        session = await session_cache.resolve(db, plain_token)
 
     if not session:
         raise socketio.exceptions.ConnectionRefusedError("Invalid session")